@@ -0,0 +1,105 @@
+"""
+Benchmark de memoria del estado de conversaciones con 1.000.000 de números distintos
+
+Cada número escribe una vez (abre el menú y queda en el estado inicial, como
+quien escribe y abandona) y se mide la memoria que queda en uso con tracemalloc:
+
+- antes: el dict `MessageHandler.conversations` con un dict de cinco claves por número
+- `MemoryConversationStore` sin límite efectivo (`max_size` = números), para
+  comparar el registro `__slots__` con el dict
+- `MemoryConversationStore` con `CONVERSATION_MAX_SIZE` (el LRU acota la memoria)
+- `SQLiteConversationStore`: memoria de Python del proceso y tamaño de la base en disco
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.conversation_store [--senders 1000000]
+"""
+import argparse
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Callable, Dict, Tuple
+
+from config import settings
+from services.conversation_store import (
+    ConversationState, MemoryConversationStore, SQLiteConversationStore, ESTADO_INICIAL
+)
+
+
+def _sender(n: int) -> str:
+    return f"57300{n:07d}"
+
+
+def legacy(senders: int) -> Tuple[object, Dict[str, float]]:
+    conversations = {}
+    for n in range(senders):
+        conversations[_sender(n)] = {
+            "estado": ESTADO_INICIAL,
+            "departamento": None,
+            "descripcion": None,
+            "fecha_inicio": datetime.now().isoformat(),
+            "pqrs_id": None
+        }
+    return conversations, {"guardadas": len(conversations)}
+
+
+def memory_store(max_size: int) -> Callable[[int], Tuple[object, Dict[str, float]]]:
+    def run(senders: int) -> Tuple[object, Dict[str, float]]:
+        store = MemoryConversationStore(max_size=max_size, ttl=settings.conversation_ttl_seconds)
+        for n in range(senders):
+            store.get(_sender(n))
+        return store, {"guardadas": len(store)}
+    return run
+
+
+def sqlite_store(directory: str) -> Callable[[int], Tuple[object, Dict[str, float]]]:
+    def run(senders: int) -> Tuple[object, Dict[str, float]]:
+        path = os.path.join(directory, "conversations.db")
+        store = SQLiteConversationStore(path, ttl=settings.conversation_ttl_seconds)
+        for n in range(senders):
+            store.save(_sender(n), ConversationState())
+        return store, {"guardadas": len(store), "disco_mb": os.path.getsize(path) / 2 ** 20}
+    return run
+
+
+def measure(build: Callable[[int], Tuple[object, Dict[str, float]]], senders: int) -> Dict[str, float]:
+    """Memoria en uso (MiB) al terminar y pico, con el resultado aún vivo"""
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result, extra = build(senders)
+    elapsed = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if hasattr(result, "close"):
+        result.close()
+    del result
+    return {"mib": current / 2 ** 20, "pico_mib": peak / 2 ** 20, "segundos": elapsed, **extra}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--senders", type=int, default=1_000_000, help="Números distintos que escriben")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        cases = {
+            "dict de dicts (antes)": legacy,
+            "memoria, sin límite": memory_store(args.senders),
+            f"memoria, max {settings.conversation_max_size}": memory_store(settings.conversation_max_size),
+            "sqlite": sqlite_store(directory),
+        }
+        print(f"{args.senders} números distintos (con tracemalloc, los tiempos son más lentos que en producción)")
+        print(f"{'almacenamiento':24} {'guardadas':>10} {'MiB':>8} {'pico MiB':>9} {'bytes/guardada':>15} {'segundos':>9}")
+        for name, build in cases.items():
+            result = measure(build, args.senders)
+            # La caché de páginas de SQLite no pasa por tracemalloc (a lo sumo `cache_size`, ~2 MiB)
+            disk = f"  (disco {result['disco_mb']:.0f} MiB)" if "disco_mb" in result else ""
+            print(f"{name:24} {result['guardadas']:>10} {result['mib']:>8.1f} {result['pico_mib']:>9.1f} "
+                  f"{result['mib'] * 2 ** 20 / result['guardadas']:>15.0f} {result['segundos']:>9.1f}{disk}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Benchmark de latencia por mensaje: cliente HTTP nuevo por llamada vs. pool compartido
+
+Levanta una Graph API de prueba local (uvicorn, con TLS de un certificado
+autofirmado si hay `openssl`) que responde como `POST /{phone_number_id}/messages`
+y envía mensajes con `WhatsAppService.send_text_message`:
+
+- antes: `WhatsAppService()` sin cliente, que abre un `httpx.AsyncClient` por
+  cada mensaje (carga los certificados de certifi, conexión TCP y handshake TLS)
+- después: `WhatsAppService(client)` con el cliente de `create_http_client()`,
+  que reutiliza las conexiones con keep-alive
+
+Reporta p50/p95/p99 de latencia por mensaje en serie y el throughput con
+`--concurrency` envíos simultáneos. En localhost no hay latencia de red, así que la
+mejora real (un RTT por TCP y uno o dos por TLS hasta Meta) es mayor.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.http_client [--messages 500] [--concurrency 20] [--no-tls]
+"""
+import argparse
+import asyncio
+import json
+import os
+import shutil
+import socket
+import ssl
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from typing import List, Optional, Tuple
+
+import certifi
+import httpx
+import uvicorn
+
+from config import settings
+from services.http_client import create_http_client
+from services.whatsapp_service import WhatsAppService
+
+RESPONSE = json.dumps({
+    "messaging_product": "whatsapp",
+    "contacts": [{"input": "573001234567", "wa_id": "573001234567"}],
+    "messages": [{"id": "wamid.HBgMNTczMDAxMjM0NTY3FQIAERgSQjYxNEE2QjM3RkIxRDY1MjgyAA=="}]
+}).encode()
+
+
+async def graph_api(scope, receive, send):
+    """Graph API de prueba: acepta cualquier POST y responde como /messages"""
+    if scope["type"] != "http":
+        return
+    more_body = True
+    while more_body:
+        message = await receive()
+        more_body = message.get("more_body", False)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(RESPONSE)).encode())]
+    })
+    await send({"type": "http.response.body", "body": RESPONSE})
+
+
+def _self_signed_certificate(directory: str) -> Optional[Tuple[str, str]]:
+    if shutil.which("openssl") is None:
+        return None
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1", "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1", "-keyout", keyfile, "-out", certfile],
+        check=True, capture_output=True
+    )
+    return certfile, keyfile
+
+
+def _trusting_client(certfile: str) -> type:
+    """`httpx.AsyncClient` que además confía en el certificado autofirmado"""
+
+    class TrustingAsyncClient(httpx.AsyncClient):
+        def __init__(self, *args, **kwargs):
+            # Como el cliente por defecto, carga los certificados de certifi en cada
+            # cliente nuevo: es parte del costo de abrir uno por mensaje
+            context = ssl.create_default_context(cafile=certifi.where())
+            context.load_verify_locations(certfile)
+            kwargs.setdefault("verify", context)
+            super().__init__(*args, **kwargs)
+
+    return TrustingAsyncClient
+
+
+def start_graph_api(certificate: Optional[Tuple[str, str]]) -> Tuple[uvicorn.Server, int]:
+    """Inicia la Graph API de prueba en un hilo y devuelve el servidor y su puerto"""
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    config = uvicorn.Config(
+        graph_api, log_level="warning", lifespan="off",
+        ssl_certfile=certificate[0] if certificate else None,
+        ssl_keyfile=certificate[1] if certificate else None
+    )
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, sock.getsockname()[1]
+
+
+async def measure(service: WhatsAppService, messages: int, concurrency: int) -> Tuple[List[float], float]:
+    """Latencias (ms) de `messages` envíos en serie y mensajes/s con `concurrency` simultáneos"""
+    await service.send_text_message("573001234567", "calentamiento")
+    latencies = []
+    for n in range(messages):
+        started = time.perf_counter()
+        await service.send_text_message("573001234567", f"Mensaje {n}")
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send(n: int) -> None:
+        async with semaphore:
+            await service.send_text_message("573001234567", f"Mensaje {n}")
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(n) for n in range(messages)))
+    return latencies, messages / (time.perf_counter() - started)
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    return statistics.quantiles(values, n=100)[int(percent) - 1]
+
+
+async def run(messages: int, concurrency: int, scheme: str, port: int) -> None:
+    settings.whatsapp_api_base_url = f"{scheme}://127.0.0.1:{port}"
+    settings.whatsapp_phone_number_id = "913262148531141"
+    settings.whatsapp_access_token = "token-de-prueba"
+    print(f"Graph API de prueba en {settings.whatsapp_api_base_url}; {messages} mensajes, "
+          f"concurrencia {concurrency}")
+    print(f"{'cliente':26} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mensajes/s':>11}")
+    shared = create_http_client()
+    try:
+        for name, service in (("nuevo por mensaje (antes)", WhatsAppService()),
+                              ("pool compartido (después)", WhatsAppService(shared))):
+            latencies, throughput = await measure(service, messages, concurrency)
+            print(f"{name:26} {statistics.median(latencies):>8.2f} {_percentile(latencies, 95):>8.2f} "
+                  f"{_percentile(latencies, 99):>8.2f} {throughput:>11.0f}")
+    finally:
+        await shared.aclose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--messages", type=int, default=500, help="Mensajes por medición")
+    parser.add_argument("--concurrency", type=int, default=20, help="Envíos simultáneos en la medición de throughput")
+    parser.add_argument("--no-tls", action="store_true", help="Graph API de prueba por HTTP sin TLS")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        certificate = None if args.no_tls else _self_signed_certificate(directory)
+        if certificate is not None:
+            httpx.AsyncClient = _trusting_client(certificate[0])
+        elif not args.no_tls:
+            print("openssl no está disponible: la Graph API de prueba usa HTTP sin TLS")
+        server, port = start_graph_api(certificate)
+        try:
+            asyncio.run(run(args.messages, args.concurrency, "https" if certificate else "http", port))
+        finally:
+            server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark del detector de quejas similares: precisión, recall y throughput
+
+Genera un corpus sintético de quejas en español (por defecto 100.000) agrupadas
+por tema: las quejas de un mismo tema describen el mismo problema con otras
+palabras de relleno, tildes omitidas, plurales y mayúsculas, y temas distintos
+del mismo departamento comparten palabras genéricas ("problema", "salón").
+Dos quejas son duplicadas si son del mismo tema y departamento.
+
+Compara los dos motores (`SIMILARITY_ENGINE`): "tokens" (2+ palabras en común)
+y "minhash" (texto normalizado + LSH), con la ventana de producción
+(`SIMILARITY_LIMIT` últimas PQRS del departamento) y sobre todo el departamento.
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.similarity_engine [--records 100000] [--queries 2000]
+"""
+import argparse
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from services.similarity_engine import MinHashSimilarityIndex
+from services.similarity_index import SimilarityIndex
+
+DEPARTMENTS = {
+    "TEC": ["computador", "proyector", "internet", "wifi", "impresora", "sala", "red", "contraseña",
+            "plataforma", "correo", "televisor", "cable", "pantalla", "teclado", "mouse", "servidor"],
+    "ASE": ["baño", "piso", "basura", "olor", "lavamanos", "sanitario", "papel", "jabón", "escalera",
+            "ventana", "pasillo", "cafetería", "mesa", "puerta", "tubería", "filtración"],
+    "EDU": ["profesor", "clase", "nota", "examen", "horario", "materia", "parcial", "tutoría",
+            "asistencia", "calificación", "salón", "laboratorio", "práctica", "syllabus", "grupo", "monitor"],
+    "ADM": ["matrícula", "pago", "recibo", "certificado", "carnet", "descuento", "beca", "cobro",
+            "factura", "inscripción", "trámite", "ventanilla", "crédito", "paz", "salvo", "reembolso"],
+    "BIB": ["libro", "préstamo", "multa", "base", "datos", "cubículo", "silencio", "revista",
+            "catálogo", "renovación", "devolución", "tesis", "repositorio", "estante", "horario", "sala"],
+    "SEG": ["robo", "celular", "vigilante", "cámara", "entrada", "parqueadero", "bicicleta", "moto",
+            "iluminación", "noche", "portería", "visitante", "alarma", "casillero", "maleta", "reja"],
+}
+ADJECTIVES = ["dañado", "sucio", "lento", "roto", "apagado", "tapado", "caído", "perdido", "bloqueado",
+              "mojado", "ruidoso", "incompleto", "equivocado", "vencido", "abierto", "oscuro"]
+PLACES = ["bloque A", "bloque B", "bloque C", "sede principal", "segundo piso", "tercer piso",
+          "sótano", "edificio nuevo", "auditorio", "biblioteca central"]
+GENERIC = ["problema", "servicio", "universidad", "estudiantes", "salón", "semana", "urgente", "siempre"]
+OPENERS = ["Buenas tardes, quiero reportar que", "Hola, de nuevo", "Queja:", "Por favor revisen,",
+           "Buenos días.", "Otra vez", "", "Les escribo porque", "Reporto que"]
+FILLERS = ["el", "la", "de", "que", "en", "los", "las", "del", "muy", "está", "hay", "desde", "hace", "días"]
+
+
+def _fold(word: str) -> str:
+    return word.translate(str.maketrans("áéíóúñ", "aeioun"))
+
+
+def _make_topics(rng: random.Random, topics_per_department: int) -> Dict[str, List[Tuple[str, ...]]]:
+    """Cada tema: 2 objetos, un adjetivo y un lugar del departamento"""
+    topics = {}
+    for code, nouns in DEPARTMENTS.items():
+        topics[code] = [
+            tuple(rng.sample(nouns, 2)) + (rng.choice(ADJECTIVES), rng.choice(PLACES))
+            for _ in range(topics_per_department)
+        ]
+    return topics
+
+
+def _describe(rng: random.Random, topic: Tuple[str, ...]) -> str:
+    """Una queja del tema, redactada cada vez de otra forma"""
+    noun_a, noun_b, adjective, place = topic
+    words = [noun_a, noun_b, adjective] + place.split()
+    # A veces se omite uno de los objetos del problema
+    if rng.random() < 0.2:
+        words.remove(rng.choice([noun_a, noun_b]))
+    words = [word + "s" if rng.random() < 0.2 and word[-1] in "aeo" else word for word in words]
+    words = [_fold(word) if rng.random() < 0.3 else word for word in words]
+    words += rng.sample(FILLERS, rng.randint(2, 6)) + rng.sample(GENERIC, rng.randint(1, 3))
+    rng.shuffle(words)
+    text = f"{rng.choice(OPENERS)} {' '.join(words)}".strip()
+    return text.upper() if rng.random() < 0.05 else text
+
+
+def generate_corpus(records: int, topics_per_department: int, seed: int) -> List[Dict[str, str]]:
+    """Quejas en orden de registro, con su tema en `_topic`"""
+    rng = random.Random(seed)
+    topics = _make_topics(rng, topics_per_department)
+    start = datetime(2025, 1, 1)
+    corpus = []
+    for n in range(records):
+        code = rng.choice(list(DEPARTMENTS))
+        # Cada tema se repite a lo largo del historial, como un problema que varios reportan
+        topic = rng.randrange(topics_per_department)
+        corpus.append({
+            "pqrs_id": f"PQRS-{code}-{n:06d}",
+            "fecha_registro": (start + timedelta(minutes=5 * n)).isoformat(),
+            "codigo_departamento": code,
+            "descripcion": _describe(rng, topics[code][topic]),
+            "_topic": f"{code}-{topic}",
+        })
+    return corpus
+
+
+def evaluate(index, corpus: List[Dict[str, str]], queries: List[Dict[str, str]],
+             limit: Optional[int]) -> Dict[str, float]:
+    """Precisión y recall de `find_similar` contra los temas, y consultas por segundo"""
+    topic_by_key = {(record["pqrs_id"], record["fecha_registro"]): record["_topic"] for record in corpus}
+    by_department = defaultdict(list)
+    for record in corpus:
+        by_department[record["codigo_departamento"]].append(record)
+
+    true_positives = retrieved = relevant = 0
+    started = time.perf_counter()
+    results = [
+        index.find_similar(query["codigo_departamento"], query["descripcion"], limit=limit)
+        for query in queries
+    ]
+    elapsed = time.perf_counter() - started
+    for query, found in zip(queries, results):
+        window = by_department[query["codigo_departamento"]]
+        if limit is not None:
+            window = window[-limit:]
+        relevant += sum(1 for record in window if record["_topic"] == query["_topic"])
+        retrieved += len(found)
+        true_positives += sum(1 for key in found if topic_by_key[key] == query["_topic"])
+    return {
+        "precision": true_positives / retrieved if retrieved else 1.0,
+        "recall": true_positives / relevant if relevant else 1.0,
+        "queries_per_second": len(queries) / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=100_000, help="Quejas del corpus")
+    parser.add_argument("--queries", type=int, default=2_000, help="Quejas nuevas a buscar")
+    parser.add_argument("--topics", type=int, default=100, help="Temas por departamento")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    corpus = generate_corpus(args.records + args.queries, args.topics, args.seed)
+    corpus, queries = corpus[:args.records], corpus[args.records:]
+    engines = {
+        "tokens": SimilarityIndex,
+        "minhash": lambda: MinHashSimilarityIndex(
+            num_perm=settings.similarity_minhash_permutations,
+            bands=settings.similarity_lsh_bands,
+            jaccard_threshold=settings.similarity_jaccard_threshold,
+            shingle_size=settings.similarity_shingle_size
+        ),
+    }
+    print(f"Corpus: {len(corpus)} quejas, {len(DEPARTMENTS)} departamentos, "
+          f"{args.topics} temas por departamento, {len(queries)} consultas")
+    print(f"{'motor':8} {'ventana':>9} {'precisión':>10} {'recall':>8} {'consultas/s':>12} {'indexado/s':>11}")
+    for name, factory in engines.items():
+        index = factory()
+        started = time.perf_counter()
+        for record in corpus:
+            index.add(record)
+        indexed_per_second = len(corpus) / (time.perf_counter() - started)
+        for limit in (settings.similarity_limit, None):
+            result = evaluate(index, corpus, queries, limit)
+            print(f"{name:8} {str(limit or 'todo'):>9} {result['precision']:>10.3f} {result['recall']:>8.3f} "
+                  f"{result['queries_per_second']:>12.0f} {indexed_per_second:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
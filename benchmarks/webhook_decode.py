@@ -0,0 +1,71 @@
+"""
+Microbenchmark de la decodificación de webhooks: webhooks por segundo por núcleo
+
+Decodifica los payloads grabados de `tests/fixtures/webhooks` con `parse_webhook`
+(bytes -> pre-chequeo de estados -> TypeAdapter) y con el camino anterior
+(`json.loads` + `WebhookPayload(**data)`), en un solo hilo. Además de cada
+payload, mide una mezcla con la proporción de tráfico indicada (por defecto
+80 % solo estados).
+
+Uso (desde la raíz del proyecto):
+    python -m benchmarks.webhook_decode [--seconds 1] [--status-share 0.8]
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from models.whatsapp import WebhookPayload, parse_webhook, orjson
+
+FIXTURES = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "webhooks"
+
+
+def legacy_parse(body: bytes) -> WebhookPayload:
+    """Decodificación anterior de `main.webhook`"""
+    return WebhookPayload(**json.loads(body.decode("utf-8")))
+
+
+def webhooks_per_second(decode: Callable[[bytes], object], bodies: List[bytes], seconds: float) -> float:
+    """Repite la lista de cuerpos durante `seconds` y devuelve webhooks/segundo"""
+    # Calentar (cachés del TypeAdapter y de orjson)
+    for body in bodies:
+        decode(body)
+    done = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while time.perf_counter() < deadline:
+        for body in bodies:
+            decode(body)
+        done += len(bodies)
+    return done / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--seconds", type=float, default=1.0, help="Duración de cada medición")
+    parser.add_argument("--status-share", type=float, default=0.8, help="Fracción de webhooks solo de estados en la mezcla")
+    args = parser.parse_args()
+
+    payloads = {path.name: path.read_bytes() for path in sorted(FIXTURES.glob("*.json"))}
+    status_only = [body for body in payloads.values() if not parse_webhook(body).messages]
+    with_messages = [body for body in payloads.values() if parse_webhook(body).messages]
+    rng = random.Random(1)
+    mix = [
+        rng.choice(status_only) if rng.random() < args.status_share else rng.choice(with_messages)
+        for _ in range(1000)
+    ]
+    cases = {name: [body] for name, body in payloads.items()}
+    cases[f"mezcla ({args.status_share:.0%} estados)"] = mix
+
+    print(f"orjson: {'sí' if orjson is not None else 'no'}; un solo hilo, {args.seconds:g}s por medición")
+    print(f"{'payload':32} {'anterior/s':>12} {'parse_webhook/s':>16} {'mejora':>8}")
+    for name, bodies in cases.items():
+        legacy = webhooks_per_second(legacy_parse, bodies, args.seconds)
+        fast = webhooks_per_second(parse_webhook, bodies, args.seconds)
+        print(f"{name:32} {legacy:>12.0f} {fast:>16.0f} {fast / legacy:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
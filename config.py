@@ -36,6 +36,105 @@ class Settings(BaseSettings):
     email_sender: str = os.getenv("EMAIL_SENDER", "noreply@ulibertadores.edu.co")  # Email desde el que aparece enviado (puede ser cualquiera)
     email_recipient: str = os.getenv("EMAIL_RECIPIENT", "andresjose.sabagh.5@gmail.com")  # Correo destino
     
+    # Cliente HTTP compartido (WhatsApp, Telegram, SendGrid)
+    http_max_connections: int = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))  # Conexiones simultáneas en el pool
+    http_max_keepalive_connections: int = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", "20"))  # Conexiones ociosas que se mantienen abiertas
+    http_keepalive_expiry: float = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))  # Segundos antes de cerrar una conexión ociosa
+    http_timeout: float = float(os.getenv("HTTP_TIMEOUT", "30"))  # Timeout por defecto (segundos)
+    http2_enabled: bool = os.getenv("HTTP2_ENABLED", "False").lower() == "true"  # Requiere `pip install httpx[http2]`
+    whatsapp_timeout: float = float(os.getenv("WHATSAPP_TIMEOUT", "30"))  # Timeout de la API de WhatsApp
+    telegram_timeout: float = float(os.getenv("TELEGRAM_TIMEOUT", "30"))  # Timeout de la API de Telegram
+    sendgrid_timeout: float = float(os.getenv("SENDGRID_TIMEOUT", "30"))  # Timeout de la API de SendGrid
+    
+    # Almacenamiento de PQRS
+    storage_backend: str = os.getenv("STORAGE_BACKEND", "json")  # "json" (snapshot + journal) o "sqlite"
+    sqlite_db_path: str = os.getenv("SQLITE_DB_PATH", "pqrs_data.db")  # Base de datos del backend SQLite
+    storage_compact_threshold: int = int(os.getenv("STORAGE_COMPACT_THRESHOLD", "1000"))  # Eventos en el journal antes de compactar
+    storage_fsync: bool = os.getenv("STORAGE_FSYNC", "True").lower() == "true"  # fsync tras cada escritura del journal
+    storage_write_window_ms: float = float(os.getenv("STORAGE_WRITE_WINDOW_MS", "5"))  # Escrituras agrupadas en un solo fsync
+    
+    # Detección de quejas similares
+    similarity_engine: str = os.getenv("SIMILARITY_ENGINE", "minhash")  # "minhash" (texto normalizado + LSH) o "tokens" (2+ palabras en común)
+    similarity_jaccard_threshold: float = float(os.getenv("SIMILARITY_JACCARD_THRESHOLD", "0.4"))  # Jaccard mínimo (motor minhash)
+    similarity_minhash_permutations: int = int(os.getenv("SIMILARITY_MINHASH_PERMUTATIONS", "64"))  # Tamaño de la firma MinHash
+    similarity_lsh_bands: int = int(os.getenv("SIMILARITY_LSH_BANDS", "32"))  # Bandas LSH (debe dividir a las permutaciones)
+    similarity_shingle_size: int = int(os.getenv("SIMILARITY_SHINGLE_SIZE", "1"))  # Palabras por shingle
+    similarity_limit: int = int(os.getenv("SIMILARITY_LIMIT", "50"))  # Últimas PQRS del departamento a comparar
+    similarity_window_hours: float = float(os.getenv("SIMILARITY_WINDOW_HOURS", "0"))  # Si es > 0, ventana de tiempo en lugar de SIMILARITY_LIMIT
+    
+    # Outbox de envíos (WhatsApp, Telegram, SendGrid)
+    outbox_enabled: bool = os.getenv("OUTBOX_ENABLED", "True").lower() == "true"  # Si es False, los envíos se hacen en línea
+    outbox_db_path: str = os.getenv("OUTBOX_DB_PATH", "outbox.db")  # Base SQLite de la cola de envíos
+    outbox_max_attempts: int = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))  # Intentos antes de pasar a dead letters
+    outbox_backoff_base: float = float(os.getenv("OUTBOX_BACKOFF_BASE", "2"))  # Segundos del primer reintento (se duplica en cada intento)
+    outbox_backoff_max: float = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))  # Espera máxima entre reintentos
+    outbox_job_timeout: float = float(os.getenv("OUTBOX_JOB_TIMEOUT", "60"))  # Tiempo máximo de un envío
+    outbox_poll_interval: float = float(os.getenv("OUTBOX_POLL_INTERVAL", "1"))  # Segundos entre revisiones de reintentos pendientes
+    outbox_whatsapp_concurrency: int = int(os.getenv("OUTBOX_WHATSAPP_CONCURRENCY", "8"))  # Envíos simultáneos a WhatsApp
+    outbox_telegram_concurrency: int = int(os.getenv("OUTBOX_TELEGRAM_CONCURRENCY", "1"))  # Envíos simultáneos a Telegram
+    outbox_sendgrid_concurrency: int = int(os.getenv("OUTBOX_SENDGRID_CONCURRENCY", "2"))  # Envíos simultáneos a SendGrid
+    
+    # Límites de envío por proveedor (token bucket + cuota diaria; 0 = sin cuota)
+    rate_whatsapp_per_second: float = float(os.getenv("RATE_WHATSAPP_PER_SECOND", "20"))  # Mensajes por segundo a WhatsApp
+    rate_whatsapp_burst: float = float(os.getenv("RATE_WHATSAPP_BURST", "40"))  # Ráfaga máxima a WhatsApp
+    rate_telegram_per_minute: float = float(os.getenv("RATE_TELEGRAM_PER_MINUTE", "20"))  # Mensajes por minuto al canal de Telegram
+    rate_telegram_burst: float = float(os.getenv("RATE_TELEGRAM_BURST", "3"))  # Ráfaga máxima a Telegram
+    rate_sendgrid_per_second: float = float(os.getenv("RATE_SENDGRID_PER_SECOND", "1"))  # Correos por segundo a SendGrid
+    rate_sendgrid_burst: float = float(os.getenv("RATE_SENDGRID_BURST", "5"))  # Ráfaga máxima a SendGrid
+    whatsapp_daily_quota: int = int(os.getenv("WHATSAPP_DAILY_QUOTA", "0"))  # Mensajes por día (UTC)
+    telegram_daily_quota: int = int(os.getenv("TELEGRAM_DAILY_QUOTA", "0"))  # Anuncios por día (UTC)
+    sendgrid_daily_quota: int = int(os.getenv("SENDGRID_DAILY_QUOTA", "100"))  # Correos por día (plan gratuito: 100)
+    rate_quota_db_path: str = os.getenv("RATE_QUOTA_DB_PATH", "rate_quota.db")  # Base SQLite con la cuenta de envíos del día (compartida entre workers)
+    rate_quota_file: str = os.getenv("RATE_QUOTA_FILE", "rate_quota.json")  # Cuenta de versiones anteriores; se importa al iniciar
+    rate_limit_max_wait: float = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))  # Si un 429 pide esperar más, el envío se reprograma
+    
+    # Estado de las conversaciones
+    conversation_store: str = os.getenv("CONVERSATION_STORE", "memory")  # "memory" (un proceso) o "sqlite" (varios workers)
+    conversation_db_path: str = os.getenv("CONVERSATION_DB_PATH", "conversations.db")  # Base SQLite de conversaciones
+    conversation_ttl_seconds: float = float(os.getenv("CONVERSATION_TTL_SECONDS", "86400"))  # Una conversación inactiva más tiempo se reinicia
+    conversation_max_size: int = int(os.getenv("CONVERSATION_MAX_SIZE", "100000"))  # Máximo de conversaciones en memoria
+    
+    # Mensajes entrantes: remitentes distintos atendidos a la vez
+    dispatcher_workers: int = int(os.getenv("DISPATCHER_WORKERS", "16"))
+    
+    # Webhook idempotente: IDs de mensajes ya procesados
+    dedup_cache_size: int = int(os.getenv("DEDUP_CACHE_SIZE", "10000"))  # Máximo de IDs recordados
+    dedup_ttl_seconds: float = float(os.getenv("DEDUP_TTL_SECONDS", "86400"))  # Tiempo que se recuerda cada ID
+    dedup_persist_path: str = os.getenv("DEDUP_PERSIST_PATH", "processed_messages.log")  # Vacío = solo en memoria
+    dedup_store: str = os.getenv("DEDUP_STORE", "auto")  # "memory" (un proceso), "sqlite" (varios workers) o "auto"
+    dedup_db_path: str = os.getenv("DEDUP_DB_PATH", "processed_messages.db")  # Base SQLite de IDs procesados
+    
+    # Seguimiento de estados de entrega de WhatsApp
+    delivery_tracker_max_tracked: int = int(os.getenv("DELIVERY_TRACKER_MAX_TRACKED", "50000"))  # Mensajes esperando estados
+    delivery_tracker_hourly_retention: int = int(os.getenv("DELIVERY_TRACKER_HOURLY_RETENTION", "48"))  # Horas con detalle horario
+    delivery_tracker_daily_retention: int = int(os.getenv("DELIVERY_TRACKER_DAILY_RETENTION", "30"))  # Días consolidados
+    
+    # Elección de líder: un solo proceso reenvía las PQRS pendientes y corre las tareas periódicas
+    leader_election_enabled: bool = os.getenv("LEADER_ELECTION_ENABLED", "True").lower() == "true"  # Si es False, cada proceso las corre
+    leader_db_path: str = os.getenv("LEADER_DB_PATH", "leader.db")  # Base SQLite compartida con el lease del líder
+    leader_lease_seconds: float = float(os.getenv("LEADER_LEASE_SECONDS", "15"))  # Si el líder no lo renueva en este tiempo, otro lo reemplaza
+    
+    # Feed de cambios del dashboard (/api/pqrs/stream, Server-Sent Events)
+    change_feed_buffer_size: int = int(os.getenv("CHANGE_FEED_BUFFER_SIZE", "1000"))  # Eventos recientes para reconexiones; un cliente más atrasado se desconecta
+    change_feed_max_clients: int = int(os.getenv("CHANGE_FEED_MAX_CLIENTS", "500"))  # Conexiones abiertas como máximo
+    change_feed_heartbeat_seconds: float = float(os.getenv("CHANGE_FEED_HEARTBEAT_SECONDS", "15"))  # Comentario keep-alive si no hay eventos
+    change_feed_poll_seconds: float = float(os.getenv("CHANGE_FEED_POLL_SECONDS", "2"))  # Cada cuánto se buscan cambios de otros workers
+    
+    # Tiempo máximo de cada envío cuando se hacen en línea (sin outbox)
+    delivery_timeout: float = float(os.getenv("DELIVERY_TIMEOUT", "15"))
+    
+    # Diagnóstico: trazas por petición y profiling por muestreo (/admin/traces, /admin/profile)
+    tracing_enabled: bool = os.getenv("TRACING_ENABLED", "False").lower() == "true"  # También se activa con POST /admin/tracing
+    tracing_buffer_size: int = int(os.getenv("TRACING_BUFFER_SIZE", "10000"))  # Spans guardados en el buffer circular
+    profile_max_seconds: float = float(os.getenv("PROFILE_MAX_SECONDS", "60"))  # Duración máxima de una sesión de profiling
+    loop_watchdog_enabled: bool = os.getenv("LOOP_WATCHDOG_ENABLED", "True").lower() == "true"  # Detecta bloqueos del event loop
+    loop_watchdog_threshold_ms: float = float(os.getenv("LOOP_WATCHDOG_THRESHOLD_MS", "100"))  # Bloqueo mínimo que se registra
+    loop_watchdog_interval_ms: float = float(os.getenv("LOOP_WATCHDOG_INTERVAL_MS", "50"))  # Intervalo de medición del lag
+    
+    # Endpoints de administración (/admin/...), deshabilitados si está vacío
+    admin_token: str = os.getenv("ADMIN_TOKEN", "")
+    dashboard_session_hours: float = float(os.getenv("DASHBOARD_SESSION_HOURS", "12"))  # Duración de la sesión del dashboard compilado
+    
     # Números de teléfono de prueba
     # Número de prueba: +1 555 195 2341 (normalizado: 15551952341)
     # Número personal: +57 324 6537538 (normalizado: 573246537538)
@@ -52,7 +52,48 @@ export function usePQRSData(
   };
 
   useEffect(() => {
-    loadData();
+    let source: EventSource | null = null;
+    let closed = false;
+
+    // Cambios en vivo (/api/pqrs/stream): se aplican sobre las PQRS ya cargadas.
+    // EventSource se reconecta solo y el servidor reenvía lo que se perdió. Se
+    // abre después de la primera carga, que abre la sesión si hace falta: un
+    // EventSource rechazado con 403 no vuelve a intentar
+    const openStream = () => {
+      if (closed) {
+        return;
+      }
+      source = new EventSource("/api/pqrs/stream");
+      source.addEventListener("add", (event) => {
+        const nueva = JSON.parse((event as MessageEvent).data) as PQRS;
+        setPqrs((prev) =>
+          prev.some((item) => item.pqrs_id === nueva.pqrs_id && item.fecha_registro === nueva.fecha_registro)
+            ? prev
+            : [...prev, nueva]
+        );
+      });
+      source.addEventListener("update", (event) => {
+        const cambios = JSON.parse((event as MessageEvent).data) as Partial<PQRS>;
+        setPqrs((prev) =>
+          prev.map((item) =>
+            item.pqrs_id === cambios.pqrs_id && item.fecha_registro === cambios.fecha_registro
+              ? { ...item, ...cambios }
+              : item
+          )
+        );
+      });
+      // El servidor no tiene los eventos perdidos (reinicio o conexión lenta): recargar todo
+      source.addEventListener("reset", () => {
+        loadData();
+      });
+    };
+
+    loadData().then(openStream);
+
+    return () => {
+      closed = true;
+      source?.close();
+    };
   }, []);
 
   // Aplicar filtros a los datos
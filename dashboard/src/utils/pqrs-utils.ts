@@ -3,14 +3,46 @@
  */
 import type { PQRS, DepartmentChartData, TemporalChartData, PQRSStats } from "@/types/pqrs";
 
+// Inicio de sesión en curso: los componentes que cargan a la vez piden el token una sola vez
+let sessionRequest: Promise<boolean> | null = null;
+
 /**
- * Obtiene todas las PQRS desde el archivo pqrs_data.json
- * Lee desde public/pqrs_data.json (que se sincroniza con el archivo de la raíz)
+ * Pide el token de administración y abre una sesión del dashboard
+ * Solo hace falta con el dashboard compilado: en `npm run dev` el proxy agrega
+ * X-Admin-Token. La sesión es una cookie HttpOnly que el navegador envía también
+ * en el EventSource de /api/pqrs/stream, que no admite headers
+ */
+export function openDashboardSession(): Promise<boolean> {
+  if (!sessionRequest) {
+    sessionRequest = (async () => {
+      const token = window.prompt("Token de administración (ADMIN_TOKEN)");
+      if (!token) {
+        return false;
+      }
+      const response = await fetch("/api/dashboard/session", {
+        method: "POST",
+        headers: { "X-Admin-Token": token },
+      });
+      return response.ok;
+    })().finally(() => {
+      sessionRequest = null;
+    });
+  }
+  return sessionRequest;
+}
+
+/**
+ * Obtiene todas las PQRS desde el backend (/api/pqrs/snapshot)
+ * La respuesta trae ETag y Cache-Control: no-cache, así que el navegador
+ * revalida con If-None-Match y, si no hubo cambios, reutiliza su copia (304)
  */
 export async function getPQRSData(): Promise<PQRS[]> {
   try {
-    // Leer desde public/pqrs_data.json usando fetch
-    const response = await fetch("/pqrs_data.json");
+    let response = await fetch("/api/pqrs/snapshot");
+    // Sin sesión (o vencida): pedir el token y reintentar
+    if (response.status === 403 && (await openDashboardSession())) {
+      response = await fetch("/api/pqrs/snapshot");
+    }
     
     if (!response.ok) {
       throw new Error(`Error al cargar PQRS: ${response.status} ${response.statusText}`);
@@ -1,14 +1,39 @@
 import path from "path"
 import tailwindcss from "@tailwindcss/vite"
 import react from "@vitejs/plugin-react"
-import { defineConfig } from "vite"
+import { defineConfig, loadEnv } from "vite"
  
 // https://vite.dev/config/
-export default defineConfig({
-  plugins: [react(), tailwindcss()],
-  resolve: {
-    alias: {
-      "@": path.resolve(__dirname, "./src"),
+export default defineConfig(({ mode }) => {
+  // API_URL y ADMIN_TOKEN se leen del entorno o de dashboard/.env.local (sin prefijo
+  // VITE_, así el token queda en el servidor de desarrollo y no llega al navegador)
+  const env = loadEnv(mode, process.cwd(), "")
+
+  return {
+    plugins: [react(), tailwindcss()],
+    resolve: {
+      alias: {
+        "@": path.resolve(__dirname, "./src"),
+      },
     },
-  },
-})
\ No newline at end of file
+    server: {
+      proxy: {
+        "/api": {
+          target: env.API_URL || "http://localhost:8000",
+          changeOrigin: true,
+          headers: { "X-Admin-Token": env.ADMIN_TOKEN || "" },
+        },
+      },
+    },
+    // `npm run preview` sirve el build como en producción: sin el header, el
+    // dashboard pide el token y abre una sesión (POST /api/dashboard/session)
+    preview: {
+      proxy: {
+        "/api": {
+          target: env.API_URL || "http://localhost:8000",
+          changeOrigin: true,
+        },
+      },
+    },
+  }
+})
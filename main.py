@@ -1,18 +1,36 @@
 """
 Bot de WhatsApp con FastAPI
 """
-from fastapi import FastAPI, Request, Response, HTTPException, status, Query
-from fastapi.responses import JSONResponse
-from typing import Optional
+from fastapi import FastAPI, Request, Response, HTTPException, status, Query, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from typing import Any, Dict, Optional, Literal, Tuple
+from datetime import date, datetime, timedelta
 from contextlib import asynccontextmanager
 import logging
 import asyncio
+import time
 
 from config import settings
-from models.whatsapp import WebhookPayload, Message, SendMessageRequest, SendTemplateRequest
+from models.whatsapp import parse_webhook, SendMessageRequest, SendTemplateRequest
 from services.message_handler import MessageHandler
-from services.whatsapp_service import WhatsAppService
-from utils.security import verify_webhook_token, verify_webhook_signature, get_request_body
+from services.pqrs_storage import registro_key
+from services.dashboard_snapshot import etag_matches
+from services.pqrs_export import iter_export, MEDIA_TYPES as EXPORT_MEDIA_TYPES
+from services.http_client import create_http_client
+from services.outbox import Outbox, OutboxWorkerPool
+from services.rate_limiter import create_rate_limiter
+from services.message_dispatcher import create_sender_dispatcher
+from services.metrics import REGISTRY, WEBHOOK_LATENCY
+from services.profiler import StackSampler, ProfilerBusyError
+from services.tracing import tracer, span
+from services.loop_watchdog import create_loop_watchdog
+from services.leader_election import create_leader_election
+from services.change_feed import create_change_feed, ChangeFeedFullError
+from utils.security import (
+    verify_webhook_token, verify_webhook_signature, verify_admin_token, verify_dashboard_access,
+    create_dashboard_session, get_request_body, DASHBOARD_SESSION_COOKIE
+)
+from utils.pagination import encode_cursor, decode_cursor
 
 # Configurar logging
 logging.basicConfig(
@@ -22,27 +40,93 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 message_handler = None
+message_dispatcher = None
+loop_watchdog = None
+leader_election = None
+change_feed = None
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Maneja el ciclo de vida de la aplicación"""
-    global message_handler
+    global message_handler, message_dispatcher, loop_watchdog, leader_election, change_feed
     
     # Startup
     logger.info("🚀 Iniciando aplicación...")
-    message_handler = MessageHandler()
+    # Detecta callbacks que bloquean el event loop (I/O síncrona, CPU)
+    loop_watchdog = create_loop_watchdog()
+    if loop_watchdog is not None:
+        loop_watchdog.start()
+    # Pool de conexiones HTTP compartido por WhatsApp, Telegram y SendGrid
+    http_client = create_http_client()
     
-    # Enviar PQRS pendientes al iniciar (en background)
-    try:
-        asyncio.create_task(message_handler._send_pending_pqrs_on_startup())
-    except Exception as e:
-        logger.error(f"Error al iniciar envío de PQRS pendientes: {e}")
+    # Outbox durable: los envíos se encolan y los entregan workers en background
+    outbox = Outbox(settings.outbox_db_path) if settings.outbox_enabled else None
+    # Límites de envío por proveedor (token buckets + cuotas diarias)
+    rate_limiter = create_rate_limiter()
+    message_handler = MessageHandler(http_client=http_client, outbox=outbox, rate_limiter=rate_limiter)
+    outbox_workers = None
+    if outbox is not None:
+        outbox_workers = OutboxWorkerPool(
+            outbox,
+            handlers=message_handler.delivery_handlers,
+            providers=MessageHandler.DELIVERY_PROVIDERS,
+            concurrency={
+                "whatsapp": settings.outbox_whatsapp_concurrency,
+                "telegram": settings.outbox_telegram_concurrency,
+                "sendgrid": settings.outbox_sendgrid_concurrency
+            }
+        )
+        await outbox_workers.start()
+    
+    # Mensajes en orden por remitente y en paralelo entre remitentes
+    message_dispatcher = create_sender_dispatcher(message_handler.process_message)
+    message_dispatcher.start()
+    
+    # Gauges de /metrics (se calculan al consultar el endpoint)
+    storage = message_handler.pqrs_storage
+    REGISTRY.gauge(
+        "pqrs_conversations",
+        "Conversaciones guardadas",
+        lambda: len(message_handler.conversation_store)
+    )
+    REGISTRY.gauge("pqrs_telegram_pending", "PQRS pendientes de enviar a Telegram", storage.count_pending)
+    REGISTRY.gauge("pqrs_storage_size_bytes", "Tamaño en disco del almacenamiento de PQRS", storage.size_bytes)
+    
+    # Cambios de PQRS en vivo para el dashboard (/api/pqrs/stream)
+    change_feed = create_change_feed(poll=storage.refresh)
+    change_feed.start()
+    change_feed.close_on_exit_signals()
+    storage.add_listener(change_feed.publish, replay=False)
+    REGISTRY.gauge("pqrs_change_feed_clients", "Conexiones abiertas al feed de cambios", lambda: change_feed.clients)
+    
+    # Con varios workers o réplicas, solo el líder reenvía las PQRS pendientes
+    # (en background) y corre las tareas periódicas
+    leader_election = create_leader_election()
+    leader_election.add_job(
+        "pqrs_backlog",
+        lambda: message_handler._send_pending_pqrs_on_startup(leader_election)
+    )
+    if outbox_workers is not None:
+        leader_election.add_job("outbox_recovery", outbox_workers.recover_stale_periodically)
+    await leader_election.start()
     
     yield
     
     # Shutdown
     logger.info("👋 Cerrando aplicación...")
+    change_feed.close()
+    await leader_election.stop()
+    await message_dispatcher.stop()
+    if outbox_workers is not None:
+        await outbox_workers.stop()
+        outbox.close()
+    message_handler.pqrs_storage.close()
+    message_handler.dedup_cache.close()
+    message_handler.conversation_store.close()
+    await http_client.aclose()
+    if loop_watchdog is not None:
+        await loop_watchdog.stop()
 
 
 app = FastAPI(
@@ -100,6 +184,11 @@ async def webhook(request: Request):
     
     Procesa los mensajes recibidos y genera respuestas automáticas.
     """
+    with WEBHOOK_LATENCY.time(), span("webhook"):
+        return await _handle_webhook(request)
+
+
+async def _handle_webhook(request: Request):
     try:
         # Obtener el cuerpo de la petición
         body = await get_request_body(request)
@@ -114,28 +203,27 @@ async def webhook(request: Request):
                     detail="Firma de webhook inválida"
                 )
         
-        # Parsear el payload
-        import json
-        payload_data = json.loads(body.decode('utf-8'))
-        payload = WebhookPayload(**payload_data)
+        # Validar el payload directamente desde los bytes
+        with span("webhook.parse"):
+            events = parse_webhook(body)
+        
+        logger.info(f"Webhook recibido - object: {events.object}")
         
-        logger.info(f"Webhook recibido - object: {payload.object}")
+        # Procesar mensajes recibidos: los de un mismo número se procesan en orden,
+        # los de números distintos en paralelo
+        pending = []
+        for message in events.messages:
+            logger.info(f"Mensaje recibido de {message.from_}: {message.text.body if message.text else 'Sin texto'}")
+            pending.append(message_dispatcher.submit(message, message.from_))
         
-        # Procesar cada entrada
-        for entry in payload.entry:
-            for change in entry.changes:
-                value = change.value
-                
-                # Procesar mensajes recibidos
-                if value.messages:
-                    for message in value.messages:
-                        logger.info(f"Mensaje recibido de {message.from_}: {message.text.body if message.text else 'Sin texto'}")
-                        await message_handler.process_message(message, message.from_)
-                
-                # Procesar estados de mensajes (entregado, leído, etc.)
-                if value.statuses:
-                    for status_info in value.statuses:
-                        logger.info(f"Estado de mensaje: {status_info}")
+        # Procesar estados de mensajes (entregado, leído, etc.)
+        for status_info in events.statuses:
+            logger.info(f"Estado de mensaje: {status_info}")
+            message_handler.delivery_tracker.ingest(status_info)
+        
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Error al procesar mensaje: {result}", exc_info=result)
         
         # WhatsApp espera una respuesta 200
         return JSONResponse(
@@ -164,8 +252,7 @@ async def send_message(request_data: SendMessageRequest):
     - **preview_url**: Si se deben previsualizar URLs (opcional, por defecto False)
     """
     try:
-        whatsapp_service = WhatsAppService()
-        result = await whatsapp_service.send_text_message(
+        result = await message_handler.whatsapp_service.send_text_message(
             to=request_data.to,
             message=request_data.message,
             preview_url=request_data.preview_url
@@ -196,8 +283,7 @@ async def send_template(request_data: SendTemplateRequest):
     - **components**: Componentes opcionales de la plantilla
     """
     try:
-        whatsapp_service = WhatsAppService()
-        result = await whatsapp_service.send_template_message(
+        result = await message_handler.whatsapp_service.send_template_message(
             to=request_data.to,
             template_name=request_data.template_name,
             language_code=request_data.language_code,
@@ -216,6 +302,397 @@ async def send_template(request_data: SendTemplateRequest):
         )
 
 
+# Filtro `estadoTelegram` del dashboard -> `enviado_telegram`
+ESTADO_TELEGRAM = {"all": None, "enviadas": True, "pendientes": False}
+
+
+def _pqrs_filters(start_date: Optional[date], end_date: Optional[date],
+                  departamento: Optional[str], estado_telegram: str) -> Dict[str, Any]:
+    """Filtros del dashboard -> argumentos de `query_pqrs` (fechas inclusivas)"""
+    return {
+        "desde": start_date.isoformat() if start_date else None,
+        "hasta": (end_date + timedelta(days=1)).isoformat() if end_date else None,
+        "codigo_departamento": departamento,
+        "enviado_telegram": ESTADO_TELEGRAM[estado_telegram]
+    }
+
+
+def _parse_cursor(cursor: Optional[str]) -> Optional[Tuple[str, ...]]:
+    """Decodifica el parámetro `cursor` (400 si no es válido)"""
+    if not cursor:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@app.get("/api/pqrs", dependencies=[Depends(verify_admin_token)])
+async def list_pqrs(
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    departamento: Optional[str] = Query(None),
+    estado_telegram: Literal["all", "enviadas", "pendientes"] = Query("all"),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=500)
+):
+    """
+    PQRS paginadas con los filtros del dashboard, más recientes primero
+    
+    `start_date` y `end_date` (YYYY-MM-DD) son inclusivos. Para la página
+    siguiente se envía el `next_cursor` de la respuesta; es null en la última.
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    # Una PQRS de más indica si hay otra página
+    items = message_handler.pqrs_storage.query_pqrs(
+        **_pqrs_filters(start_date, end_date, departamento, estado_telegram),
+        before=_parse_cursor(cursor),
+        limit=limit + 1
+    )
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(registro_key(items[-1]))
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@app.get("/api/pqrs/export", dependencies=[Depends(verify_admin_token)])
+async def export_pqrs(
+    export_format: Literal["csv", "ndjson"] = Query("csv", alias="format"),
+    start_date: Optional[date] = Query(None),
+    end_date: Optional[date] = Query(None),
+    departamento: Optional[str] = Query(None),
+    estado_telegram: Literal["all", "enviadas", "pendientes"] = Query("all"),
+    cursor: Optional[str] = Query(None),
+    gzip: bool = Query(False)
+):
+    """
+    Exporta las PQRS filtradas en CSV o NDJSON, más recientes primero
+    
+    El archivo se genera por partes (memoria constante). Para continuar una
+    descarga interrumpida se envía `cursor` con la clave de la última fila
+    completa; el CSV se envía entonces sin encabezado.
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    filters = _pqrs_filters(start_date, end_date, departamento, estado_telegram)
+    content = iter_export(
+        message_handler.pqrs_storage,
+        filters,
+        export_format=export_format,
+        before=_parse_cursor(cursor),
+        compress=gzip
+    )
+    filename = f"pqrs-{datetime.now().strftime('%Y%m%d-%H%M%S')}.{export_format}"
+    media_type = EXPORT_MEDIA_TYPES[export_format]
+    if gzip:
+        filename += ".gz"
+        media_type = "application/gzip"
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@app.post("/api/dashboard/session", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(verify_admin_token)])
+async def open_dashboard_session(request: Request):
+    """
+    Abre una sesión del dashboard compilado (`npm run build`)
+    
+    Entrega una cookie HttpOnly, firmada con el ADMIN_TOKEN, con la que el navegador
+    lee `/api/pqrs/snapshot` y `/api/pqrs/stream` sin enviar el header (el
+    EventSource no puede enviarlo). Vence en `DASHBOARD_SESSION_HOURS`.
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    max_age = int(settings.dashboard_session_hours * 3600)
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    response.set_cookie(
+        DASHBOARD_SESSION_COOKIE,
+        create_dashboard_session(int(time.time()) + max_age),
+        max_age=max_age,
+        path="/api/pqrs",
+        httponly=True,
+        samesite="strict",
+        secure=request.url.scheme == "https" or request.headers.get("x-forwarded-proto") == "https"
+    )
+    return response
+
+
+@app.delete("/api/dashboard/session", status_code=status.HTTP_204_NO_CONTENT)
+async def close_dashboard_session():
+    """Cierra la sesión del dashboard (borra la cookie)"""
+    response = Response(status_code=status.HTTP_204_NO_CONTENT)
+    response.delete_cookie(DASHBOARD_SESSION_COOKIE, path="/api/pqrs")
+    return response
+
+
+@app.get("/api/pqrs/snapshot", dependencies=[Depends(verify_dashboard_access)])
+async def pqrs_snapshot(request: Request):
+    """
+    Todas las PQRS para el dashboard, con ETag
+    
+    Con `If-None-Match` igual al ETag actual responde 304 sin cuerpo. El JSON se
+    serializa una vez por versión y se envía comprimido (br/gzip) según
+    `Accept-Encoding`, también precomprimido una vez por versión.
+    
+    Requiere el header **X-Admin-Token** o la sesión del dashboard (`POST /api/dashboard/session`).
+    """
+    loop = asyncio.get_running_loop()
+    storage = message_handler.pqrs_storage
+    # Los cambios de otros workers se aplican (y notifican) en el event loop; armar
+    # el snapshot desde una copia y comprimirlo puede tomar tiempo: fuera del event loop
+    storage.refresh()
+    snapshot = await loop.run_in_executor(None, storage.get_dashboard_snapshot)
+    headers = {
+        "ETag": snapshot.etag,
+        # El navegador guarda la respuesta pero la revalida en cada fetch
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding"
+    }
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    encoding = snapshot.negotiate(request.headers.get("accept-encoding"))
+    body = await loop.run_in_executor(None, snapshot.encoded, encoding)
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.get("/api/pqrs/stream", dependencies=[Depends(verify_dashboard_access)])
+async def pqrs_stream(request: Request, last_event_id: Optional[str] = Query(None)):
+    """
+    Cambios de PQRS en vivo (Server-Sent Events)
+    
+    Eventos `add` (PQRS nueva completa), `update` (campos que cambian, como
+    `enviado_telegram`) y `reset` (volver a pedir `/api/pqrs/snapshot`). Al
+    reconectarse, el navegador envía `Last-Event-ID` y recibe solo lo que se perdió.
+    
+    Requiere el header **X-Admin-Token** o la sesión del dashboard (`POST /api/dashboard/session`).
+    """
+    try:
+        frames = change_feed.subscribe(request.headers.get("last-event-id") or last_event_id)
+    except ChangeFeedFullError as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e))
+    return StreamingResponse(
+        frames,
+        media_type="text/event-stream",
+        # Sin buffering en proxies (nginx) para que cada evento llegue de inmediato
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/api/stats", dependencies=[Depends(verify_admin_token)])
+async def pqrs_stats(
+    group_by: Literal["day", "week", "month"] = Query("day"),
+    departamento: Optional[str] = Query(None)
+):
+    """
+    Totales, PQRS por departamento, enviadas/pendientes a Telegram y serie
+    temporal con acumulado, mantenidos de forma incremental
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    storage = message_handler.pqrs_storage
+    # Incluir lo que registraron otros workers
+    storage.refresh()
+    return storage.stats.snapshot(group_by, departamento)
+
+
+@app.get("/admin/stats-check", dependencies=[Depends(verify_admin_token)])
+async def stats_check():
+    """
+    Compara las estadísticas de `/api/stats` con un recálculo desde todas las PQRS
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    storage = message_handler.pqrs_storage
+    # Los cambios de otros workers se aplican en el event loop; el recálculo
+    # recorre todas las PQRS: fuera del event loop
+    storage.refresh()
+    return await asyncio.get_running_loop().run_in_executor(None, storage.check_stats)
+
+
+@app.get("/admin/outbox", dependencies=[Depends(verify_admin_token)])
+async def outbox_status(limit: int = Query(50, ge=1, le=500)):
+    """
+    Estado del outbox de envíos: trabajos en cola por tipo/estado y últimos dead letters
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    outbox = message_handler.outbox
+    if outbox is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Outbox deshabilitado"
+        )
+    # Las consultas pueden esperar el lock de SQLite de otro worker: fuera del event loop
+    loop = asyncio.get_running_loop()
+    stats = await loop.run_in_executor(None, outbox.stats)
+    dead_letters = await loop.run_in_executor(None, outbox.list_dead_letters, limit)
+    return {
+        **stats,
+        "recent_dead_letters": dead_letters
+    }
+
+
+@app.post("/admin/outbox/dead-letters/{dead_letter_id}/requeue", dependencies=[Depends(verify_admin_token)])
+async def requeue_dead_letter(dead_letter_id: int):
+    """
+    Vuelve a encolar un envío que agotó sus reintentos
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    outbox = message_handler.outbox
+    try:
+        requeued = outbox is not None and await asyncio.get_running_loop().run_in_executor(
+            None, outbox.requeue_dead_letter, dead_letter_id
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e)
+        )
+    if not requeued:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dead letter no encontrado"
+        )
+    return {"status": "success", "requeued": dead_letter_id}
+
+
+@app.get("/admin/rate-limits", dependencies=[Depends(verify_admin_token)])
+async def rate_limits():
+    """
+    Nivel de los token buckets, envíos en espera y uso de la cuota diaria por proveedor
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    return message_handler.rate_limiter.snapshot()
+
+
+@app.get("/admin/dedup", dependencies=[Depends(verify_admin_token)])
+async def dedup_stats():
+    """
+    Caché de mensajes procesados: tamaño y reenvíos descartados (hits) vs mensajes nuevos (misses)
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    return message_handler.dedup_cache.stats()
+
+
+@app.get("/admin/dispatcher", dependencies=[Depends(verify_admin_token)])
+async def dispatcher_stats():
+    """
+    Despachador de mensajes: remitentes activos, mensajes en cola y tiempos de espera
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    return message_dispatcher.stats()
+
+
+@app.get("/admin/leader", dependencies=[Depends(verify_admin_token)])
+async def leader_status():
+    """
+    Elección de líder: proceso líder actual, vencimiento del lease y tareas en curso
+
+    Requiere el header **X-Admin-Token**.
+    """
+    # La consulta puede esperar el lock de SQLite de otro worker: fuera del event loop
+    return await asyncio.get_running_loop().run_in_executor(None, leader_election.status)
+
+
+@app.get("/admin/change-feed", dependencies=[Depends(verify_admin_token)])
+async def change_feed_stats():
+    """
+    Feed de cambios del dashboard: conexiones abiertas, eventos en el buffer y clientes lentos desconectados
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    return change_feed.stats()
+
+
+@app.get("/admin/delivery-stats", dependencies=[Depends(verify_admin_token)])
+async def delivery_stats(hours: int = Query(24, ge=1, le=168)):
+    """
+    Estados de entrega de WhatsApp por hora: enviados, entregados, leídos, fallidos,
+    tasa de fallos y percentiles (p50/p90/p99) de envío→entrega y entrega→lectura
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    return message_handler.delivery_tracker.stats(hours)
+
+
+@app.get("/admin/loop-blocking", dependencies=[Depends(verify_admin_token)])
+async def loop_blocking(limit: int = Query(20, ge=1, le=100)):
+    """
+    Lag del event loop y pilas de los callbacks que más lo bloquearon
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    if loop_watchdog is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="El watchdog del event loop está deshabilitado"
+        )
+    return loop_watchdog.stats(limit=limit)
+
+
+@app.post("/admin/profile", dependencies=[Depends(verify_admin_token)])
+async def profile(
+    seconds: float = Query(10, gt=0),
+    interval_ms: float = Query(5, ge=1, le=1000)
+):
+    """
+    Profiling por muestreo durante `seconds` segundos
+    
+    Devuelve las pilas en formato collapsed (flamegraph.pl, speedscope).
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    seconds = min(seconds, settings.profile_max_seconds)
+    sampler = StackSampler(interval=interval_ms / 1000)
+    try:
+        # El muestreo corre en otro hilo para poder observar al event loop
+        stacks = await asyncio.get_running_loop().run_in_executor(None, sampler.run, seconds)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return PlainTextResponse(stacks, headers={"X-Profile-Samples": str(sampler.samples)})
+
+
+@app.post("/admin/tracing", dependencies=[Depends(verify_admin_token)])
+async def configure_tracing(
+    enabled: bool = Query(...),
+    buffer_size: Optional[int] = Query(None, ge=100, le=1_000_000)
+):
+    """
+    Habilita o deshabilita las trazas por petición
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    tracer.configure(enabled, buffer_size)
+    return {"enabled": tracer.enabled, "buffer_size": tracer.spans.maxlen, "spans": len(tracer.spans)}
+
+
+@app.get("/admin/traces", dependencies=[Depends(verify_admin_token)])
+async def traces(
+    limit: int = Query(20, ge=1, le=500),
+    name: Optional[str] = Query(None),
+    min_ms: float = Query(0, ge=0)
+):
+    """
+    Trazas más recientes del buffer circular
+    
+    Requiere el header **X-Admin-Token**.
+    """
+    return {
+        "enabled": tracer.enabled,
+        "traces": tracer.traces(limit=limit, name=name, min_ms=min_ms)
+    }
+
+
 @app.get("/health")
 async def health_check():
     """Endpoint de health check"""
@@ -225,6 +702,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics")
+async def metrics():
+    """Métricas en formato de texto de Prometheus"""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
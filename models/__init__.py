@@ -7,6 +7,8 @@ from .whatsapp import (
     Change,
     Entry,
     WebhookPayload,
+    WebhookEvents,
+    parse_webhook,
     SendMessageRequest,
     SendMessageResponse
 )
@@ -19,6 +21,8 @@ __all__ = [
     "Change",
     "Entry",
     "WebhookPayload",
+    "WebhookEvents",
+    "parse_webhook",
     "SendMessageRequest",
     "SendMessageResponse"
 ]
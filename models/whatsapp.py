@@ -1,8 +1,15 @@
 """
 Modelos de datos para la API de WhatsApp
 """
-from typing import Optional, List, Dict, Any
-from pydantic import BaseModel, Field
+import re
+from typing import Optional, List, Dict, Any, NamedTuple
+from pydantic import BaseModel, Field, TypeAdapter
+from pydantic_core import from_json
+
+try:
+    import orjson
+except ImportError:  # Opcional: acelera los webhooks que solo traen estados
+    orjson = None
 
 
 class Contact(BaseModel):
@@ -55,6 +62,60 @@ class WebhookPayload(BaseModel):
     entry: List[Entry]
 
 
+# Validador construido una sola vez (construirlo en cada webhook es costoso)
+_WEBHOOK_ADAPTER = TypeAdapter(WebhookPayload)
+# Clave "messages" de un `Value` (el campo "field" también vale "messages", por eso se exige el ":")
+_MESSAGES_KEY_RE = re.compile(rb'"messages"\s*:')
+
+
+class WebhookEvents(NamedTuple):
+    """Mensajes y estados de un webhook, ya aplanados"""
+    object: str
+    messages: List[Message]
+    statuses: List[Dict[str, Any]]
+
+
+def parse_webhook(body: bytes) -> WebhookEvents:
+    """
+    Valida el cuerpo de un webhook directamente desde los bytes
+    
+    La mayoría de los webhooks solo traen estados (enviado, entregado, leído); si el
+    cuerpo no contiene mensajes, se extraen los estados sin construir los modelos
+    de `WebhookPayload`.
+    
+    Args:
+        body: Cuerpo de la petición en bytes
+        
+    Returns:
+        Mensajes y estados del webhook
+        
+    Raises:
+        ValueError: Si el cuerpo no es un webhook válido
+    """
+    if _MESSAGES_KEY_RE.search(body) is None:
+        data = orjson.loads(body) if orjson is not None else from_json(body)
+        if not isinstance(data, dict):
+            raise ValueError("El webhook debe ser un objeto JSON")
+        statuses = [
+            status
+            for entry in data.get("entry") or []
+            for change in entry.get("changes") or []
+            for status in (change.get("value") or {}).get("statuses") or []
+        ]
+        return WebhookEvents(data.get("object", ""), [], statuses)
+    
+    payload = _WEBHOOK_ADAPTER.validate_json(body)
+    messages: List[Message] = []
+    statuses: List[Dict[str, Any]] = []
+    for entry in payload.entry:
+        for change in entry.changes:
+            if change.value.messages:
+                messages.extend(change.value.messages)
+            if change.value.statuses:
+                statuses.extend(change.value.statuses)
+    return WebhookEvents(payload.object, messages, statuses)
+
+
 class SendMessageRequest(BaseModel):
     """Modelo para enviar mensaje"""
     to: str
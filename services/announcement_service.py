@@ -5,6 +5,9 @@ import httpx
 from typing import Optional, Dict, Any
 import logging
 from config import settings
+from services.http_client import use_client
+from services.metrics import track_outbound
+from services.rate_limiter import RateLimiter, PRIORITY_ALERT, acquire_slot, raise_if_rate_limited
 
 logger = logging.getLogger(__name__)
 
@@ -12,7 +15,16 @@ logger = logging.getLogger(__name__)
 class TelegramAnnouncementService:
     """Servicio para enviar anuncios a un canal de Telegram"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        # Cliente HTTP compartido (si es None se abre uno por llamada)
+        self.client = client
+        # Limitador de envíos compartido (si es None no se limita)
+        self.rate_limiter = rate_limiter
+        self.timeout = settings.telegram_timeout
         self.bot_token = settings.telegram_bot_token
         self.channel_id = settings.telegram_channel_id
         if self.bot_token:
@@ -20,15 +32,24 @@ class TelegramAnnouncementService:
         else:
             self.base_url = None
     
-    async def send_announcement(self, message: str) -> Dict[str, Any]:
+    @property
+    def is_configured(self) -> bool:
+        """Indica si hay bot y canal de Telegram configurados"""
+        return bool(self.bot_token and self.channel_id and self.base_url)
+    
+    async def send_announcement(self, message: str, priority: int = PRIORITY_ALERT) -> Dict[str, Any]:
         """
         Envía un anuncio al canal de Telegram
         
         Args:
             message: Mensaje a enviar
+            priority: Clase de prioridad para el limitador de envíos
             
         Returns:
             Respuesta de la API de Telegram
+            
+        Raises:
+            RateLimitedError: Si Telegram responde 429 o no hay cupo para enviar
         """
         if not self.bot_token or not self.channel_id or not self.base_url:
             logger.warning("Telegram no configurado. Saltando envío de anuncio.")
@@ -42,10 +63,13 @@ class TelegramAnnouncementService:
             "parse_mode": "HTML"  # Permite formato HTML básico
         }
         
-        async with httpx.AsyncClient() as client:
+        await acquire_slot(self.rate_limiter, "telegram", priority)
+        async with use_client(self.client) as client:
             try:
-                response = await client.post(url, json=payload, timeout=30.0)
-                response.raise_for_status()
+                with track_outbound("telegram"):
+                    response = await client.post(url, json=payload, timeout=self.timeout)
+                    raise_if_rate_limited(self.rate_limiter, "telegram", response)
+                    response.raise_for_status()
                 result = response.json()
                 
                 # Si es exitoso, retornar
@@ -67,16 +91,21 @@ class TelegramAnnouncementService:
                     for alt_id in alternative_ids:
                         logger.info(f"Probando con ID alternativo: {alt_id}")
                         alt_payload = {**payload, "chat_id": alt_id}
+                        # El reintento usa el turno ya tomado para este anuncio; un 429
+                        # (`RateLimitedError`) se propaga como en el primer envío
                         try:
-                            alt_response = await client.post(url, json=alt_payload, timeout=30.0)
+                            with track_outbound("telegram"):
+                                alt_response = await client.post(url, json=alt_payload, timeout=self.timeout)
+                                raise_if_rate_limited(self.rate_limiter, "telegram", alt_response)
                             alt_result = alt_response.json()
-                            if alt_result.get("ok"):
-                                logger.info(f"✅ Éxito con ID alternativo: {alt_id}")
-                                # Actualizar el ID configurado
-                                self.channel_id = alt_id
-                                return alt_result
-                        except Exception:
+                        except (httpx.RequestError, ValueError) as e:
+                            logger.warning(f"Error al probar el ID alternativo {alt_id}: {e}")
                             continue
+                        if alt_result.get("ok"):
+                            logger.info(f"✅ Éxito con ID alternativo: {alt_id}")
+                            # Actualizar el ID configurado
+                            self.channel_id = alt_id
+                            return alt_result
                     
                     logger.error(f"No se pudo encontrar el canal con ningún formato. Error: {error_desc}")
                     logger.error("Verifica que:")
@@ -98,7 +127,8 @@ class TelegramAnnouncementService:
         pqrs_id: str,
         departamento: str,
         descripcion: str,
-        cantidad_similar: int = 0
+        cantidad_similar: int = 0,
+        priority: int = PRIORITY_ALERT
     ) -> Dict[str, Any]:
         """
         Envía una alerta de PQRS al canal
@@ -108,6 +138,7 @@ class TelegramAnnouncementService:
             departamento: Departamento afectado
             descripcion: Descripción del problema
             cantidad_similar: Cantidad de quejas similares (para alertas)
+            priority: Clase de prioridad para el limitador de envíos
             
         Returns:
             Respuesta de la API
@@ -130,7 +161,7 @@ class TelegramAnnouncementService:
                 f"Se ha dirigido al área encargada."
             )
         
-        return await self.send_announcement(message)
+        return await self.send_announcement(message, priority)
     
     async def send_general_announcement(self, title: str, message: str) -> Dict[str, Any]:
         """
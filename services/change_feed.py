@@ -0,0 +1,272 @@
+"""
+Feed de cambios de PQRS para el dashboard (Server-Sent Events)
+
+Cada cambio del almacenamiento (listener "add"/"update") se serializa una sola
+vez como un frame SSE y se guarda en un buffer circular compartido. Cada
+conexión solo guarda su posición en ese buffer, así que cientos de pestañas
+abiertas no multiplican ni la serialización ni la memoria.
+
+- Los IDs de evento son `<epoch>-<seq>`; el epoch cambia en cada inicio del
+  proceso. Al reconectarse, el navegador envía `Last-Event-ID` y recibe solo
+  los eventos siguientes.
+- Si ese ID ya no está en el buffer (reconexión tardía, reinicio del servidor),
+  se envía un evento `reset`: el dashboard debe volver a pedir el snapshot.
+- Un cliente lento al que el buffer le pasa por encima recibe `reset` y se
+  desconecta, en lugar de acumular eventos en memoria.
+"""
+import asyncio
+import json
+import signal
+import threading
+import time
+import uuid
+from collections import deque
+from itertools import islice
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Campos que no cambian después de registrar la PQRS; no se repiten en "update"
+IMMUTABLE_FIELDS = ("departamento", "codigo_departamento", "descripcion", "fecha", "telefono")
+
+# Frames enviados juntos como máximo al ponerse al día
+MAX_BATCH = 100
+
+# Milisegundos que espera el navegador antes de reconectarse
+RETRY_MS = 3000
+
+
+class ChangeFeedFullError(Exception):
+    """Se alcanzó el máximo de conexiones abiertas"""
+
+
+class ChangeFeed:
+    """Buffer circular de eventos SSE compartido por todas las conexiones"""
+
+    def __init__(
+        self,
+        buffer_size: int = 1000,
+        max_clients: int = 500,
+        heartbeat_seconds: float = 15,
+        poll_seconds: float = 2,
+        poll: Optional[Callable[[], None]] = None
+    ):
+        """
+        Args:
+            buffer_size: Eventos recientes que se conservan para reconexiones
+            max_clients: Conexiones abiertas como máximo
+            heartbeat_seconds: Sin eventos, se envía un comentario keep-alive con esta frecuencia
+            poll_seconds: Cada cuánto se llama a `poll` mientras haya conexiones
+            poll: Función que aplica los cambios de otros procesos (se llama en el event loop:
+                notifica a los listeners del almacenamiento en el mismo hilo que las
+                operaciones del bot)
+        """
+        self.epoch = uuid.uuid4().hex[:8]
+        self.max_clients = max_clients
+        self.heartbeat_seconds = heartbeat_seconds
+        self.poll_seconds = poll_seconds
+        self._poll = poll
+        # (seq, frame); los seq son consecutivos
+        self._buffer: Deque[Tuple[int, bytes]] = deque(maxlen=buffer_size)
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._last_poll = 0.0
+        self._closed = False
+        self.clients = 0
+        self.dropped = 0
+        self.resets = 0
+
+    def start(self) -> None:
+        """Asocia el feed al event loop actual (los eventos pueden publicarse desde otros hilos)"""
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+    def close(self) -> None:
+        """Termina las conexiones abiertas (al apagar el servidor; se puede llamar desde un signal handler)"""
+        self._closed = True
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def close_on_exit_signals(self) -> None:
+        """
+        Cierra las conexiones al recibir SIGINT/SIGTERM, antes que el handler de uvicorn
+
+        Uvicorn espera a que terminen las respuestas en curso antes de apagarse y
+        las conexiones SSE no terminan solas. Solo funciona en el hilo principal.
+        """
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            previous = signal.getsignal(signum)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                self.close()
+                previous(signum, frame)
+
+            try:
+                signal.signal(signum, handler)
+            except ValueError:
+                # Fuera del hilo principal (por ejemplo, TestClient)
+                return
+
+    # ------------------------------------------------------------------
+    # Publicación
+    # ------------------------------------------------------------------
+
+    def publish(self, event: str, record: Dict[str, Any]) -> None:
+        """Listener del almacenamiento (`add_listener`): agrega el cambio al buffer"""
+        if event == "update":
+            data = {key: value for key, value in record.items() if key not in IMMUTABLE_FIELDS}
+        else:
+            data = record
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+        with self._lock:
+            self._seq += 1
+            frame = f"id: {self.epoch}-{self._seq}\nevent: {event}\ndata: {payload}\n\n".encode("utf-8")
+            self._buffer.append((self._seq, frame))
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        # Despierta a todas las conexiones que esperan y prepara la siguiente espera
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    # ------------------------------------------------------------------
+    # Suscripción
+    # ------------------------------------------------------------------
+
+    def _resume_position(self, last_event_id: Optional[str]) -> Tuple[int, Optional[str]]:
+        """
+        Posición desde la que se envían eventos a una conexión nueva
+
+        Returns:
+            `(último seq ya recibido, motivo de reset o None)`
+        """
+        with self._lock:
+            current = self._seq
+            oldest = self._buffer[0][0] if self._buffer else current + 1
+        if not last_event_id:
+            return current, None
+        epoch, _, seq = last_event_id.partition("-")
+        if epoch != self.epoch or not seq.isdigit() or int(seq) > current:
+            return current, "restarted"
+        if int(seq) < oldest - 1:
+            return current, "expired"
+        return int(seq), None
+
+    def _read_since(self, position: int) -> Tuple[List[bytes], int, bool]:
+        """
+        Frames posteriores a `position`
+
+        Returns:
+            `(frames, nueva posición, perdido)`; perdido es True si el buffer ya
+            descartó eventos que esta conexión no recibió
+        """
+        with self._lock:
+            if position >= self._seq:
+                return [], position, False
+            oldest = self._buffer[0][0]
+            if position < oldest - 1:
+                return [], self._seq, True
+            frames = [frame for _, frame in islice(self._buffer, position - oldest + 1, position - oldest + 1 + MAX_BATCH)]
+        return frames, position + len(frames), False
+
+    def _reset_frame(self, position: int, reason: str) -> bytes:
+        # Lleva ID: al reconectarse, el navegador continúa desde aquí
+        self.resets += 1
+        data = json.dumps({"reason": reason})
+        return f"id: {self.epoch}-{position}\nevent: reset\ndata: {data}\n\n".encode("utf-8")
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> AsyncIterator[bytes]:
+        """
+        Abre una conexión al feed
+
+        Args:
+            last_event_id: Header `Last-Event-ID` (o parámetro) de una reconexión
+
+        Returns:
+            Generador async con los frames SSE
+
+        Raises:
+            ChangeFeedFullError: Si ya hay `max_clients` conexiones abiertas
+        """
+        if self.clients >= self.max_clients:
+            raise ChangeFeedFullError(f"Máximo de {self.max_clients} conexiones al feed alcanzado")
+        return self._stream(last_event_id)
+
+    async def _stream(self, last_event_id: Optional[str]) -> AsyncIterator[bytes]:
+        # Se cuenta al empezar: si la respuesta se cancela antes, el generador no corre
+        self.clients += 1
+        try:
+            position, reason = self._resume_position(last_event_id)
+            yield f"retry: {RETRY_MS}\n\n".encode()
+            if reason is not None:
+                yield self._reset_frame(position, reason)
+            last_write = time.monotonic()
+            while not self._closed:
+                # Se toma el Event antes de leer: un evento publicado después lo activa
+                changed = self._changed
+                frames, position, lost = self._read_since(position)
+                if lost:
+                    # El cliente no consumió a tiempo; se corta en lugar de acumular
+                    self.dropped += 1
+                    logger.warning("Cliente lento del feed de cambios desconectado")
+                    yield self._reset_frame(position, "slow_consumer")
+                    return
+                if frames:
+                    yield b"".join(frames)
+                    last_write = time.monotonic()
+                    continue
+                try:
+                    await asyncio.wait_for(changed.wait(), timeout=min(self.poll_seconds, self.heartbeat_seconds))
+                except asyncio.TimeoutError:
+                    self._maybe_poll()
+                    if time.monotonic() - last_write >= self.heartbeat_seconds:
+                        yield b": ping\n\n"
+                        last_write = time.monotonic()
+        finally:
+            self.clients -= 1
+
+    def _maybe_poll(self) -> None:
+        """Busca cambios de otros procesos (una sola vez por intervalo para todas las conexiones)"""
+        if self._poll is None or time.monotonic() - self._last_poll < self.poll_seconds:
+            return
+        self._last_poll = time.monotonic()
+        # En el event loop, no en el executor: los listeners del almacenamiento
+        # (índice de similitud, estadísticas, este feed) no admiten llamadas concurrentes
+        try:
+            self._poll()
+        except Exception as e:
+            logger.error(f"Error al buscar cambios de otros procesos: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Conexiones abiertas, eventos en el buffer y clientes desconectados por lentos"""
+        with self._lock:
+            buffered = len(self._buffer)
+            last_id = f"{self.epoch}-{self._seq}"
+        return {
+            "clients": self.clients,
+            "max_clients": self.max_clients,
+            "last_event_id": last_id,
+            "buffered_events": buffered,
+            "buffer_size": self._buffer.maxlen,
+            "dropped_slow_clients": self.dropped,
+            "resets": self.resets
+        }
+
+
+def create_change_feed(poll: Optional[Callable[[], None]] = None) -> ChangeFeed:
+    """Crea el feed de cambios con la configuración de `settings`"""
+    return ChangeFeed(
+        buffer_size=settings.change_feed_buffer_size,
+        max_clients=settings.change_feed_max_clients,
+        heartbeat_seconds=settings.change_feed_heartbeat_seconds,
+        poll_seconds=settings.change_feed_poll_seconds,
+        poll=poll
+    )
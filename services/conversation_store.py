@@ -0,0 +1,252 @@
+"""
+Almacenamiento del estado de las conversaciones del bot
+
+Cada número que escribe tiene un `ConversationState` (estado del flujo PQRS,
+departamento elegido, descripción y PQRS generada). Hay dos implementaciones:
+
+- `MemoryConversationStore`: LRU en memoria con TTL; las conversaciones
+  abandonadas se descartan y el tamaño está acotado.
+- `SQLiteConversationStore`: tabla SQLite compartida entre varios procesos
+  (por ejemplo `uvicorn --workers N`), con el mismo TTL.
+"""
+import json
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+ESTADO_INICIAL = "inicial"
+
+
+class ConversationState:
+    """Estado de la conversación de un número"""
+
+    __slots__ = ("estado", "departamento", "descripcion", "pqrs_id", "fecha_inicio", "updated_at")
+
+    def __init__(
+        self,
+        estado: str = ESTADO_INICIAL,
+        departamento: Optional[Dict[str, str]] = None,
+        descripcion: Optional[str] = None,
+        pqrs_id: Optional[str] = None,
+        fecha_inicio: Optional[float] = None,
+        updated_at: Optional[float] = None
+    ):
+        now = time.time()
+        self.estado = estado
+        # Referencia a una entrada de `MessageHandler.DEPARTAMENTOS` (no se copia)
+        self.departamento = departamento
+        self.descripcion = descripcion
+        self.pqrs_id = pqrs_id
+        self.fecha_inicio = fecha_inicio if fecha_inicio is not None else now
+        self.updated_at = updated_at if updated_at is not None else now
+
+    def __repr__(self) -> str:
+        return f"ConversationState(estado={self.estado!r}, pqrs_id={self.pqrs_id!r})"
+
+
+class ConversationStore(ABC):
+    """Interfaz común de los almacenamientos de conversaciones"""
+
+    def __init__(self, ttl: float):
+        """
+        Args:
+            ttl: Segundos sin actividad tras los cuales una conversación se descarta
+        """
+        self.ttl = ttl
+
+    @abstractmethod
+    def get(self, from_number: str) -> ConversationState:
+        """Obtiene la conversación del número (una nueva si no existe o expiró)"""
+
+    @abstractmethod
+    def save(self, from_number: str, state: ConversationState) -> None:
+        """Guarda la conversación del número y renueva su TTL"""
+
+    @abstractmethod
+    def delete(self, from_number: str) -> None:
+        """Elimina la conversación del número"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Cantidad de conversaciones guardadas"""
+
+    def reset(self, from_number: str) -> ConversationState:
+        """Reinicia la conversación del número"""
+        state = ConversationState()
+        self.save(from_number, state)
+        return state
+
+    def close(self) -> None:
+        """Libera los recursos del almacenamiento"""
+
+    def _expired(self, state: ConversationState, now: float) -> bool:
+        return self.ttl > 0 and now - state.updated_at >= self.ttl
+
+
+class MemoryConversationStore(ConversationStore):
+    """LRU en memoria con TTL (solo sirve con un proceso)"""
+
+    def __init__(self, max_size: int = 100_000, ttl: float = 86400):
+        """
+        Args:
+            max_size: Máximo de conversaciones (se descartan las menos recientes)
+            ttl: Segundos sin actividad tras los cuales una conversación se descarta
+        """
+        super().__init__(ttl)
+        self.max_size = max_size
+        self._states: "OrderedDict[str, ConversationState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._states)
+
+    def _evict(self, now: float) -> None:
+        # En orden de uso: las más antiguas están al inicio
+        while self._states:
+            oldest = next(iter(self._states.values()))
+            if len(self._states) <= self.max_size and not self._expired(oldest, now):
+                break
+            self._states.popitem(last=False)
+
+    def get(self, from_number: str) -> ConversationState:
+        now = time.time()
+        with self._lock:
+            state = self._states.get(from_number)
+            if state is None or self._expired(state, now):
+                state = ConversationState()
+                self._states[from_number] = state
+            else:
+                state.updated_at = now
+            self._states.move_to_end(from_number)
+            self._evict(now)
+            return state
+
+    def save(self, from_number: str, state: ConversationState) -> None:
+        now = time.time()
+        state.updated_at = now
+        with self._lock:
+            self._states[from_number] = state
+            self._states.move_to_end(from_number)
+            self._evict(now)
+
+    def delete(self, from_number: str) -> None:
+        with self._lock:
+            self._states.pop(from_number, None)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    from_number TEXT PRIMARY KEY,
+    estado TEXT NOT NULL,
+    departamento TEXT,
+    descripcion TEXT,
+    pqrs_id TEXT,
+    fecha_inicio REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_updated_at ON conversations (updated_at);
+"""
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversaciones en SQLite, compartidas entre procesos"""
+
+    # Cada cuántas escrituras se borran las conversaciones expiradas
+    PURGE_EVERY = 1000
+
+    def __init__(self, db_path: str = "conversations.db", ttl: float = 86400):
+        """
+        Args:
+            db_path: Ruta de la base SQLite
+            ttl: Segundos sin actividad tras los cuales una conversación se descarta
+        """
+        super().__init__(ttl)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+    def get(self, from_number: str) -> ConversationState:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM conversations WHERE from_number = ?", (from_number,)
+            ).fetchone()
+        if row is not None:
+            state = ConversationState(
+                estado=row["estado"],
+                departamento=json.loads(row["departamento"]) if row["departamento"] else None,
+                descripcion=row["descripcion"],
+                pqrs_id=row["pqrs_id"],
+                fecha_inicio=row["fecha_inicio"],
+                updated_at=row["updated_at"]
+            )
+            if not self._expired(state, time.time()):
+                return state
+        # Las conversaciones nuevas se guardan con el primer `save`
+        return ConversationState()
+
+    def save(self, from_number: str, state: ConversationState) -> None:
+        state.updated_at = time.time()
+        departamento = json.dumps(state.departamento, ensure_ascii=False) if state.departamento else None
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    "INSERT INTO conversations (from_number, estado, departamento, descripcion, pqrs_id, "
+                    "fecha_inicio, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(from_number) DO UPDATE SET estado = excluded.estado, "
+                    "departamento = excluded.departamento, descripcion = excluded.descripcion, "
+                    "pqrs_id = excluded.pqrs_id, fecha_inicio = excluded.fecha_inicio, "
+                    "updated_at = excluded.updated_at",
+                    (from_number, state.estado, departamento, state.descripcion, state.pqrs_id,
+                     state.fecha_inicio, state.updated_at)
+                )
+            self._writes += 1
+            if self.ttl > 0 and self._writes % self.PURGE_EVERY == 0:
+                self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        with self._conn:
+            cursor = self._conn.execute(
+                "DELETE FROM conversations WHERE updated_at < ?", (time.time() - self.ttl,)
+            )
+        if cursor.rowcount:
+            logger.info(f"{cursor.rowcount} conversaciones expiradas eliminadas")
+
+    def delete(self, from_number: str) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM conversations WHERE from_number = ?", (from_number,))
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def create_conversation_store() -> ConversationStore:
+    """Crea el almacenamiento de conversaciones configurado en `settings.conversation_store`"""
+    backend = settings.conversation_store.lower()
+    if backend == "sqlite":
+        return SQLiteConversationStore(settings.conversation_db_path, ttl=settings.conversation_ttl_seconds)
+    if backend != "memory":
+        logger.warning(f"Almacenamiento de conversaciones desconocido '{backend}'. Usando memoria.")
+    return MemoryConversationStore(
+        max_size=settings.conversation_max_size,
+        ttl=settings.conversation_ttl_seconds
+    )
@@ -0,0 +1,140 @@
+"""
+Snapshot de las PQRS para el dashboard con ETag y variantes precomprimidas
+
+El dashboard vuelve a pedir todas las PQRS en cada refresco. El snapshot se
+serializa una sola vez por versión (JSON compacto, sin `indent`), con un ETag
+calculado del contenido, y sus variantes gzip/brotli se comprimen una sola vez
+la primera vez que alguien las pide. Una consulta con `If-None-Match` igual al
+ETag actual recibe 304 sin cuerpo.
+
+Cualquier cambio en las PQRS (listener del almacenamiento) invalida la versión;
+la siguiente petición arma la nueva.
+"""
+import gzip
+import hashlib
+import json
+import threading
+from typing import List, Dict, Any, Optional, Callable
+import logging
+
+try:
+    import orjson
+except ImportError:  # Opcional: serializa el snapshot más rápido
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin el paquete solo se ofrece gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def _serialize(records: List[Dict[str, Any]]) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(records)
+    return json.dumps(records, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Indica si el header `If-None-Match` incluye el ETag (comparación débil)
+
+    Args:
+        if_none_match: Valor del header (lista separada por comas o "*")
+        etag: ETag actual, entre comillas
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        # Un proxy que recomprime puede marcar el ETag como débil
+        if candidate == "*" or candidate.replace("W/", "", 1) == etag:
+            return True
+    return False
+
+
+class SnapshotVersion:
+    """Una versión serializada del snapshot y sus variantes comprimidas"""
+
+    def __init__(self, body: bytes, records: int):
+        self.records = records
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+        self._variants: Dict[str, bytes] = {"identity": body}
+        self._lock = threading.Lock()
+
+    def negotiate(self, accept_encoding: Optional[str]) -> str:
+        """
+        Elige la codificación según el header `Accept-Encoding`
+
+        Returns:
+            "br", "gzip" o "identity"
+        """
+        accepted = set()
+        for part in (accept_encoding or "").lower().split(","):
+            name, _, params = part.strip().partition(";")
+            params = params.replace(" ", "")
+            if params.startswith("q="):
+                try:
+                    if float(params[2:]) <= 0:
+                        continue
+                except ValueError:
+                    continue
+            accepted.add(name.strip())
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return "identity"
+
+    def encoded(self, encoding: str) -> bytes:
+        """Cuerpo en la codificación dada; se comprime solo la primera vez"""
+        with self._lock:
+            body = self._variants.get(encoding)
+            if body is None:
+                identity = self._variants["identity"]
+                if encoding == "br":
+                    body = brotli.compress(identity, quality=BROTLI_QUALITY)
+                elif encoding == "gzip":
+                    body = gzip.compress(identity, compresslevel=GZIP_LEVEL, mtime=0)
+                else:
+                    raise ValueError(f"Codificación desconocida: {encoding}")
+                self._variants[encoding] = body
+                logger.debug(f"Snapshot del dashboard comprimido con {encoding}: {len(identity)} -> {len(body)} bytes")
+            return body
+
+
+class DashboardSnapshot:
+    """Versión actual del snapshot; se rearma solo cuando cambiaron las PQRS"""
+
+    def __init__(self):
+        # Se incrementa con cada cambio; la versión armada guarda el valor con el que se armó
+        self._changes = 0
+        self._built_at = -1
+        self._version: Optional[SnapshotVersion] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Marca el snapshot como desactualizado"""
+        # Sin lock: solo lo llama el listener del almacenamiento, siempre desde el
+        # event loop; `get` (en el executor) solo lee el contador
+        self._changes += 1
+
+    def get(self, load_records: Callable[[], List[Dict[str, Any]]]) -> SnapshotVersion:
+        """
+        Versión actual del snapshot
+
+        Args:
+            load_records: Función que retorna todas las PQRS (solo se llama si hubo cambios)
+        """
+        with self._lock:
+            if self._version is None or self._built_at != self._changes:
+                changes = self._changes
+                records = load_records()
+                self._version = SnapshotVersion(_serialize(records), len(records))
+                # Si hubo cambios mientras se armaba, la próxima petición la rearma
+                self._built_at = changes
+            return self._version
@@ -0,0 +1,299 @@
+"""
+Caché de IDs de mensajes ya procesados para que el webhook sea idempotente
+
+Meta reenvía el webhook cuando nuestro 200 tarda; sin este control, una
+descripción reenviada crea otra PQRS, otro correo y otra alerta. Hay dos
+implementaciones:
+
+- `MessageDedupCache`: LRU acotado con TTL en memoria que, opcionalmente, se
+  guarda en un archivo de líneas `<timestamp>\\t<message_id>` para sobrevivir a
+  los reinicios. Solo sirve con un proceso.
+- `SQLiteMessageDedupCache`: tabla SQLite compartida entre varios workers; un
+  reenvío que llega a otro proceso también se descarta. Es la opción por
+  defecto siempre que las PQRS se puedan compartir entre procesos.
+"""
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import logging
+
+from config import settings
+from utils.file_lock import FILE_LOCKS_SUPPORTED
+
+logger = logging.getLogger(__name__)
+
+# Segundos que una escritura espera a que otro proceso libere la base
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS processed_messages (
+    message_id TEXT PRIMARY KEY,
+    seen_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_processed_messages_seen_at ON processed_messages (seen_at);
+"""
+
+
+class DedupCache(ABC):
+    """Interfaz común de las cachés de mensajes procesados"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    @abstractmethod
+    def check_and_add(self, message_id: str) -> bool:
+        """
+        Registra un ID de mensaje
+
+        Args:
+            message_id: ID del mensaje de WhatsApp
+
+        Returns:
+            True si el mensaje ya se había procesado (hay que descartarlo)
+        """
+
+    @abstractmethod
+    def stats(self) -> Dict[str, Any]:
+        """Tamaño de la caché y contadores de aciertos (duplicados) y fallos (mensajes nuevos)"""
+
+    def close(self) -> None:
+        pass
+
+
+class MessageDedupCache(DedupCache):
+    """LRU con TTL de IDs de mensajes de WhatsApp"""
+
+    def __init__(self, max_size: int = 10000, ttl: float = 86400, persist_path: Optional[str] = None):
+        """
+        Args:
+            max_size: Máximo de IDs recordados (se descartan los más antiguos)
+            ttl: Segundos que se recuerda cada ID
+            persist_path: Archivo donde se guardan los IDs (None = solo en memoria)
+        """
+        super().__init__(ttl)
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._file = None
+        self._file_lines = 0
+        if persist_path:
+            self._load()
+            self._file = open(persist_path, "a", encoding="utf-8")
+
+    def _load(self) -> None:
+        if not os.path.exists(self.persist_path):
+            return
+        now = time.time()
+        try:
+            with open(self.persist_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    self._file_lines += 1
+                    timestamp, _, message_id = line.rstrip("\n").partition("\t")
+                    try:
+                        seen_at = float(timestamp)
+                    except ValueError:
+                        continue
+                    if message_id and now - seen_at < self.ttl:
+                        self._entries[message_id] = seen_at
+                        self._entries.move_to_end(message_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            logger.info(f"{len(self._entries)} IDs de mensajes procesados cargados de {self.persist_path}")
+        except Exception as e:
+            logger.error(f"Error al cargar IDs procesados de {self.persist_path}: {e}")
+
+    def _evict_expired(self, now: float) -> None:
+        # Las entradas están en orden de llegada: basta revisar el inicio
+        while self._entries:
+            message_id, seen_at = next(iter(self._entries.items()))
+            if now - seen_at < self.ttl:
+                break
+            self._entries.popitem(last=False)
+
+    def check_and_add(self, message_id: str) -> bool:
+        now = time.time()
+        with self._lock:
+            self._evict_expired(now)
+            if message_id in self._entries:
+                self.hits += 1
+                return True
+            self.misses += 1
+            self._entries[message_id] = now
+            if len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self._persist(message_id, now)
+            return False
+
+    def _persist(self, message_id: str, now: float) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.write(f"{now}\t{message_id}\n")
+            self._file.flush()
+            self._file_lines += 1
+            # Reescribir el archivo cuando acumula muchas entradas vencidas o descartadas
+            if self._file_lines > 2 * self.max_size:
+                self._compact()
+        except Exception as e:
+            logger.error(f"Error al guardar ID procesado en {self.persist_path}: {e}")
+
+    def _compact(self) -> None:
+        tmp_path = f"{self.persist_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for message_id, seen_at in self._entries.items():
+                f.write(f"{seen_at}\t{message_id}\n")
+        self._file.close()
+        os.replace(tmp_path, self.persist_path)
+        self._file = open(self.persist_path, "a", encoding="utf-8")
+        self._file_lines = len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": "memory",
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class SQLiteMessageDedupCache(DedupCache):
+    """IDs de mensajes procesados en SQLite, compartidos entre procesos"""
+
+    # Cada cuántos mensajes nuevos se borran los IDs vencidos
+    PURGE_EVERY = 1000
+
+    def __init__(self, db_path: str = "processed_messages.db", ttl: float = 86400, migrate_from: Optional[str] = None):
+        """
+        Args:
+            db_path: Ruta de la base SQLite
+            ttl: Segundos que se recuerda cada ID
+            migrate_from: Archivo de `MessageDedupCache`; sus IDs vigentes se importan
+        """
+        super().__init__(ttl)
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._writes = 0
+        if migrate_from and os.path.exists(migrate_from):
+            self._import_log(migrate_from)
+
+    def _import_log(self, path: str) -> None:
+        cutoff = time.time() - self.ttl
+        entries = []
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    timestamp, _, message_id = line.rstrip("\n").partition("\t")
+                    try:
+                        seen_at = float(timestamp)
+                    except ValueError:
+                        continue
+                    if message_id and seen_at > cutoff:
+                        entries.append((message_id, seen_at))
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO processed_messages (message_id, seen_at) VALUES (?, ?)", entries
+                )
+        except Exception as e:
+            logger.error(f"Error al importar IDs procesados de {path}: {e}")
+
+    def check_and_add(self, message_id: str) -> bool:
+        now = time.time()
+        with self._lock:
+            # Un solo INSERT: si dos workers reciben el mismo mensaje, solo uno lo inserta.
+            # Un ID vencido se renueva y cuenta como mensaje nuevo.
+            with self._conn:
+                cursor = self._conn.execute(
+                    "INSERT INTO processed_messages (message_id, seen_at) VALUES (?, ?) "
+                    "ON CONFLICT (message_id) DO UPDATE SET seen_at = excluded.seen_at WHERE seen_at <= ?",
+                    (message_id, now, now - self.ttl)
+                )
+            if cursor.rowcount == 0:
+                self.hits += 1
+                return True
+            self.misses += 1
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._purge_expired(now)
+            return False
+
+    def _purge_expired(self, now: float) -> None:
+        try:
+            with self._conn:
+                self._conn.execute("DELETE FROM processed_messages WHERE seen_at <= ?", (now - self.ttl,))
+        except sqlite3.Error as e:
+            logger.error(f"Error al borrar IDs procesados vencidos: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = self._conn.execute(
+                "SELECT COUNT(*) FROM processed_messages WHERE seen_at > ?", (time.time() - self.ttl,)
+            ).fetchone()[0]
+        return {
+            "store": "sqlite",
+            "size": size,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def shared_storage() -> bool:
+    """
+    Indica si las PQRS se pueden compartir entre varios procesos
+
+    Con SQLite siempre; con JSON, donde hay locks de archivo (Linux/macOS). La
+    aplicación no sabe cuántos workers lanzó `uvicorn --workers N`, así que se
+    asume que puede haber varios siempre que el almacenamiento lo permita.
+    """
+    return settings.storage_backend.lower() == "sqlite" or FILE_LOCKS_SUPPORTED
+
+
+def create_dedup_cache() -> DedupCache:
+    """
+    Crea la caché de mensajes procesados con la configuración de `settings`
+
+    Con `DEDUP_STORE=auto` se usa SQLite siempre que las PQRS se puedan compartir
+    entre procesos (`shared_storage`): un reenvío de Meta que llega a otro worker
+    también se descarta. La caché en memoria (`DEDUP_STORE=memory`) solo sirve
+    con un único proceso.
+    """
+    backend = settings.dedup_store.lower()
+    if backend == "auto":
+        backend = "sqlite" if shared_storage() else "memory"
+    if backend == "sqlite":
+        return SQLiteMessageDedupCache(
+            settings.dedup_db_path,
+            ttl=settings.dedup_ttl_seconds,
+            migrate_from=settings.dedup_persist_path or None
+        )
+    if backend != "memory":
+        logger.warning(f"Caché de mensajes procesados desconocida '{backend}'. Usando memoria.")
+    return MessageDedupCache(
+        max_size=settings.dedup_cache_size,
+        ttl=settings.dedup_ttl_seconds,
+        persist_path=settings.dedup_persist_path or None
+    )
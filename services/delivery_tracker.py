@@ -0,0 +1,238 @@
+"""
+Seguimiento de los estados de entrega de los mensajes de WhatsApp
+
+Cada mensaje enviado con `WhatsAppService.send_text_message` se registra con el
+ID que devuelve Meta (`wamid...`). Los estados que llegan por el webhook (sent,
+delivered, read, failed) se cruzan con ese registro para medir la latencia
+envío→entrega y entrega→lectura.
+
+Los datos se acumulan en buckets por hora con histogramas de latencia de tamaño
+fijo. Los buckets horarios más antiguos que `hourly_retention` se consolidan en
+buckets diarios, y los diarios más antiguos que `daily_retention` se descartan,
+así la memoria queda acotada.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Límites superiores (segundos) de los buckets de los histogramas de latencia
+LATENCY_BOUNDS = (1, 2, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 3 * 3600, 12 * 3600, 24 * 3600)
+
+STATUSES = ("sent", "delivered", "read", "failed")
+
+
+class _Histogram:
+    """Histograma de latencias con buckets fijos"""
+
+    __slots__ = ("counts", "total")
+
+    def __init__(self):
+        # Un bucket extra para latencias mayores al último límite
+        self.counts = [0] * (len(LATENCY_BOUNDS) + 1)
+        self.total = 0
+
+    def add(self, seconds: float) -> None:
+        self.counts[bisect_left(LATENCY_BOUNDS, seconds)] += 1
+        self.total += 1
+
+    def merge(self, other: "_Histogram") -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.total += other.total
+
+    def percentile(self, p: float) -> Optional[float]:
+        """
+        Límite superior del bucket que contiene el percentil `p` (0-100)
+
+        Las latencias mayores al último límite se reportan como ese límite.
+        """
+        if not self.total:
+            return None
+        target = p / 100 * self.total
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target and count:
+                return float(LATENCY_BOUNDS[min(i, len(LATENCY_BOUNDS) - 1)])
+        return float(LATENCY_BOUNDS[-1])
+
+
+class _Bucket:
+    """Contadores e histogramas de un periodo (hora o día)"""
+
+    __slots__ = ("start", "counts", "send_to_delivered", "delivered_to_read")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.counts = dict.fromkeys(STATUSES, 0)
+        self.send_to_delivered = _Histogram()
+        self.delivered_to_read = _Histogram()
+
+    def merge(self, other: "_Bucket") -> None:
+        for status, count in other.counts.items():
+            self.counts[status] += count
+        self.send_to_delivered.merge(other.send_to_delivered)
+        self.delivered_to_read.merge(other.delivered_to_read)
+
+    def summary(self) -> Dict[str, Any]:
+        sent = self.counts["sent"]
+        return {
+            "start": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self.start)),
+            **self.counts,
+            "failure_rate": round(self.counts["failed"] / sent, 4) if sent else 0.0,
+            "send_to_delivered_s": {
+                f"p{p}": self.send_to_delivered.percentile(p) for p in (50, 90, 99)
+            },
+            "delivered_to_read_s": {
+                f"p{p}": self.delivered_to_read.percentile(p) for p in (50, 90, 99)
+            }
+        }
+
+
+class DeliveryTracker:
+    """Cruza envíos con estados de entrega y agrega latencias por hora"""
+
+    def __init__(
+        self,
+        max_tracked: int = 50000,
+        hourly_retention: int = 48,
+        daily_retention: int = 30
+    ):
+        """
+        Args:
+            max_tracked: Máximo de mensajes esperando estados (se descartan los más antiguos)
+            hourly_retention: Horas que se conservan con detalle horario
+            daily_retention: Días que se conservan consolidados
+        """
+        self.max_tracked = max_tracked
+        self.hourly_retention = hourly_retention
+        self.daily_retention = daily_retention
+        # wamid -> (momento del envío, momento de la entrega o None)
+        self._tracked: "OrderedDict[str, Tuple[float, Optional[float]]]" = OrderedDict()
+        self._hourly: "OrderedDict[int, _Bucket]" = OrderedDict()
+        self._daily: "OrderedDict[int, _Bucket]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _bucket(self, timestamp: float) -> _Bucket:
+        start = int(timestamp) // 3600 * 3600
+        bucket = self._hourly.get(start)
+        if bucket is not None:
+            return bucket
+        now = time.time()
+        self._rollup(now)
+        if start < int(now) // 3600 * 3600 - self.hourly_retention * 3600:
+            # Evento atrasado: va directo a su día (o se ignora si ya salió de la retención)
+            day_start = start // 86400 * 86400
+            if day_start < int(now) // 86400 * 86400 - self.daily_retention * 86400:
+                return _Bucket(day_start)
+            return self._get_or_create(self._daily, day_start)
+        return self._get_or_create(self._hourly, start)
+
+    @staticmethod
+    def _get_or_create(buckets: "OrderedDict[int, _Bucket]", start: int) -> _Bucket:
+        bucket = buckets.get(start)
+        if bucket is None:
+            bucket = buckets[start] = _Bucket(start)
+            # Los estados pueden llegar desordenados; mantener los periodos en orden
+            if start != max(buckets):
+                ordered = sorted(buckets.items())
+                buckets.clear()
+                buckets.update(ordered)
+        return bucket
+
+    def _rollup(self, now: float) -> None:
+        # Consolidar horas viejas en días y descartar días fuera de retención
+        oldest_hour = int(now) // 3600 * 3600 - self.hourly_retention * 3600
+        while self._hourly and next(iter(self._hourly)) < oldest_hour:
+            _, bucket = self._hourly.popitem(last=False)
+            self._get_or_create(self._daily, bucket.start // 86400 * 86400).merge(bucket)
+        oldest_day = int(now) // 86400 * 86400 - self.daily_retention * 86400
+        while self._daily and next(iter(self._daily)) < oldest_day:
+            self._daily.popitem(last=False)
+
+    def record_sent(self, message_id: str, sent_at: Optional[float] = None) -> None:
+        """
+        Registra un mensaje enviado
+
+        Args:
+            message_id: ID devuelto por la API de WhatsApp
+            sent_at: Momento del envío (por defecto ahora)
+        """
+        sent_at = sent_at if sent_at is not None else time.time()
+        with self._lock:
+            self._tracked[message_id] = (sent_at, None)
+            if len(self._tracked) > self.max_tracked:
+                self._tracked.popitem(last=False)
+            self._bucket(sent_at).counts["sent"] += 1
+
+    def ingest(self, status: Dict[str, Any]) -> None:
+        """
+        Procesa un estado recibido por el webhook
+
+        Args:
+            status: Elemento de `value.statuses` (id, status, timestamp, ...)
+        """
+        kind = status.get("status")
+        message_id = status.get("id")
+        if kind not in ("delivered", "read", "failed") or not message_id:
+            # "sent" ya se contó al enviar
+            return
+        try:
+            timestamp = float(status.get("timestamp") or time.time())
+        except (TypeError, ValueError):
+            timestamp = time.time()
+
+        with self._lock:
+            bucket = self._bucket(timestamp)
+            bucket.counts[kind] += 1
+            tracked = self._tracked.get(message_id)
+            if tracked is None:
+                return
+            sent_at, delivered_at = tracked
+            if kind == "delivered":
+                bucket.send_to_delivered.add(max(timestamp - sent_at, 0.0))
+                self._tracked[message_id] = (sent_at, timestamp)
+            elif kind == "read":
+                if delivered_at is not None:
+                    bucket.delivered_to_read.add(max(timestamp - delivered_at, 0.0))
+                # Ya no se esperan más estados
+                del self._tracked[message_id]
+            else:
+                del self._tracked[message_id]
+
+    def stats(self, hours: int = 24) -> Dict[str, Any]:
+        """
+        Resumen por hora de las últimas `hours` horas, total del periodo y días consolidados
+
+        Returns:
+            Diccionario con "hourly", "total", "daily" y "tracked" (mensajes esperando estados)
+        """
+        with self._lock:
+            self._rollup(time.time())
+            since = int(time.time()) // 3600 * 3600 - (hours - 1) * 3600
+            recent = [bucket for start, bucket in self._hourly.items() if start >= since]
+            total = _Bucket(since)
+            for bucket in recent:
+                total.merge(bucket)
+            return {
+                "hourly": [bucket.summary() for bucket in recent],
+                "total": total.summary(),
+                "daily": [bucket.summary() for bucket in self._daily.values()],
+                "tracked": len(self._tracked)
+            }
+
+
+def create_delivery_tracker() -> DeliveryTracker:
+    """Crea el seguimiento de entregas con la retención de `settings`"""
+    return DeliveryTracker(
+        max_tracked=settings.delivery_tracker_max_tracked,
+        hourly_retention=settings.delivery_tracker_hourly_retention,
+        daily_retention=settings.delivery_tracker_daily_retention
+    )
@@ -6,6 +6,15 @@ from typing import Dict, Any, Optional
 from datetime import datetime
 import logging
 from config import settings
+from services.http_client import use_client
+from services.metrics import OUTBOUND_ERRORS, track_outbound
+from services.rate_limiter import (
+    RateLimiter,
+    RateLimitedError,
+    PRIORITY_ALERT,
+    acquire_slot,
+    raise_if_rate_limited
+)
 
 logger = logging.getLogger(__name__)
 
@@ -13,7 +22,16 @@ logger = logging.getLogger(__name__)
 class EmailService:
     """Servicio para enviar correos electrónicos con las PQRS usando SendGrid API"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        # Cliente HTTP compartido (si es None se abre uno por llamada)
+        self.client = client
+        # Limitador de envíos compartido (si es None no se limita)
+        self.rate_limiter = rate_limiter
+        self.timeout = settings.sendgrid_timeout
         api_key = settings.email_sendgrid_api_key.strip()
         # Si la API key no empieza con "SG.", agregarlo (SendGrid siempre requiere este prefijo)
         if api_key and not api_key.startswith("SG."):
@@ -24,6 +42,11 @@ class EmailService:
         self.recipient_email = settings.email_recipient  # Correo destino
         self.api_url = "https://api.sendgrid.com/v3/mail/send"
     
+    @property
+    def is_configured(self) -> bool:
+        """Indica si hay API Key de SendGrid configurada"""
+        return bool(self.api_key)
+    
     async def send_pqrs_email(
         self,
         pqrs_id: str,
@@ -31,7 +54,8 @@ class EmailService:
         codigo_departamento: str,
         descripcion: str,
         telefono: str,
-        fecha: Optional[str] = None
+        fecha: Optional[str] = None,
+        priority: int = PRIORITY_ALERT
     ) -> Dict[str, Any]:
         """
         Envía un correo con la información de una PQRS usando SendGrid
@@ -43,9 +67,13 @@ class EmailService:
             descripcion: Descripción del problema
             telefono: Número de teléfono del usuario
             fecha: Fecha de registro (opcional)
+            priority: Clase de prioridad para el limitador de envíos
             
         Returns:
             Diccionario con el resultado del envío
+            
+        Raises:
+            RateLimitedError: Si SendGrid responde 429 o se agotó la cuota diaria
         """
         if not self.api_key:
             logger.warning("SendGrid API Key no configurada. Saltando envío de correo.")
@@ -142,22 +170,29 @@ Este correo fue generado automáticamente por el Sistema de PQRS de la Universid
             }
             
             # Enviar correo usando SendGrid API
-            async with httpx.AsyncClient() as client:
-                response = await client.post(
-                    self.api_url,
-                    json=payload,
-                    headers=headers,
-                    timeout=30.0
-                )
+            await acquire_slot(self.rate_limiter, "sendgrid", priority)
+            async with use_client(self.client) as client:
+                with track_outbound("sendgrid"):
+                    response = await client.post(
+                        self.api_url,
+                        json=payload,
+                        headers=headers,
+                        timeout=self.timeout
+                    )
+                    raise_if_rate_limited(self.rate_limiter, "sendgrid", response)
                 
                 if response.status_code == 202:
                     logger.info(f"Correo enviado exitosamente para PQRS {pqrs_id} a {self.recipient_email}")
                     return {"success": True, "message": "Correo enviado exitosamente"}
                 else:
+                    OUTBOUND_ERRORS.labels("sendgrid").inc()
                     error_msg = f"Error al enviar correo: {response.status_code} - {response.text}"
                     logger.error(error_msg)
                     return {"success": False, "error": error_msg}
                     
+        except RateLimitedError:
+            # El llamador decide cuándo reintentar
+            raise
         except Exception as e:
             error_msg = f"Error al enviar correo para PQRS {pqrs_id}: {str(e)}"
             logger.error(error_msg)
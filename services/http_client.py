@@ -0,0 +1,59 @@
+"""
+Cliente HTTP compartido para las llamadas salientes (WhatsApp, Telegram, SendGrid)
+
+Se crea un único `httpx.AsyncClient` en el `lifespan` de la aplicación y se
+inyecta en los servicios, así las conexiones (TCP + TLS) se reutilizan con
+keep-alive en lugar de abrir una nueva por cada mensaje.
+"""
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+import logging
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    Crea el cliente HTTP compartido con los límites de pool configurados
+
+    Returns:
+        Cliente HTTP asíncrono (se debe cerrar con `aclose()` al apagar)
+    """
+    limits = httpx.Limits(
+        max_connections=settings.http_max_connections,
+        max_keepalive_connections=settings.http_max_keepalive_connections,
+        keepalive_expiry=settings.http_keepalive_expiry
+    )
+
+    http2 = settings.http2_enabled
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 habilitado pero el paquete 'h2' no está instalado (pip install httpx[http2]). Usando HTTP/1.1.")
+            http2 = False
+
+    return httpx.AsyncClient(
+        limits=limits,
+        timeout=httpx.Timeout(settings.http_timeout),
+        http2=http2
+    )
+
+
+@asynccontextmanager
+async def use_client(client: Optional[httpx.AsyncClient]) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Usa el cliente compartido si existe; si no, crea uno temporal
+
+    Args:
+        client: Cliente compartido (o None, por ejemplo en scripts sin `lifespan`)
+    """
+    if client is not None:
+        yield client
+    else:
+        async with httpx.AsyncClient() as temporary_client:
+            yield temporary_client
@@ -0,0 +1,262 @@
+"""
+Elección de líder entre workers o réplicas con un lease en SQLite
+
+Algunas tareas deben correr en un solo proceso aunque haya varios (`uvicorn
+--workers N` o réplicas que comparten los archivos): el reenvío de las PQRS
+pendientes y las tareas periódicas. Cada proceso intenta tomar el lease de la
+tabla `leases`; el que lo tiene lo renueva cada `lease_seconds / 3` y, si deja de
+renovarlo (se cayó o quedó colgado), otro proceso lo toma cuando vence.
+
+El trabajo además se reclama por elemento (`work_claims`): el líder reclama cada
+PQRS antes de procesarla y la libera al terminar. Los reclamos se renuevan junto
+con el lease, así que los de un líder caído vencen con él y el siguiente líder
+vuelve a procesar esos elementos. Si un líder colgado retoma cuando ya hay otro,
+no procesa los elementos que el nuevo ya reclamó.
+"""
+import asyncio
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS work_claims (
+    job TEXT NOT NULL,
+    item TEXT NOT NULL,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    PRIMARY KEY (job, item)
+);
+CREATE INDEX IF NOT EXISTS idx_work_claims_holder ON work_claims (holder);
+"""
+
+LEADER_LEASE = "leader"
+
+# Segundos que una escritura espera a que otro proceso libere la base
+BUSY_TIMEOUT = 30
+
+
+class LeaderElection:
+    """
+    Lease de líder compartido y tareas que solo corren en el líder
+
+    `claim`, `release` y `status` son síncronos y pueden esperar hasta
+    `BUSY_TIMEOUT` segundos a que otro proceso libere la base: se llaman desde el
+    executor, nunca desde el event loop.
+    """
+
+    def __init__(self, db_path: str = "leader.db", lease_seconds: float = 15, enabled: bool = True):
+        """
+        Args:
+            db_path: Base SQLite compartida por todos los procesos
+            lease_seconds: Si el líder no renueva el lease en este tiempo, otro lo reemplaza
+            enabled: Si es False, este proceso es siempre el líder (un solo proceso)
+        """
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.enabled = enabled
+        self.holder_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self.elections = 0
+        self._jobs: Dict[str, Callable[[], Awaitable[None]]] = {}
+        self._running: Dict[str, asyncio.Task] = {}
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        if enabled:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.executescript(SCHEMA)
+            self._conn.commit()
+        # La conexión se usa desde hilos del executor: una transacción a la vez
+        self._lock = threading.Lock()
+
+    async def _call(self, method: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta una operación sobre la base fuera del event loop (puede esperar el lock de SQLite)"""
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    def add_job(self, name: str, job: Callable[[], Awaitable[None]]) -> None:
+        """
+        Registra una tarea que corre solo mientras este proceso es el líder
+
+        Args:
+            name: Nombre de la tarea (para el log y `status()`)
+            job: Función que crea la corrutina; se cancela si se pierde el liderazgo
+        """
+        self._jobs[name] = job
+
+    async def start(self) -> None:
+        """Intenta tomar el lease e inicia la renovación periódica"""
+        if not self.enabled:
+            self._become_leader()
+            return
+        self._heartbeat = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Cancela las tareas del líder y libera el lease para que otro proceso lo tome de inmediato"""
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+        await self._stop_jobs()
+        if self._conn is not None:
+            try:
+                await self._call(self._release_lease)
+            except sqlite3.Error as e:
+                logger.error(f"Error al liberar el lease de líder: {e}")
+            with self._lock:
+                self._conn.close()
+
+    def _release_lease(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM leases WHERE name = ? AND holder = ?", (LEADER_LEASE, self.holder_id)
+            )
+            self._conn.execute("DELETE FROM work_claims WHERE holder = ?", (self.holder_id,))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                leader = await self._call(self._renew)
+            except sqlite3.Error as e:
+                # Sin poder renovar, el lease vence y otro proceso puede tomarlo
+                logger.error(f"Error al renovar el lease de líder: {e}")
+                leader = False
+            if leader and not self.is_leader:
+                self._become_leader()
+            elif not leader and self.is_leader:
+                logger.warning("Este proceso dejó de ser el líder. Deteniendo sus tareas.")
+                self.is_leader = False
+                await self._stop_jobs()
+            await asyncio.sleep(self.lease_seconds / 3)
+
+    def _renew(self) -> bool:
+        """Toma o renueva el lease (y los reclamos de este proceso). True si este proceso es el líder."""
+        now = time.time()
+        expires_at = now + self.lease_seconds
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO leases (name, holder, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE leases.holder = excluded.holder OR leases.expires_at <= ?",
+                (LEADER_LEASE, self.holder_id, expires_at, now)
+            )
+            if cursor.rowcount == 0:
+                return False
+            self._conn.execute(
+                "UPDATE work_claims SET expires_at = ? WHERE holder = ?", (expires_at, self.holder_id)
+            )
+        return True
+
+    def _become_leader(self) -> None:
+        self.is_leader = True
+        self.elections += 1
+        logger.info(f"Este proceso es el líder ({self.holder_id}). Iniciando: {', '.join(self._jobs) or 'sin tareas'}")
+        for name, job in self._jobs.items():
+            task = asyncio.create_task(self._run_job(name, job))
+            self._running[name] = task
+            task.add_done_callback(lambda _, name=name: self._running.pop(name, None))
+
+    async def _run_job(self, name: str, job: Callable[[], Awaitable[None]]) -> None:
+        try:
+            await job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Error en la tarea del líder {name}: {e}")
+
+    async def _stop_jobs(self) -> None:
+        tasks = list(self._running.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ------------------------------------------------------------------
+    # Reclamos por elemento
+    # ------------------------------------------------------------------
+
+    def claim(self, job: str, item: str) -> bool:
+        """
+        Reclama un elemento de trabajo antes de procesarlo
+
+        Args:
+            job: Tarea a la que pertenece (por ejemplo "pqrs_backlog")
+            item: Identificador del elemento
+
+        Returns:
+            False si otro proceso lo tiene reclamado y su reclamo no venció
+        """
+        if self._conn is None:
+            return True
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT INTO work_claims (job, item, holder, expires_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (job, item) DO UPDATE SET holder = excluded.holder, expires_at = excluded.expires_at "
+                "WHERE work_claims.holder = excluded.holder OR work_claims.expires_at <= ?",
+                (job, item, self.holder_id, now + self.lease_seconds, now)
+            )
+        return cursor.rowcount > 0
+
+    def release(self, job: str, item: str) -> None:
+        """Libera un elemento ya procesado"""
+        if self._conn is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM work_claims WHERE job = ? AND item = ? AND holder = ?",
+                (job, item, self.holder_id)
+            )
+
+    def status(self) -> Dict[str, Any]:
+        """Líder actual, si es este proceso y las tareas en curso"""
+        leader = None
+        expires_in = None
+        claims = 0
+        if self._conn is not None:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT holder, expires_at FROM leases WHERE name = ?", (LEADER_LEASE,)
+                ).fetchone()
+                claims = self._conn.execute("SELECT COUNT(*) FROM work_claims").fetchone()[0]
+            if row is not None:
+                leader = row["holder"]
+                expires_in = round(row["expires_at"] - time.time(), 1)
+        elif self.is_leader:
+            leader = self.holder_id
+        return {
+            "enabled": self.enabled,
+            "holder_id": self.holder_id,
+            "is_leader": self.is_leader,
+            "leader": leader,
+            "lease_expires_in": expires_in,
+            "elections": self.elections,
+            "running_jobs": sorted(self._running),
+            "work_claims": claims
+        }
+
+
+def create_leader_election() -> LeaderElection:
+    """Crea la elección de líder con la configuración de `settings`"""
+    return LeaderElection(
+        db_path=settings.leader_db_path,
+        lease_seconds=settings.leader_lease_seconds,
+        enabled=settings.leader_election_enabled
+    )
@@ -0,0 +1,194 @@
+"""
+Watchdog de bloqueos del event loop
+
+Una tarea asyncio se despierta cada `interval` segundos y mide cuánto tarde lo
+hace (lag del loop). En paralelo, un hilo revisa el último latido de esa tarea:
+si el loop lleva más de `threshold` segundos sin avanzar, toma la pila del hilo
+del loop en ese momento, que es la del callback que lo está bloqueando.
+
+Los bloqueos se agrupan por pila y se reportan los peores (cantidad, duración
+máxima y total) en `/admin/loop-blocking` y en el log.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+from config import settings
+from services.metrics import REGISTRY, Histogram
+
+logger = logging.getLogger(__name__)
+
+LOOP_LAG = REGISTRY.register(Histogram(
+    "pqrs_event_loop_lag_seconds",
+    "Retraso del event loop respecto al intervalo esperado del watchdog"
+))
+
+# Pila de los bloqueos que terminan antes de que el hilo alcance a capturarlos
+UNKNOWN_STACK = "<bloqueo más corto que el intervalo de revisión>"
+
+
+class _Offender:
+    """Bloqueos acumulados de una misma pila"""
+
+    __slots__ = ("stack", "count", "total_ms", "max_ms", "last_seen")
+
+    def __init__(self, stack: str):
+        self.stack = stack
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_seen = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "max_ms": round(self.max_ms, 1),
+            "total_ms": round(self.total_ms, 1),
+            "last_seen": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.last_seen)),
+            "stack": self.stack.splitlines()
+        }
+
+
+class LoopWatchdog:
+    """Mide el lag del event loop y captura la pila de los callbacks que lo bloquean"""
+
+    def __init__(
+        self,
+        threshold: float = 0.1,
+        interval: float = 0.05,
+        max_offenders: int = 100,
+        stack_depth: int = 12
+    ):
+        """
+        Args:
+            threshold: Segundos de bloqueo a partir de los cuales se registra un bloqueo
+            interval: Segundos entre latidos de la tarea que mide el lag
+            max_offenders: Máximo de pilas distintas guardadas (se descartan las de menos bloqueos)
+            stack_depth: Frames más internos que se guardan de cada pila
+        """
+        self.threshold = threshold
+        self.interval = interval
+        self.max_offenders = max_offenders
+        self.stack_depth = stack_depth
+        self.ticks = 0
+        self.blocks = 0
+        self.max_lag = 0.0
+        self._lag_total = 0.0
+        self._offenders: Dict[str, _Offender] = {}
+        self._lock = threading.Lock()
+        self._heartbeat = time.monotonic()
+        # (latido previo al bloqueo, pila) capturada por el hilo durante el bloqueo en curso
+        self._captured: Optional[Tuple[float, str]] = None
+        self._loop_thread: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def start(self) -> None:
+        """Inicia la tarea de latidos y el hilo vigilante (desde el event loop)"""
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.create_task(self._beat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        """Detiene la tarea y el hilo"""
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        if self._thread is not None:
+            self._thread.join()
+
+    async def _beat(self) -> None:
+        # El lag se mide desde que la tarea empieza a correr
+        self._heartbeat = time.monotonic()
+        self._captured = None
+        while True:
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            previous = self._heartbeat
+            lag = max(now - previous - self.interval, 0.0)
+            captured, self._captured = self._captured, None
+            self._heartbeat = now
+            self.ticks += 1
+            self._lag_total += lag
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+            if lag >= self.threshold:
+                # Solo sirve la pila capturada durante este mismo bloqueo
+                stack = captured[1] if captured is not None and captured[0] == previous else None
+                self._record(stack or UNKNOWN_STACK, lag)
+
+    def _watch(self) -> None:
+        poll = max(min(self.threshold / 2, 0.05), 0.005)
+        while not self._stopped.wait(poll):
+            heartbeat = self._heartbeat
+            if self._captured is None and time.monotonic() - heartbeat - self.interval >= self.threshold:
+                frame = sys._current_frames().get(self._loop_thread)
+                if frame is not None and self._heartbeat == heartbeat:
+                    self._captured = (heartbeat, self._format_stack(frame))
+
+    def _format_stack(self, frame) -> str:
+        summary = traceback.extract_stack(frame)[-self.stack_depth:]
+        return "\n".join(
+            f"{os.path.basename(entry.filename)}:{entry.lineno} {entry.name}"
+            for entry in summary
+        )
+
+    def _record(self, stack: str, lag: float) -> None:
+        lag_ms = lag * 1000
+        with self._lock:
+            self.blocks += 1
+            offender = self._offenders.get(stack)
+            if offender is None:
+                if len(self._offenders) >= self.max_offenders:
+                    least = min(self._offenders.values(), key=lambda o: o.count)
+                    del self._offenders[least.stack]
+                offender = self._offenders[stack] = _Offender(stack)
+            offender.count += 1
+            offender.total_ms += lag_ms
+            offender.max_ms = max(offender.max_ms, lag_ms)
+            offender.last_seen = time.time()
+        innermost = stack.rsplit("\n", 1)[-1]
+        logger.warning(f"Event loop bloqueado {lag_ms:.0f} ms en {innermost} (visto {offender.count} veces)")
+
+    def stats(self, limit: int = 20) -> Dict[str, Any]:
+        """
+        Lag del loop y pilas que más lo bloquearon
+
+        Args:
+            limit: Máximo de pilas a devolver
+
+        Returns:
+            Diccionario con el lag promedio/máximo y los bloqueos ordenados por tiempo total
+        """
+        with self._lock:
+            offenders: List[_Offender] = sorted(
+                self._offenders.values(), key=lambda o: o.total_ms, reverse=True
+            )[:limit]
+            return {
+                "threshold_ms": self.threshold * 1000,
+                "ticks": self.ticks,
+                "avg_lag_ms": round(self._lag_total / self.ticks * 1000, 2) if self.ticks else 0.0,
+                "max_lag_ms": round(self.max_lag * 1000, 1),
+                "blocks": self.blocks,
+                "offenders": [o.to_dict() for o in offenders]
+            }
+
+
+def create_loop_watchdog() -> Optional[LoopWatchdog]:
+    """Crea el watchdog con la configuración de `settings` (None si está deshabilitado)"""
+    if not settings.loop_watchdog_enabled:
+        return None
+    return LoopWatchdog(
+        threshold=settings.loop_watchdog_threshold_ms / 1000,
+        interval=settings.loop_watchdog_interval_ms / 1000
+    )
@@ -0,0 +1,127 @@
+"""
+Despachador de mensajes entrantes: en orden por remitente, en paralelo entre remitentes
+
+Los mensajes de un mismo número deben procesarse en orden (el flujo PQRS es una
+máquina de estados), pero los de números distintos son independientes. Cada
+remitente tiene su propia cola; un pool acotado de workers toma remitentes con
+mensajes pendientes y procesa su cola de a un mensaje por vez. Cuando la cola de
+un remitente se vacía, se elimina.
+"""
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Tuple
+import logging
+
+from config import settings
+from services.tracing import activate, current_span
+
+logger = logging.getLogger(__name__)
+
+# (mensaje, remitente, momento en que se encoló, future del resultado, span del webhook)
+_QueuedMessage = Tuple[Any, str, float, asyncio.Future, Any]
+
+
+class SenderDispatcher:
+    """Colas por remitente atendidas por un pool acotado de workers"""
+
+    def __init__(self, handler: Callable[[Any, str], Awaitable[None]], workers: int = 16):
+        """
+        Args:
+            handler: Corrutina que procesa un mensaje (por ejemplo `MessageHandler.process_message`)
+            workers: Máximo de remitentes atendidos a la vez
+        """
+        self.handler = handler
+        self.workers = workers
+        self._shards: Dict[str, Deque[_QueuedMessage]] = {}
+        self._ready: "asyncio.Queue[str]" = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self.processed = 0
+        self.failed = 0
+        self._wait_total = 0.0
+        self.max_wait = 0.0
+
+    def start(self) -> None:
+        """Inicia los workers"""
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Detiene los workers (los mensajes en cola se descartan)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for shard in self._shards.values():
+            for _, _, _, future, _ in shard:
+                if not future.done():
+                    future.cancel()
+        self._shards.clear()
+
+    def submit(self, message: Any, from_number: str) -> asyncio.Future:
+        """
+        Encola un mensaje en la cola de su remitente
+
+        Args:
+            message: Mensaje recibido
+            from_number: Número del remitente (clave de orden)
+
+        Returns:
+            Future que se completa cuando el mensaje se procesó
+        """
+        future = asyncio.get_running_loop().create_future()
+        shard = self._shards.get(from_number)
+        if shard is None:
+            # Remitente sin mensajes pendientes: queda listo para un worker
+            shard = self._shards[from_number] = deque()
+            self._ready.put_nowait(from_number)
+        shard.append((message, from_number, time.monotonic(), future, current_span()))
+        return future
+
+    async def _worker(self) -> None:
+        while True:
+            from_number = await self._ready.get()
+            shard = self._shards[from_number]
+            while shard:
+                message, sender, queued_at, future, parent_span = shard[0]
+                wait = time.monotonic() - queued_at
+                self._wait_total += wait
+                self.max_wait = max(self.max_wait, wait)
+                try:
+                    # El mensaje sigue la traza del webhook que lo recibió
+                    with activate(parent_span):
+                        await self.handler(message, sender)
+                    self.processed += 1
+                    if not future.done():
+                        future.set_result(None)
+                except asyncio.CancelledError:
+                    if not future.done():
+                        future.cancel()
+                    raise
+                except Exception as e:
+                    self.failed += 1
+                    if not future.done():
+                        future.set_exception(e)
+                finally:
+                    shard.popleft()
+            # Cola vacía: eliminar el remitente
+            del self._shards[from_number]
+
+    def stats(self) -> Dict[str, Any]:
+        """Remitentes activos, mensajes en cola y tiempos de espera"""
+        depths = [len(shard) for shard in self._shards.values()]
+        handled = self.processed + self.failed
+        return {
+            "workers": self.workers,
+            "active_senders": len(depths),
+            "queued_messages": sum(depths),
+            "max_sender_queue": max(depths, default=0),
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait_ms": round(self._wait_total / handled * 1000, 2) if handled else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 2)
+        }
+
+
+def create_sender_dispatcher(handler: Callable[[Any, str], Awaitable[None]]) -> SenderDispatcher:
+    """Crea el despachador con la cantidad de workers de `settings.dispatcher_workers`"""
+    return SenderDispatcher(handler, workers=settings.dispatcher_workers)
@@ -3,11 +3,22 @@ Manejador de mensajes recibidos - Sistema PQRS Universidad Los Libertadores
 """
 from typing import Dict, Any, Optional
 from datetime import datetime
+import asyncio
+import functools
+import httpx
+from config import settings
 from models.whatsapp import Message
 from services.whatsapp_service import WhatsAppService
 from services.announcement_service import TelegramAnnouncementService
-from services.pqrs_storage import PQRSStorage
+from services.pqrs_storage import create_pqrs_storage
 from services.email_service import EmailService
+from services.outbox import Outbox
+from services.dedup_cache import DedupCache, create_dedup_cache
+from services.delivery_tracker import DeliveryTracker, create_delivery_tracker
+from services.conversation_store import ConversationStore, ConversationState, create_conversation_store
+from services.rate_limiter import RateLimiter, PRIORITY_ALERT, PRIORITY_BACKLOG, create_rate_limiter
+from services.tracing import traced
+from services.leader_election import LeaderElection
 import logging
 
 logger = logging.getLogger(__name__)
@@ -33,40 +44,76 @@ class MessageHandler:
         "7": {"nombre": "Otro", "codigo": "OTR"}
     }
     
-    def __init__(self):
-        self.whatsapp_service = WhatsAppService()
+    # Tipos de envío (trabajos del outbox) y proveedor que los atiende
+    DELIVERY_PROVIDERS = {
+        "whatsapp_text": "whatsapp",
+        "whatsapp_read": "whatsapp",
+        "telegram_alert": "telegram",
+        "email": "sendgrid"
+    }
+    # Prioridad en el outbox (menor = primero): las respuestas al usuario van antes
+    DELIVERY_PRIORITIES = {
+        "whatsapp_text": 0,
+        "whatsapp_read": 1,
+        "telegram_alert": 2,
+        "email": 3
+    }
+    # Prioridad en el outbox de las alertas de PQRS pendientes reenviadas al iniciar
+    BACKLOG_PRIORITY = 9
+    # Nombre de la tarea en los reclamos por PQRS de la elección de líder
+    BACKLOG_JOB = "pqrs_backlog"
+    # Campo de la PQRS donde se registra el resultado de cada envío
+    DELIVERY_FIELDS = {
+        "whatsapp_text": "entrega_confirmacion",
+        "telegram_alert": "entrega_telegram",
+        "email": "entrega_email"
+    }
+    DELIVERY_ERRORS = {
+        "whatsapp_text": "Error al enviar respuesta",
+        "whatsapp_read": "Error al marcar mensaje como leído",
+        "telegram_alert": "Error al enviar anuncio a Telegram",
+        "email": "Error al enviar correo"
+    }
+    
+    def __init__(
+        self,
+        http_client: Optional[httpx.AsyncClient] = None,
+        outbox: Optional[Outbox] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        dedup_cache: Optional[DedupCache] = None,
+        conversation_store: Optional[ConversationStore] = None,
+        delivery_tracker: Optional[DeliveryTracker] = None
+    ):
+        # Límites de envío por proveedor, compartidos por los tres servicios
+        self.rate_limiter = rate_limiter if rate_limiter is not None else create_rate_limiter()
+        # Los tres servicios comparten el mismo pool de conexiones HTTP
+        self.whatsapp_service = WhatsAppService(http_client, self.rate_limiter)
         # Servicio de Telegram para anuncios (opcional)
-        self.telegram_service = TelegramAnnouncementService()
+        self.telegram_service = TelegramAnnouncementService(http_client, self.rate_limiter)
         # Servicio de email para envío de PQRS
-        self.email_service = EmailService()
+        self.email_service = EmailService(http_client, self.rate_limiter)
         # Almacenamiento persistente de PQRS
-        self.pqrs_storage = PQRSStorage()
-        # Almacenamiento en memoria del estado de las conversaciones
-        # En producción, usar una base de datos
-        self.conversations: Dict[str, Dict[str, Any]] = {}
+        self.pqrs_storage = create_pqrs_storage()
+        # Outbox durable para los envíos; si es None, los envíos se hacen en línea
+        self.outbox = outbox
+        # IDs de mensajes ya procesados (Meta reenvía el webhook si tardamos)
+        self.dedup_cache = dedup_cache if dedup_cache is not None else create_dedup_cache()
+        # Estados de entrega (sent/delivered/read/failed) de los mensajes enviados
+        self.delivery_tracker = delivery_tracker if delivery_tracker is not None else create_delivery_tracker()
+        # Estado de las conversaciones (en memoria con TTL, o SQLite para varios procesos)
+        self.conversation_store = (
+            conversation_store if conversation_store is not None else create_conversation_store()
+        )
     
-    def _get_conversation_state(self, from_number: str) -> Dict[str, Any]:
+    def _get_conversation_state(self, from_number: str) -> ConversationState:
         """Obtiene el estado de la conversación del usuario"""
-        if from_number not in self.conversations:
-            self.conversations[from_number] = {
-                "estado": self.ESTADO_INICIAL,
-                "departamento": None,
-                "descripcion": None,
-                "fecha_inicio": datetime.now().isoformat(),
-                "pqrs_id": None
-            }
-        return self.conversations[from_number]
+        return self.conversation_store.get(from_number)
     
     def _reset_conversation(self, from_number: str) -> None:
         """Reinicia la conversación del usuario"""
-        self.conversations[from_number] = {
-            "estado": self.ESTADO_INICIAL,
-            "departamento": None,
-            "descripcion": None,
-            "fecha_inicio": datetime.now().isoformat(),
-            "pqrs_id": None
-        }
+        self.conversation_store.reset(from_number)
     
+    @traced("process_message")
     async def process_message(self, message: Message, from_number: str) -> None:
         """
         Procesa un mensaje recibido y genera una respuesta
@@ -75,19 +122,25 @@ class MessageHandler:
             message: Objeto Message recibido
             from_number: Número de teléfono del remitente
         """
-        # Marcar mensaje como leído
-        try:
-            await self.whatsapp_service.mark_message_as_read(message.id)
-        except Exception as e:
-            logger.error(f"Error al marcar mensaje como leído: {e}")
+        # Descartar reenvíos del mismo mensaje antes de hacer cualquier cosa
+        if self.dedup_cache.check_and_add(message.id):
+            logger.info(f"Mensaje {message.id} de {from_number} ya procesado. Se descarta el reenvío.")
+            return
         
         # Procesar el mensaje según su tipo
         if message.type == "text" and message.text:
-            await self._handle_text_message(message.text.body, from_number)
+            handling = self._handle_text_message(message.text.body, from_number)
         else:
             # Manejar otros tipos de mensajes (imágenes, audio, etc.)
-            await self._handle_unsupported_message(from_number)
+            handling = self._handle_unsupported_message(from_number)
+        
+        # Marcar mensaje como leído en paralelo con el procesamiento
+        await asyncio.gather(
+            self._dispatch("whatsapp_read", {"message_id": message.id}),
+            handling
+        )
     
+    @traced("handle_text_message")
     async def _handle_text_message(self, text: str, from_number: str) -> None:
         """
         Maneja mensajes de texto según el flujo de PQRS
@@ -98,7 +151,7 @@ class MessageHandler:
         """
         text_lower = text.lower().strip()
         state = self._get_conversation_state(from_number)
-        current_state = state["estado"]
+        current_state = state.estado
         
         # Comando especial para reiniciar
         if text_lower in ["reiniciar", "nuevo", "empezar", "reset"]:
@@ -111,14 +164,14 @@ class MessageHandler:
         if current_state == self.ESTADO_INICIAL:
             # Primer mensaje: preguntar por departamento
             response = self._get_department_selection_message()
-            state["estado"] = self.ESTADO_ESPERANDO_DEPARTAMENTO
+            state.estado = self.ESTADO_ESPERANDO_DEPARTAMENTO
             
         elif current_state == self.ESTADO_ESPERANDO_DEPARTAMENTO:
             # Usuario debe elegir departamento
             dept_info = self._parse_department_choice(text)
             if dept_info:
-                state["departamento"] = dept_info
-                state["estado"] = self.ESTADO_ESPERANDO_DESCRIPCION
+                state.departamento = dept_info
+                state.estado = self.ESTADO_ESPERANDO_DESCRIPCION
                 response = f"✅ Perfecto. Has seleccionado: *{dept_info['nombre']}*\n\n" \
                           f"Por favor, describe detalladamente tu petición, queja, reclamo o sugerencia:\n\n" \
                           f"📝 (Escribe tu mensaje ahora)"
@@ -128,62 +181,102 @@ class MessageHandler:
                 
         elif current_state == self.ESTADO_ESPERANDO_DESCRIPCION:
             # Usuario describe el problema
-            state["descripcion"] = text
-            state["estado"] = self.ESTADO_COMPLETADO
-            state["pqrs_id"] = f"PQRS-{state['departamento']['codigo']}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            state.descripcion = text
+            state.estado = self.ESTADO_COMPLETADO
+            state.pqrs_id = f"PQRS-{state.departamento['codigo']}-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+            self.conversation_store.save(from_number, state)
             
             # Guardar PQRS en almacenamiento persistente
             pqrs_data = {
-                "pqrs_id": state["pqrs_id"],
-                "departamento": state["departamento"]["nombre"],
-                "codigo_departamento": state["departamento"]["codigo"],
+                "pqrs_id": state.pqrs_id,
+                "departamento": state.departamento["nombre"],
+                "codigo_departamento": state.departamento["codigo"],
                 "descripcion": text,
                 "fecha": datetime.now().isoformat(),
                 "telefono": from_number
             }
-            self.pqrs_storage.add_pqrs(pqrs_data)
+            try:
+                persisted = self.pqrs_storage.add_pqrs(pqrs_data)
+            except Exception as e:
+                await self._registration_failed(from_number, state, e)
+                return
             
             # Detectar quejas similares (mismo departamento, descripción similar)
             similar_pqrs = self.pqrs_storage.get_similar_pqrs(
-                state["departamento"]["codigo"],
+                state.departamento["codigo"],
                 text
             )
             similar_count = len(similar_pqrs) - 1  # Restamos 1 porque la actual cuenta
             
+            # Confirmar solo cuando la PQRS ya está en disco (el fsync corre fuera del event loop)
+            try:
+                await asyncio.wrap_future(persisted)
+            except Exception as e:
+                await self._registration_failed(from_number, state, e)
+                return
+            
+            # La confirmación al usuario, el correo y la alerta de Telegram salen en paralelo:
+            # el usuario no espera a SendGrid ni a Telegram
+            response = self._get_confirmation_message(state)
+            sends = {
+                "whatsapp_text": self._send_message(
+                    from_number, response, state.pqrs_id, pqrs_data["fecha_registro"]
+                ),
+                # Enviar correo electrónico para TODAS las PQRS
+                "email": self._send_pqrs_email(
+                    pqrs_id=state.pqrs_id,
+                    departamento=state.departamento["nombre"],
+                    codigo_departamento=state.departamento["codigo"],
+                    descripcion=text,
+                    telefono=from_number,
+                    fecha_registro=pqrs_data["fecha_registro"]
+                )
+            }
+            
             # Enviar anuncio a Telegram Channel SOLO si hay 2+ quejas similares (solo alertas)
+            # Al entregarse, la PQRS se marca como enviada
             if similar_count >= 1:  # 1 similar + la actual = 2 o más en total
-                enviado = await self._send_announcement_to_channel(
-                    state["pqrs_id"],
-                    state["departamento"]["nombre"],
+                sends["telegram_alert"] = self._send_announcement_to_channel(
+                    state.pqrs_id,
+                    state.departamento["nombre"],
                     text,
-                    similar_count
+                    similar_count,
+                    pqrs_data["fecha_registro"]
                 )
-                
-                # Si se envió exitosamente, marcar como enviado
-                if enviado:
-                    self.pqrs_storage.mark_as_sent(state["pqrs_id"])
             else:
                 # Si es la primera queja, no enviar a Telegram
-                logger.info(f"PQRS {state['pqrs_id']} es la primera queja de este tipo. No se envía a Telegram.")
-            
-            # Enviar correo electrónico para TODAS las PQRS
-            await self._send_pqrs_email(
-                pqrs_id=state["pqrs_id"],
-                departamento=state["departamento"]["nombre"],
-                codigo_departamento=state["departamento"]["codigo"],
-                descripcion=text,
-                telefono=from_number
-            )
+                logger.info(f"PQRS {state.pqrs_id} es la primera queja de este tipo. No se envía a Telegram.")
             
-            response = self._get_confirmation_message(state)
-            # - Enviar correo
+            results = await asyncio.gather(*sends.values())
+            outcomes = dict(zip(sends.keys(), results))
+            if "telegram_alert" not in outcomes:
+                outcomes["telegram_alert"] = "no_aplica"
+            self._record_outcomes(state.pqrs_id, outcomes, pqrs_data["fecha_registro"])
+            return
             
         else:
             # Estado completado o desconocido
             response = "Tu PQRS ya ha sido registrada. Si necesitas crear una nueva, escribe 'nuevo' o 'reiniciar'."
         
+        self.conversation_store.save(from_number, state)
         await self._send_message(from_number, response)
     
+    async def _registration_failed(self, from_number: str, state: ConversationState, error: Exception) -> None:
+        """
+        La PQRS no se pudo guardar: no se confirma ni se envían correo ni alerta
+
+        La conversación vuelve a esperar la descripción para que el usuario la reenvíe.
+        """
+        logger.error(f"No se pudo guardar la PQRS {state.pqrs_id}: {error}")
+        state.estado = self.ESTADO_ESPERANDO_DESCRIPCION
+        state.pqrs_id = None
+        self.conversation_store.save(from_number, state)
+        await self._send_message(
+            from_number,
+            "❌ No pudimos registrar tu PQRS en este momento. "
+            "Por favor, envía de nuevo tu descripción en unos minutos."
+        )
+    
     def _parse_department_choice(self, text: str) -> Optional[Dict[str, Any]]:
         """Parsea la elección del departamento del usuario"""
         text_lower = text.lower().strip()
@@ -225,10 +318,10 @@ class MessageHandler:
         dept_text += "\nResponde con el número o el nombre del departamento."
         return dept_text
     
-    def _get_confirmation_message(self, state: Dict[str, Any]) -> str:
+    def _get_confirmation_message(self, state: ConversationState) -> str:
         """Mensaje de confirmación de PQRS registrada"""
-        pqrs_id = state.get("pqrs_id", "PENDIENTE")
-        dept = state.get("departamento", {}).get("nombre", "N/A")
+        pqrs_id = state.pqrs_id or "PENDIENTE"
+        dept = (state.departamento or {}).get("nombre", "N/A")
         fecha = datetime.now().strftime("%d/%m/%Y %H:%M")
         
         return (
@@ -241,44 +334,57 @@ class MessageHandler:
             "¡Gracias por contactarnos! 🙏"
         )
     
-    async def _send_pending_pqrs_on_startup(self) -> None:
-        """Envía las PQRS pendientes al iniciar el servidor"""
+    async def _send_pending_pqrs_on_startup(self, leader: Optional[LeaderElection] = None) -> None:
+        """
+        Envía las PQRS pendientes al iniciar el servidor (en el proceso líder)
+        
+        Args:
+            leader: Elección de líder; cada PQRS se reclama antes de enviarla, así
+                otro proceso no la envía a la vez y, si este se cae, se reintenta
+                cuando vence su lease
+        """
+        loop = asyncio.get_running_loop()
         try:
             pending_pqrs = self.pqrs_storage.get_pending_pqrs()
             if pending_pqrs:
                 logger.info(f"Enviando {len(pending_pqrs)} PQRS pendientes a Telegram...")
+                # Contar quejas similares de todas las pendientes en una sola pasada
+                similar_counts = self.pqrs_storage.count_similar_pqrs(pending_pqrs)
                 for pqrs in pending_pqrs:
+                    item = f"{pqrs['pqrs_id']}:{pqrs.get('fecha_registro')}"
+                    # Los reclamos pueden esperar el lock de SQLite de otro proceso: fuera del event loop
+                    if leader is not None and not await loop.run_in_executor(None, leader.claim, self.BACKLOG_JOB, item):
+                        logger.info(f"PQRS {pqrs['pqrs_id']} reclamada por otro proceso. Se omite.")
+                        continue
                     try:
-                        # Obtener quejas similares
-                        similar_pqrs = self.pqrs_storage.get_similar_pqrs(
-                            pqrs["codigo_departamento"],
-                            pqrs["descripcion"]
-                        )
-                        similar_count = len([s for s in similar_pqrs if s.get("pqrs_id") != pqrs["pqrs_id"]])
+                        similar_count = similar_counts.get((pqrs["pqrs_id"], pqrs.get("fecha_registro")), 0)
                         
                         # Enviar a Telegram SOLO si hay 2+ quejas similares (solo alertas)
                         if similar_count >= 1:  # 1 similar + la actual = 2 o más en total
-                            enviado = await self._send_announcement_to_channel(
+                            # Al entregarse, la PQRS se marca como enviada
+                            await self._send_announcement_to_channel(
                                 pqrs["pqrs_id"],
                                 pqrs["departamento"],
                                 pqrs["descripcion"],
-                                similar_count
+                                similar_count,
+                                pqrs.get("fecha_registro"),
+                                backlog=True
                             )
-                            
-                            # Si se envió exitosamente, marcar como enviado
-                            if enviado:
-                                self.pqrs_storage.mark_as_sent(pqrs["pqrs_id"])
-                                logger.info(f"PQRS {pqrs['pqrs_id']} enviada y marcada como enviada (alerta múltiples reportes)")
+                            logger.info(f"PQRS {pqrs['pqrs_id']} enviada a Telegram (alerta múltiples reportes)")
                         else:
                             # Si es la primera queja, marcar como "enviada" pero no enviar (para no reintentar)
-                            self.pqrs_storage.mark_as_sent(pqrs["pqrs_id"])
+                            self.pqrs_storage.mark_as_sent(pqrs["pqrs_id"], pqrs.get("fecha_registro"))
                             logger.info(f"PQRS {pqrs['pqrs_id']} es la primera queja. No se envía a Telegram.")
-                        
-                        # Pequeña pausa entre envíos para no saturar
-                        import asyncio
-                        await asyncio.sleep(1)
+                        # El ritmo de envío lo controla el limitador (prioridad de reposición)
                     except Exception as e:
                         logger.error(f"Error al enviar PQRS {pqrs.get('pqrs_id')}: {e}")
+                    finally:
+                        if leader is not None:
+                            try:
+                                await loop.run_in_executor(None, leader.release, self.BACKLOG_JOB, item)
+                            except Exception as e:
+                                # El reclamo vence con el lease; la PQRS ya quedó procesada
+                                logger.error(f"Error al liberar el reclamo de la PQRS {pqrs.get('pqrs_id')}: {e}")
         except Exception as e:
             logger.error(f"Error al procesar PQRS pendientes: {e}")
     
@@ -287,8 +393,10 @@ class MessageHandler:
         pqrs_id: str,
         departamento: str,
         descripcion: str,
-        similar_count: int
-    ) -> bool:
+        similar_count: int,
+        fecha_registro: Optional[str] = None,
+        backlog: bool = False
+    ) -> Optional[str]:
         """
         Envía un anuncio al canal de Telegram
         
@@ -297,21 +405,26 @@ class MessageHandler:
             departamento: Nombre del departamento
             descripcion: Descripción del problema
             similar_count: Cantidad de quejas similares
+            fecha_registro: Fecha de registro de la PQRS (identifica la PQRS al marcarla
+                como enviada y evita alertas duplicadas en el outbox)
+            backlog: Si es una PQRS pendiente reenviada al iniciar (menor prioridad)
             
         Returns:
-            True si se envió exitosamente, False en caso contrario
+            Resultado del envío (ver `_dispatch`)
         """
-        try:
-            result = await self.telegram_service.send_pqrs_alert(
-                pqrs_id=pqrs_id,
-                departamento=departamento,
-                descripcion=descripcion,
-                cantidad_similar=similar_count
-            )
-            return result.get("ok", False)
-        except Exception as e:
-            logger.error(f"Error al enviar anuncio a Telegram: {e}")
-            return False
+        return await self._dispatch(
+            "telegram_alert",
+            {
+                "pqrs_id": pqrs_id,
+                "departamento": departamento,
+                "descripcion": descripcion,
+                "similar_count": similar_count,
+                "fecha_registro": fecha_registro,
+                "backlog": backlog
+            },
+            dedup_key=f"telegram_alert:{pqrs_id}:{fecha_registro}",
+            priority=self.BACKLOG_PRIORITY if backlog else None
+        )
     
     async def _send_pqrs_email(
         self,
@@ -319,8 +432,9 @@ class MessageHandler:
         departamento: str,
         codigo_departamento: str,
         descripcion: str,
-        telefono: str
-    ) -> None:
+        telefono: str,
+        fecha_registro: Optional[str] = None
+    ) -> Optional[str]:
         """
         Envía un correo electrónico con la información de la PQRS
         
@@ -330,27 +444,167 @@ class MessageHandler:
             codigo_departamento: Código del departamento
             descripcion: Descripción del problema
             telefono: Número de teléfono del usuario
+            fecha_registro: Fecha de registro de la PQRS (donde se guarda el resultado)
+            
+        Returns:
+            Resultado del envío (ver `_dispatch`)
         """
-        try:
-            await self.email_service.send_pqrs_email(
-                pqrs_id=pqrs_id,
-                departamento=departamento,
-                codigo_departamento=codigo_departamento,
-                descripcion=descripcion,
-                telefono=telefono
-            )
-        except Exception as e:
-            logger.error(f"Error al enviar correo para PQRS {pqrs_id}: {e}")
+        return await self._dispatch("email", {
+            "pqrs_id": pqrs_id,
+            "departamento": departamento,
+            "codigo_departamento": codigo_departamento,
+            "descripcion": descripcion,
+            "telefono": telefono,
+            "fecha_registro": fecha_registro
+        })
+    
+    async def _send_message(
+        self,
+        to: str,
+        message: str,
+        pqrs_id: Optional[str] = None,
+        fecha_registro: Optional[str] = None
+    ) -> Optional[str]:
+        """Envía un mensaje al usuario (si es la confirmación de una PQRS, el resultado se registra en ella)"""
+        payload = {"to": to, "message": message}
+        if pqrs_id:
+            payload["pqrs_id"] = pqrs_id
+            payload["fecha_registro"] = fecha_registro
+        return await self._dispatch("whatsapp_text", payload)
     
-    async def _send_message(self, to: str, message: str) -> None:
-        """Envía un mensaje al usuario"""
+    async def _dispatch(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        dedup_key: Optional[str] = None,
+        priority: Optional[int] = None
+    ) -> Optional[str]:
+        """
+        Encola un envío en el outbox o, si no hay outbox, lo hace en línea
+        
+        Args:
+            kind: Tipo de envío (clave de `DELIVERY_PROVIDERS`)
+            payload: Datos del envío
+            dedup_key: Clave para no encolar dos veces el mismo envío
+            priority: Prioridad en el outbox (por defecto la del tipo de envío)
+            
+        Returns:
+            None si se encoló (el worker registra el resultado al entregarlo); si se
+            envió en línea, "enviado", "omitido", "timeout" o "error"
+        """
+        if self.outbox is not None:
+            if priority is None:
+                priority = self.DELIVERY_PRIORITIES[kind]
+            try:
+                # Puede esperar el lock de SQLite de otro worker: fuera del event loop
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.outbox.enqueue, kind, payload, priority, dedup_key
+                )
+                return None
+            except Exception as e:
+                # Si el outbox no está disponible, no perder el envío
+                logger.error(f"Error al encolar {kind} en el outbox: {e}. Enviando en línea.")
         try:
-            await self.whatsapp_service.send_text_message(
-                to=to,
-                message=message
+            outcome = await asyncio.wait_for(
+                self._delivery_functions[kind](payload),
+                timeout=settings.delivery_timeout
             )
+            return outcome or "enviado"
+        except asyncio.TimeoutError:
+            logger.error(f"{self.DELIVERY_ERRORS[kind]}: sin respuesta en {settings.delivery_timeout}s")
+            return "timeout"
         except Exception as e:
-            logger.error(f"Error al enviar respuesta: {e}")
+            logger.error(f"{self.DELIVERY_ERRORS[kind]}: {e}")
+            return "error"
+    
+    def _record_outcomes(
+        self,
+        pqrs_id: Optional[str],
+        outcomes: Dict[str, Optional[str]],
+        fecha_registro: Optional[str] = None
+    ) -> None:
+        """
+        Guarda en la PQRS el resultado de sus envíos
+        
+        Args:
+            pqrs_id: ID de la PQRS (si es None no se guarda nada)
+            outcomes: Tipo de envío -> resultado (los None se omiten)
+            fecha_registro: Fecha de registro de la PQRS (ver `PQRSStorage.update_pqrs`)
+        """
+        fields = {
+            self.DELIVERY_FIELDS[kind]: outcome
+            for kind, outcome in outcomes.items()
+            if outcome is not None and kind in self.DELIVERY_FIELDS
+        }
+        if pqrs_id and fields:
+            try:
+                self.pqrs_storage.update_pqrs(pqrs_id, fields, fecha_registro)
+            except Exception as e:
+                logger.error(f"Error al registrar envíos de la PQRS {pqrs_id}: {e}")
+    
+    @property
+    def _delivery_functions(self) -> Dict[str, Any]:
+        """Corrutinas que hacen cada tipo de envío; lanzan excepción si falla"""
+        return {
+            "whatsapp_text": self._deliver_whatsapp_text,
+            "whatsapp_read": self._deliver_whatsapp_read,
+            "telegram_alert": self._deliver_telegram_alert,
+            "email": self._deliver_email
+        }
+    
+    @property
+    def delivery_handlers(self) -> Dict[str, Any]:
+        """Handlers para los workers del outbox: envían y registran el resultado en la PQRS"""
+        return {kind: functools.partial(self._deliver_queued, kind) for kind in self.DELIVERY_PROVIDERS}
+    
+    async def _deliver_queued(self, kind: str, payload: Dict[str, Any]) -> None:
+        outcome = await self._delivery_functions[kind](payload)
+        self._record_outcomes(payload.get("pqrs_id"), {kind: outcome or "enviado"}, payload.get("fecha_registro"))
+    
+    async def _deliver_whatsapp_text(self, payload: Dict[str, Any]) -> None:
+        result = await self.whatsapp_service.send_text_message(
+            to=payload["to"],
+            message=payload["message"]
+        )
+        # Registrar el ID del mensaje para cruzarlo con los estados del webhook
+        for sent_message in result.get("messages") or []:
+            if sent_message.get("id"):
+                self.delivery_tracker.record_sent(sent_message["id"])
+    
+    async def _deliver_whatsapp_read(self, payload: Dict[str, Any]) -> None:
+        await self.whatsapp_service.mark_message_as_read(payload["message_id"])
+    
+    async def _deliver_telegram_alert(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Envía la alerta y marca la PQRS como enviada. Lanza excepción si falla."""
+        if not self.telegram_service.is_configured:
+            # Sin Telegram la PQRS queda pendiente y se reintenta al iniciar
+            logger.warning("Telegram no configurado. Saltando envío de anuncio.")
+            return "omitido"
+        result = await self.telegram_service.send_pqrs_alert(
+            pqrs_id=payload["pqrs_id"],
+            departamento=payload["departamento"],
+            descripcion=payload["descripcion"],
+            cantidad_similar=payload["similar_count"],
+            priority=PRIORITY_BACKLOG if payload.get("backlog") else PRIORITY_ALERT
+        )
+        if not result.get("ok", False):
+            raise Exception(result.get("error") or "Telegram rechazó el anuncio")
+        self.pqrs_storage.mark_as_sent(payload["pqrs_id"], payload.get("fecha_registro"))
+    
+    async def _deliver_email(self, payload: Dict[str, Any]) -> Optional[str]:
+        """Envía el correo de una PQRS. Lanza excepción si falla."""
+        if not self.email_service.is_configured:
+            logger.warning("SendGrid API Key no configurada. Saltando envío de correo.")
+            return "omitido"
+        result = await self.email_service.send_pqrs_email(
+            pqrs_id=payload["pqrs_id"],
+            departamento=payload["departamento"],
+            codigo_departamento=payload["codigo_departamento"],
+            descripcion=payload["descripcion"],
+            telefono=payload["telefono"]
+        )
+        if not result.get("success", False):
+            raise Exception(result.get("error") or f"No se pudo enviar el correo de la PQRS {payload['pqrs_id']}")
     
     async def _handle_unsupported_message(self, from_number: str) -> None:
         """
@@ -361,7 +615,7 @@ class MessageHandler:
         """
         state = self._get_conversation_state(from_number)
         
-        if state["estado"] == self.ESTADO_INICIAL:
+        if state.estado == self.ESTADO_INICIAL:
             response = (
                 "Por el momento solo puedo procesar mensajes de texto. "
                 "Por favor, envía un mensaje de texto para iniciar tu PQRS."
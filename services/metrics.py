@@ -0,0 +1,243 @@
+"""
+Métricas en formato de texto de Prometheus para el endpoint `/metrics`
+
+Implementación mínima sin dependencias externas. Registrar una observación es
+barato: un `bisect` sobre buckets fijos y sumas de enteros, sin locks (las
+métricas se actualizan desde el hilo del event loop). Los gauges se calculan al
+momento de leer `/metrics` mediante callbacks.
+"""
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Sequence, Tuple
+import logging
+
+from services.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Buckets por defecto (segundos), pensados para latencias de 1 ms a 30 s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # Un bucket extra para +Inf
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Mide la duración del bloque"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+
+class _Metric:
+    """Base de las métricas con etiquetas"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Obtiene la serie con esos valores de etiquetas (se crea la primera vez)"""
+        child = self._children.get(values)
+        if child is None:
+            key = tuple(str(value) for value in values)
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} espera las etiquetas {self.labelnames}")
+            child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Contador monótono"""
+
+    kind = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self._children[()].inc(amount)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for values, child in self._children.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Histograma con buckets fijos"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.bounds)
+
+    def observe(self, value: float) -> None:
+        self._children[()].observe(value)
+
+    def time(self):
+        return self._children[()].time()
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for values, child in self._children.items():
+            cumulative = 0
+            for bound, count in zip(self.bounds + (float("inf"),), child.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child.sum)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge(_Metric):
+    """Valor calculado al leer las métricas"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.callback = callback
+        super().__init__(name, documentation)
+
+    def _new_child(self) -> None:
+        return None
+
+    def render(self) -> List[str]:
+        try:
+            value = self.callback()
+        except Exception as e:
+            logger.error(f"Error al calcular la métrica {self.name}: {e}")
+            return []
+        return self.header() + [f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    """Conjunto de métricas expuestas en `/metrics`"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        """Registra (o reemplaza) un gauge calculado con `callback`"""
+        return self.register(Gauge(name, documentation, callback))
+
+    def render(self) -> str:
+        """Texto en el formato de exposición de Prometheus (0.0.4)"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+WEBHOOK_LATENCY = REGISTRY.register(Histogram(
+    "pqrs_webhook_duration_seconds",
+    "Tiempo de procesamiento de POST /webhook"
+))
+STORAGE_LATENCY = REGISTRY.register(Histogram(
+    "pqrs_storage_operation_duration_seconds",
+    "Latencia de las operaciones del almacenamiento de PQRS",
+    labelnames=("operation",)
+))
+OUTBOUND_LATENCY = REGISTRY.register(Histogram(
+    "pqrs_outbound_request_duration_seconds",
+    "Latencia de las llamadas a proveedores externos",
+    labelnames=("provider",)
+))
+OUTBOUND_ERRORS = REGISTRY.register(Counter(
+    "pqrs_outbound_errors_total",
+    "Llamadas a proveedores externos que fallaron",
+    labelnames=("provider",)
+))
+
+
+@contextmanager
+def track_outbound(provider: str) -> Iterator[None]:
+    """
+    Mide una llamada a un proveedor externo y cuenta las que lanzan excepción
+
+    También la registra como span de la traza actual (si las trazas están habilitadas).
+
+    Args:
+        provider: "whatsapp", "telegram" o "sendgrid"
+    """
+    start = time.perf_counter()
+    try:
+        with span(f"{provider}.request"):
+            yield
+    except Exception:
+        OUTBOUND_ERRORS.labels(provider).inc()
+        raise
+    finally:
+        OUTBOUND_LATENCY.labels(provider).observe(time.perf_counter() - start)
@@ -0,0 +1,383 @@
+"""
+Outbox durable para los envíos salientes (WhatsApp, correo, Telegram)
+
+El manejador de mensajes no llama a los proveedores externos durante el webhook:
+guarda cada envío como un trabajo en una tabla SQLite (`outbox`) y responde de
+inmediato. Un pool de workers asyncio vacía la tabla con concurrencia limitada
+por proveedor, reintenta con backoff exponencial y, al agotar los intentos, mueve
+el trabajo a la tabla `dead_letters`, desde donde se puede volver a encolar.
+"""
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+import logging
+
+from config import settings
+from services.rate_limiter import RateLimitedError
+
+logger = logging.getLogger(__name__)
+
+# Segundos que una escritura espera a que otro proceso libere la base
+BUSY_TIMEOUT = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    dedup_key TEXT UNIQUE,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_ready ON outbox (status, kind, priority, next_attempt_at);
+CREATE TABLE IF NOT EXISTS dead_letters (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    dedup_key TEXT,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["payload"] = json.loads(job["payload"])
+    return job
+
+
+class Outbox:
+    """
+    Cola durable de trabajos de envío sobre SQLite
+
+    Los métodos son síncronos y pueden esperar hasta `BUSY_TIMEOUT` segundos a que
+    otro worker libere la base: se llaman desde el executor, nunca desde el event loop.
+    """
+
+    def __init__(self, db_path: str = "outbox.db"):
+        self.db_path = db_path
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        # Los workers usan la conexión desde hilos del executor: una transacción a la vez
+        self._lock = threading.Lock()
+        self._enqueue_listeners: List[Callable[[], None]] = []
+
+    def add_enqueue_listener(self, callback: Callable[[], None]) -> None:
+        """Registra un callback que se llama al encolar un trabajo (para despertar a los workers)"""
+        self._enqueue_listeners.append(callback)
+
+    def enqueue(
+        self,
+        kind: str,
+        payload: Dict[str, Any],
+        priority: int = 0,
+        dedup_key: Optional[str] = None
+    ) -> Optional[int]:
+        """
+        Encola un trabajo de envío
+
+        Args:
+            kind: Tipo de trabajo (por ejemplo "whatsapp_text", "email")
+            payload: Datos del envío (serializables a JSON)
+            priority: Menor número = se atiende primero
+            dedup_key: Si ya hay un trabajo vivo con la misma clave, no se encola otro
+
+        Returns:
+            ID del trabajo, o None si se descartó por `dedup_key`
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (kind, payload, priority, dedup_key, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload, ensure_ascii=False), priority, dedup_key, now, now)
+            )
+        if cursor.rowcount == 0:
+            logger.debug(f"Trabajo {dedup_key} ya está en el outbox")
+            return None
+        for callback in self._enqueue_listeners:
+            callback()
+        return cursor.lastrowid
+
+    def claim(self, kinds: List[str], limit: int) -> List[Dict[str, Any]]:
+        """Toma hasta `limit` trabajos listos de los tipos indicados y los marca en proceso"""
+        if limit <= 0 or not kinds:
+            return []
+        now = time.time()
+        placeholders = ", ".join("?" for _ in kinds)
+        with self._lock, self._conn:
+            # Lock de escritura desde el SELECT: con varios workers, dos procesos no toman el mismo trabajo
+            self._conn.execute("BEGIN IMMEDIATE")
+            rows = self._conn.execute(
+                f"SELECT * FROM outbox WHERE status = 'pending' AND kind IN ({placeholders}) "
+                f"AND next_attempt_at <= ? ORDER BY priority, id LIMIT ?",
+                (*kinds, now, limit)
+            ).fetchall()
+            if rows:
+                self._conn.executemany(
+                    "UPDATE outbox SET status = 'processing', claimed_at = ? WHERE id = ?",
+                    [(now, row["id"]) for row in rows]
+                )
+        return [_row_to_job(row) for row in rows]
+
+    def complete(self, job_id: int) -> None:
+        """Elimina un trabajo entregado"""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (job_id,))
+
+    def retry(self, job: Dict[str, Any], error: str, delay: float, count_attempt: bool = True) -> None:
+        """
+        Devuelve un trabajo fallido a la cola para reintentarlo en `delay` segundos
+
+        Args:
+            job: Trabajo tomado con `claim`
+            error: Mensaje del error
+            delay: Segundos hasta el próximo intento
+            count_attempt: Si es False (por ejemplo, el proveedor pidió esperar), no gasta un intento
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE outbox SET status = 'pending', attempts = attempts + ?, next_attempt_at = ?, "
+                "claimed_at = NULL, last_error = ? WHERE id = ?",
+                (1 if count_attempt else 0, time.time() + delay, error, job["id"])
+            )
+
+    def dead_letter(self, job: Dict[str, Any], error: str) -> None:
+        """Mueve un trabajo que agotó sus intentos a `dead_letters`"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO dead_letters (kind, payload, priority, dedup_key, attempts, last_error, created_at, failed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job["kind"], json.dumps(job["payload"], ensure_ascii=False), job["priority"], job["dedup_key"],
+                 job["attempts"] + 1, error, job["created_at"], time.time())
+            )
+            self._conn.execute("DELETE FROM outbox WHERE id = ?", (job["id"],))
+
+    def recover_stale(self, older_than: float) -> int:
+        """
+        Devuelve a la cola los trabajos que quedaron "en proceso" (por ejemplo tras una caída)
+
+        Args:
+            older_than: Segundos desde que se tomaron para considerarlos abandonados
+
+        Returns:
+            Cantidad de trabajos recuperados
+        """
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                "UPDATE outbox SET status = 'pending', claimed_at = NULL "
+                "WHERE status = 'processing' AND claimed_at <= ?",
+                (time.time() - older_than,)
+            )
+        return cursor.rowcount
+
+    def list_dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        """Obtiene los trabajos fallidos más recientes"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM dead_letters ORDER BY id DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [_row_to_job(row) for row in rows]
+
+    def requeue_dead_letter(self, dead_letter_id: int) -> bool:
+        """
+        Vuelve a encolar un trabajo fallido con los intentos en cero
+
+        El trabajo se inserta y el dead letter se borra en la misma transacción:
+        si la inserción falla, el dead letter se conserva.
+
+        Returns:
+            False si no existe el dead letter
+
+        Raises:
+            ValueError: Si ya hay un trabajo vivo con la misma `dedup_key` (el dead letter se conserva)
+        """
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute("SELECT * FROM dead_letters WHERE id = ?", (dead_letter_id,)).fetchone()
+            if row is None:
+                return False
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (kind, payload, priority, dedup_key, next_attempt_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (row["kind"], row["payload"], row["priority"], row["dedup_key"], now, now)
+            )
+            if cursor.rowcount == 0:
+                raise ValueError(f"Ya hay un trabajo {row['dedup_key']} en el outbox")
+            self._conn.execute("DELETE FROM dead_letters WHERE id = ?", (dead_letter_id,))
+        for callback in self._enqueue_listeners:
+            callback()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Cantidad de trabajos por tipo y estado, y de dead letters"""
+        with self._lock:
+            rows = self._conn.execute("SELECT kind, status, COUNT(*) AS total FROM outbox GROUP BY kind, status").fetchall()
+            dead = self._conn.execute("SELECT COUNT(*) FROM dead_letters").fetchone()[0]
+        queued: Dict[str, Dict[str, int]] = {}
+        for row in rows:
+            queued.setdefault(row["kind"], {})[row["status"]] = row["total"]
+        return {"queued": queued, "dead_letters": dead}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class OutboxWorkerPool:
+    """Workers asyncio que entregan los trabajos del outbox"""
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        handlers: Dict[str, Callable[[Dict[str, Any]], Awaitable[None]]],
+        providers: Dict[str, str],
+        concurrency: Dict[str, int]
+    ):
+        """
+        Args:
+            outbox: Outbox a vaciar
+            handlers: Tipo de trabajo -> corrutina que hace el envío (lanza excepción si falla)
+            providers: Tipo de trabajo -> proveedor ("whatsapp", "telegram", "sendgrid")
+            concurrency: Proveedor -> máximo de envíos simultáneos
+        """
+        self.outbox = outbox
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self._kinds_by_provider: Dict[str, List[str]] = {}
+        for kind, provider in providers.items():
+            self._kinds_by_provider.setdefault(provider, []).append(kind)
+        self._in_flight: Dict[str, int] = {provider: 0 for provider in self._kinds_by_provider}
+        self._tasks: set = set()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.outbox.add_enqueue_listener(self._notify_enqueued)
+
+    def _notify_enqueued(self) -> None:
+        # `enqueue` corre en hilos del executor: despertar al despachador desde su event loop
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _call(self, method: Callable[..., Any], *args: Any) -> Any:
+        """Ejecuta una operación del outbox fuera del event loop (puede esperar el lock de SQLite)"""
+        return await asyncio.get_running_loop().run_in_executor(None, method, *args)
+
+    async def start(self) -> None:
+        """Recupera trabajos abandonados e inicia el despachador"""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = False
+        await self._recover_stale()
+        self._dispatcher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Detiene el despachador y espera (con límite) los envíos en curso"""
+        # En Python < 3.12, `wait_for` puede tragarse la cancelación si el evento
+        # se activa a la vez (un envío que termina): el despachador revisa además
+        # `_stopping` en cada vuelta
+        self._stopping = True
+        self._wake.set()
+        if self._dispatcher:
+            self._dispatcher.cancel()
+            try:
+                await self._dispatcher
+            except asyncio.CancelledError:
+                pass
+        if self._tasks:
+            _, pending = await asyncio.wait(self._tasks, timeout=settings.outbox_job_timeout)
+            # Los que no terminaron quedan "en proceso" y se recuperan al iniciar
+            for task in pending:
+                task.cancel()
+
+    async def recover_stale_periodically(self) -> None:
+        """Devuelve a la cola, cada `OUTBOX_JOB_TIMEOUT`, los trabajos de workers que se cayeron"""
+        while True:
+            await asyncio.sleep(settings.outbox_job_timeout)
+            await self._recover_stale()
+
+    async def _recover_stale(self) -> None:
+        try:
+            recovered = await self._call(self.outbox.recover_stale, settings.outbox_job_timeout * 2)
+        except Exception as e:
+            logger.error(f"Error al recuperar trabajos del outbox: {e}")
+            return
+        if recovered:
+            logger.info(f"{recovered} trabajos del outbox recuperados")
+
+    async def _run(self) -> None:
+        failures = 0
+        while not self._stopping:
+            self._wake.clear()
+            claimed = 0
+            try:
+                for provider, kinds in self._kinds_by_provider.items():
+                    free = self.concurrency.get(provider, 1) - self._in_flight[provider]
+                    for job in await self._call(self.outbox.claim, kinds, free):
+                        claimed += 1
+                        self._in_flight[provider] += 1
+                        task = asyncio.create_task(self._execute(job, provider))
+                        self._tasks.add(task)
+                        task.add_done_callback(self._tasks.discard)
+                failures = 0
+            except Exception as e:
+                # Por ejemplo "database is locked" con varios workers: el despachador no debe morir
+                failures += 1
+                delay = min(settings.outbox_backoff_base * (2 ** (failures - 1)), settings.outbox_backoff_max)
+                logger.error(f"Error al tomar trabajos del outbox ({e}). Reintento en {delay:.1f}s")
+                await asyncio.sleep(delay)
+                continue
+            if not claimed:
+                # Esperar un trabajo nuevo, un envío terminado o el próximo reintento
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=settings.outbox_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _execute(self, job: Dict[str, Any], provider: str) -> None:
+        try:
+            await asyncio.wait_for(self.handlers[job["kind"]](job["payload"]), timeout=settings.outbox_job_timeout)
+        except RateLimitedError as e:
+            # El proveedor pidió esperar (429 o cuota diaria): reprogramar sin gastar un intento
+            logger.warning(f"Trabajo {job['kind']} #{job['id']} reprogramado: {e}")
+            await self._record(self.outbox.retry, job, str(e), e.retry_after, False)
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            if job["attempts"] + 1 >= settings.outbox_max_attempts:
+                logger.error(f"Trabajo {job['kind']} #{job['id']} falló definitivamente: {error}")
+                await self._record(self.outbox.dead_letter, job, error)
+            else:
+                delay = min(settings.outbox_backoff_base * (2 ** job["attempts"]), settings.outbox_backoff_max)
+                delay *= random.uniform(0.8, 1.2)
+                logger.warning(f"Trabajo {job['kind']} #{job['id']} falló ({error}). Reintento en {delay:.1f}s")
+                await self._record(self.outbox.retry, job, error, delay)
+        else:
+            await self._record(self.outbox.complete, job["id"])
+        finally:
+            self._in_flight[provider] -= 1
+            self._wake.set()
+
+    async def _record(self, method: Callable[..., None], *args: Any) -> None:
+        # Si no se puede guardar el resultado, el trabajo queda "en proceso" y se recupera más tarde
+        try:
+            await self._call(method, *args)
+        except Exception as e:
+            logger.error(f"Error al actualizar el outbox ({method.__name__}): {e}")
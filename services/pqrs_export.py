@@ -0,0 +1,139 @@
+"""
+Exportación de PQRS en CSV o NDJSON por streaming
+
+Las PQRS se leen del almacenamiento por páginas con `query_pqrs` (paginación por
+keyset, los mismos filtros del dashboard) y cada página se formatea y, si se
+pide, se comprime con gzip antes de leer la siguiente. En memoria solo hay una
+página a la vez, sin importar el tamaño del archivo, y la lectura, el formato y
+la compresión corren fuera del event loop para que los webhooks sigan
+atendiéndose durante la exportación. Los cambios de otros workers se aplican
+en el event loop antes de cada página (`refresh`), nunca desde el executor.
+"""
+import asyncio
+import csv
+import io
+import json
+import zlib
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import logging
+
+from services.pqrs_storage import PQRSStorage, RegistroKey, registro_key
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson"
+}
+
+# Columnas del CSV (el NDJSON incluye todos los campos de cada PQRS)
+CSV_COLUMNS = (
+    "pqrs_id",
+    "fecha_registro",
+    "codigo_departamento",
+    "departamento",
+    "descripcion",
+    "fecha",
+    "telefono",
+    "enviado_telegram",
+    "fecha_envio_telegram",
+)
+
+# PQRS leídas y formateadas por vez
+PAGE_SIZE = 500
+
+# Una celda que empieza con estos caracteres se interpreta como fórmula en
+# Excel/LibreOffice (inyección CSV, ver OWASP): se antepone un apóstrofo
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csv_cell(value: Any) -> Any:
+    """Valor de una celda del CSV, neutralizando las fórmulas en los textos"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+class _Encoder:
+    """Formatea páginas de PQRS y las comprime con gzip si se pidió"""
+
+    def __init__(self, export_format: str, compress: bool):
+        self.export_format = export_format
+        # wbits 16 + 15: formato gzip (cabecera y CRC) en lugar de zlib
+        self._compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+
+    def header(self) -> bytes:
+        if self.export_format != "csv":
+            return self._encode("")
+        # BOM: Excel abre el archivo como UTF-8 (tildes y ñ)
+        return self._encode("\ufeff" + self._csv_rows([CSV_COLUMNS]))
+
+    def page(self, records: List[Dict[str, Any]]) -> bytes:
+        if self.export_format == "csv":
+            text = self._csv_rows([_csv_cell(record.get(column, "")) for column in CSV_COLUMNS] for record in records)
+        else:
+            text = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+        return self._encode(text)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush() if self._compressor is not None else b""
+
+    def _encode(self, text: str) -> bytes:
+        data = text.encode("utf-8")
+        return self._compressor.compress(data) if self._compressor is not None else data
+
+    @staticmethod
+    def _csv_rows(rows) -> str:
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+
+async def iter_export(
+    storage: PQRSStorage,
+    filters: Dict[str, Any],
+    export_format: str = "csv",
+    before: Optional[RegistroKey] = None,
+    compress: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Genera el archivo de exportación por partes
+
+    Args:
+        storage: Almacenamiento de PQRS
+        filters: Argumentos de filtro de `query_pqrs` (desde, hasta, codigo_departamento, enviado_telegram)
+        export_format: "csv" o "ndjson"
+        before: Continuar después de esta PQRS (cursor de una exportación interrumpida);
+            el CSV se envía sin encabezado para poder agregarlo al archivo parcial
+        compress: Comprimir con gzip (al continuar se genera otro miembro gzip, que
+            también se puede concatenar al archivo parcial)
+
+    Returns:
+        Generador async con el contenido, en el mismo orden que `/api/pqrs`
+        (más recientes primero)
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportación desconocido: {export_format}")
+    loop = asyncio.get_running_loop()
+    encoder = _Encoder(export_format, compress)
+
+    def next_chunk(after: Optional[RegistroKey]) -> Tuple[bytes, int, Optional[RegistroKey]]:
+        records = storage.query_pqrs(before=after, limit=PAGE_SIZE, refresh=False, **filters)
+        last = registro_key(records[-1]) if records else None
+        return encoder.page(records), len(records), last
+
+    if before is None:
+        yield encoder.header()
+    exported = 0
+    while True:
+        storage.refresh()
+        chunk, count, before = await loop.run_in_executor(None, next_chunk, before)
+        exported += count
+        if chunk:
+            yield chunk
+        if count < PAGE_SIZE:
+            break
+    yield encoder.finish()
+    logger.info(f"Exportación {export_format} completa: {exported} PQRS")
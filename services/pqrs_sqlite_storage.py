@@ -0,0 +1,345 @@
+"""
+Backend SQLite para el almacenamiento de PQRS
+
+Usa SQLite en modo WAL con índices sobre `pqrs_id`, `codigo_departamento`,
+`fecha_registro`, `enviado_telegram` y `telefono`, de modo que las consultas
+del bot y las del dashboard (`query_pqrs`) son búsquedas indexadas en lugar de
+recorrer todas las PQRS.
+
+Varios procesos pueden compartir la base: las escrituras son transacciones
+`BEGIN IMMEDIATE` y cada una marca las filas que toca con un `change_seq`
+creciente. Antes de cada operación, si `PRAGMA data_version` indica que otro
+proceso escribió, se leen las filas con `change_seq` nuevo y se notifican a los
+listeners (índice de similitud, etc.).
+
+Migración desde el almacenamiento JSON:
+
+    python -m services.pqrs_sqlite_storage migrate [pqrs_data.json] [pqrs_data.db]
+"""
+import json
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Iterator, Set
+import logging
+
+from services.pqrs_storage import PQRSStorage, JSONPQRSStorage, PQRS_FILE, RegistroKey
+from services.similarity_index import PQRSKey
+
+logger = logging.getLogger(__name__)
+
+# Columnas con tipo propio; el resto de campos de la PQRS se guardan en `extra`
+COLUMNS = (
+    "pqrs_id",
+    "departamento",
+    "codigo_departamento",
+    "descripcion",
+    "fecha",
+    "telefono",
+    "enviado_telegram",
+    "fecha_registro",
+    "fecha_envio_telegram",
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pqrs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    pqrs_id TEXT NOT NULL,
+    departamento TEXT,
+    codigo_departamento TEXT,
+    descripcion TEXT,
+    fecha TEXT,
+    telefono TEXT,
+    enviado_telegram INTEGER NOT NULL DEFAULT 0,
+    fecha_registro TEXT NOT NULL,
+    fecha_envio_telegram TEXT,
+    extra TEXT,
+    change_seq INTEGER NOT NULL DEFAULT 0,
+    UNIQUE (pqrs_id, fecha_registro)
+);
+CREATE INDEX IF NOT EXISTS idx_pqrs_pqrs_id ON pqrs (pqrs_id);
+CREATE INDEX IF NOT EXISTS idx_pqrs_registro ON pqrs (fecha_registro, pqrs_id);
+CREATE INDEX IF NOT EXISTS idx_pqrs_departamento_registro ON pqrs (codigo_departamento, fecha_registro, pqrs_id);
+CREATE INDEX IF NOT EXISTS idx_pqrs_telegram_registro ON pqrs (enviado_telegram, fecha_registro, pqrs_id);
+CREATE INDEX IF NOT EXISTS idx_pqrs_telefono ON pqrs (telefono);
+"""
+
+# Bases creadas antes de `change_seq`
+MIGRATIONS = (
+    ("change_seq", "ALTER TABLE pqrs ADD COLUMN change_seq INTEGER NOT NULL DEFAULT 0"),
+)
+CHANGE_SEQ_INDEX = "CREATE INDEX IF NOT EXISTS idx_pqrs_change_seq ON pqrs (change_seq)"
+# Reemplazados por los índices que terminan en `(fecha_registro, pqrs_id)`, que
+# además sirven el orden de las consultas paginadas
+OBSOLETE_INDEXES = ("idx_pqrs_departamento_fecha", "idx_pqrs_fecha_registro", "idx_pqrs_enviado_telegram")
+
+# Segundos que una escritura espera a que otro proceso libere la base
+BUSY_TIMEOUT = 30
+
+
+def _record_to_row(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Convierte una PQRS en los parámetros de una fila"""
+    row = {column: record.get(column) for column in COLUMNS}
+    row["enviado_telegram"] = 1 if record.get("enviado_telegram") else 0
+    extra = {key: value for key, value in record.items() if key not in COLUMNS}
+    row["extra"] = json.dumps(extra, ensure_ascii=False) if extra else None
+    return row
+
+
+def _row_to_record(row: sqlite3.Row) -> Dict[str, Any]:
+    """Convierte una fila en el mismo diccionario que produce el backend JSON"""
+    record = {column: row[column] for column in COLUMNS if row[column] is not None}
+    record["enviado_telegram"] = bool(row["enviado_telegram"])
+    if row["extra"]:
+        record.update(json.loads(row["extra"]))
+    return record
+
+
+class SQLitePQRSStorage(PQRSStorage):
+    """Backend de PQRS basado en SQLite (modo WAL)"""
+
+    def __init__(self, db_path: str = "pqrs_data.db", migrate_from: Optional[str] = PQRS_FILE):
+        super().__init__()
+        self.db_path = db_path
+        # El hilo de copia al dashboard también lee, por eso se serializa el acceso
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._migrate_schema()
+
+        # Cambios de otros procesos: hasta qué `change_seq` e `id` se notificaron
+        self._seen_seq, self._max_id = self._conn.execute(
+            "SELECT COALESCE(MAX(change_seq), 0), COALESCE(MAX(id), 0) FROM pqrs"
+        ).fetchone()
+        self._data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        # Escrituras propias que todavía no se alcanzaron al leer cambios ajenos
+        self._own_seqs: Set[int] = set()
+        self._own_ids: Set[int] = set()
+
+        # Primera ejecución con SQLite: importar las PQRS existentes del JSON
+        if migrate_from and self._count() == 0 and JSONPQRSStorage.exists(migrate_from):
+            migrated = self.import_records(JSONPQRSStorage.read_records(migrate_from))
+            logger.info(f"{migrated} PQRS migradas de {migrate_from} a {db_path}")
+
+        self._on_loaded()
+
+    def _migrate_schema(self) -> None:
+        """Agrega las columnas que le faltan a una base creada por una versión anterior"""
+        with self._transaction():
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(pqrs)")}
+            for column, sql in MIGRATIONS:
+                if column not in columns:
+                    self._conn.execute(sql)
+                    logger.info(f"Columna {column} agregada a {self.db_path}")
+            self._conn.execute(CHANGE_SEQ_INDEX)
+            for index in OBSOLETE_INDEXES:
+                self._conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Transacción de escritura: toma el lock de escritura de SQLite desde el inicio"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.rollback()
+            raise
+        self._conn.commit()
+
+    @contextmanager
+    def _write(self) -> Iterator[int]:
+        """
+        Escritura de PQRS (con el lock del backend tomado)
+
+        Las filas que se escriban deben llevar `change_seq` mayor al valor que
+        entrega, en orden. Al terminar se registran como propias para no
+        notificarlas otra vez al leer los cambios de otros procesos.
+        """
+        with self._transaction():
+            last_seq = self._conn.execute("SELECT COALESCE(MAX(change_seq), 0) FROM pqrs").fetchone()[0]
+            yield last_seq
+            written = self._conn.execute(
+                "SELECT id, change_seq FROM pqrs WHERE change_seq > ?", (last_seq,)
+            ).fetchall()
+        if not written:
+            return
+        if last_seq == self._seen_seq:
+            # No hay cambios ajenos sin leer antes de estas escrituras
+            self._seen_seq = max(row["change_seq"] for row in written)
+            self._max_id = max(self._max_id, max(row["id"] for row in written))
+        else:
+            self._own_seqs.update(row["change_seq"] for row in written)
+            self._own_ids.update(row["id"] for row in written)
+
+    def _refresh(self) -> None:
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+            if data_version == self._data_version:
+                return
+            self._data_version = data_version
+            rows = self._conn.execute(
+                "SELECT * FROM pqrs WHERE change_seq > ? ORDER BY change_seq", (self._seen_seq,)
+            ).fetchall()
+            if not rows:
+                return
+            changes = []
+            for row in rows:
+                is_new = row["id"] > self._max_id and row["id"] not in self._own_ids
+                if row["change_seq"] in self._own_seqs and not is_new:
+                    continue
+                changes.append(("add" if is_new else "update", _row_to_record(row)))
+            self._seen_seq = rows[-1]["change_seq"]
+            self._max_id = max(self._max_id, max(row["id"] for row in rows))
+            self._own_seqs = {seq for seq in self._own_seqs if seq > self._seen_seq}
+            self._own_ids = {row_id for row_id in self._own_ids if row_id > self._max_id}
+        for event, record in changes:
+            self._notify(event, record)
+
+    def _count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pqrs").fetchone()[0]
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_record(row) for row in rows]
+
+    def import_records(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Inserta PQRS existentes en una sola transacción
+
+        Las PQRS ya presentes (mismo `pqrs_id` y `fecha_registro`) se ignoran,
+        así que la importación se puede repetir sin duplicar registros.
+
+        Returns:
+            Cantidad de PQRS insertadas
+        """
+        placeholders = ", ".join(f":{column}" for column in COLUMNS + ("extra", "change_seq"))
+        sql = f"INSERT OR IGNORE INTO pqrs ({', '.join(COLUMNS)}, extra, change_seq) VALUES ({placeholders})"
+        with self._lock:
+            before = self._conn.total_changes
+            with self._write() as last_seq:
+                self._conn.executemany(sql, (
+                    {**_record_to_row(record), "change_seq": last_seq + position}
+                    for position, record in enumerate(records, start=1)
+                ))
+            return self._conn.total_changes - before
+
+    def _insert_pqrs(self, pqrs_data: Dict[str, Any]) -> bool:
+        # Sin capturar el error: `add_pqrs` no notifica ni confirma una PQRS que no se guardó
+        return self.import_records([pqrs_data]) > 0
+
+    def _update_pqrs(self, pqrs_id: str, fecha_registro: Optional[str],
+                     fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Lectura y escritura en la misma transacción: otro proceso no puede
+        # modificar la fila entre las dos
+        with self._lock, self._write() as last_seq:
+            if fecha_registro is None:
+                row = self._conn.execute(
+                    "SELECT * FROM pqrs WHERE pqrs_id = ? ORDER BY id LIMIT 1", (pqrs_id,)
+                ).fetchone()
+            else:
+                row = self._conn.execute(
+                    "SELECT * FROM pqrs WHERE pqrs_id = ? AND fecha_registro = ?", (pqrs_id, fecha_registro)
+                ).fetchone()
+            if row is None:
+                return None
+            record = _row_to_record(row)
+            record.update(fields)
+            values = _record_to_row(record)
+            assignments = ", ".join(f"{column} = :{column}" for column in COLUMNS + ("extra", "change_seq"))
+            self._conn.execute(
+                f"UPDATE pqrs SET {assignments} WHERE id = :id",
+                {**values, "change_seq": last_seq + 1, "id": row["id"]}
+            )
+        return record
+
+    def _get_by_keys(self, keys: List[PQRSKey]) -> List[Dict[str, Any]]:
+        if not keys:
+            return []
+        placeholders = ", ".join("?" for _ in keys)
+        rows = self._query(
+            f"SELECT * FROM pqrs WHERE pqrs_id IN ({placeholders})",
+            tuple(pqrs_id for pqrs_id, _ in keys)
+        )
+        by_key = {(row["pqrs_id"], row["fecha_registro"]): row for row in rows}
+        return [by_key[key] for key in keys if key in by_key]
+
+    def get_pending_pqrs(self) -> List[Dict[str, Any]]:
+        """Obtiene las PQRS pendientes de enviar a Telegram"""
+        return self._query("SELECT * FROM pqrs WHERE enviado_telegram = 0 ORDER BY id")
+
+    def _query_pqrs(self, desde: Optional[str], hasta: Optional[str], codigo_departamento: Optional[str],
+                    enviado_telegram: Optional[bool], before: Optional[RegistroKey],
+                    limit: int) -> List[Dict[str, Any]]:
+        # El ORDER BY coincide con el final de los índices `*_registro`: SQLite
+        # recorre el índice desde el cursor y se detiene en `limit` filas
+        conditions = []
+        params: List[Any] = []
+        if desde:
+            conditions.append("fecha_registro >= ?")
+            params.append(desde)
+        if hasta:
+            conditions.append("fecha_registro < ?")
+            params.append(hasta)
+        if codigo_departamento:
+            conditions.append("codigo_departamento = ?")
+            params.append(codigo_departamento)
+        if enviado_telegram is not None:
+            conditions.append("enviado_telegram = ?")
+            params.append(1 if enviado_telegram else 0)
+        if before is not None:
+            conditions.append("(fecha_registro, pqrs_id) < (?, ?)")
+            params.extend(before)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return self._query(
+            f"SELECT * FROM pqrs {where} ORDER BY fecha_registro DESC, pqrs_id DESC LIMIT ?",
+            tuple(params) + (limit,)
+        )
+
+    def get_all_pqrs(self) -> List[Dict[str, Any]]:
+        """Obtiene todas las PQRS"""
+        return self._query("SELECT * FROM pqrs ORDER BY id")
+
+    def _data_files(self) -> List[str]:
+        return [self.db_path, f"{self.db_path}-wal"]
+
+    def close(self) -> None:
+        """Cierra la conexión a la base de datos"""
+        super().close()
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_json_to_sqlite(json_path: str = PQRS_FILE, db_path: str = "pqrs_data.db") -> int:
+    """
+    Migra las PQRS del almacenamiento JSON (snapshot + journal) a SQLite
+
+    Args:
+        json_path: Ruta del snapshot JSON
+        db_path: Ruta de la base de datos SQLite destino
+
+    Returns:
+        Cantidad de PQRS insertadas
+    """
+    records = JSONPQRSStorage.read_records(json_path)
+    storage = SQLitePQRSStorage(db_path, migrate_from=None)
+    try:
+        migrated = storage.import_records(records)
+    finally:
+        storage.close()
+    logger.info(f"Migración completada: {migrated} de {len(records)} PQRS insertadas en {db_path}")
+    return migrated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if len(sys.argv) < 2 or sys.argv[1] != "migrate":
+        print("Uso: python -m services.pqrs_sqlite_storage migrate [pqrs_data.json] [pqrs_data.db]")
+        sys.exit(1)
+    migrate_json_to_sqlite(*sys.argv[2:4])
@@ -0,0 +1,187 @@
+"""
+Estadísticas de PQRS mantenidas de forma incremental
+
+El dashboard recalculaba los totales, el conteo por departamento y las series
+temporales recorriendo todas las PQRS en cada refresco. Aquí los contadores se
+actualizan con cada evento del almacenamiento ("add" al registrar una PQRS,
+"update" al marcarla como enviada a Telegram), así que responder una consulta
+solo recorre los buckets de la serie pedida.
+
+Los contadores se reconstruyen al iniciar con la reproducción de las PQRS
+existentes (`add_listener(replay=True)`), igual que el índice de similitud.
+`check_consistency` los compara con un recálculo completo.
+"""
+import threading
+from functools import lru_cache
+from datetime import date, timedelta
+from typing import List, Dict, Any, Optional, Set
+import logging
+
+from services.similarity_index import PQRSKey
+
+logger = logging.getLogger(__name__)
+
+GROUPS = ("day", "week", "month")
+
+# Contadores de todos los departamentos juntos
+ALL_DEPARTMENTS = "*"
+
+
+def bucket_keys(fecha_registro: Optional[str]) -> Dict[str, str]:
+    """
+    Buckets de una fecha de registro ISO, con las mismas claves que el dashboard
+
+    Returns:
+        `{"day": "YYYY-MM-DD", "week": <domingo de esa semana>, "month": "YYYY-MM"}`,
+        vacío si la fecha no es válida
+    """
+    return _day_buckets((fecha_registro or "")[:10])
+
+
+@lru_cache(maxsize=4096)
+def _day_buckets(day_text: str) -> Dict[str, str]:
+    # Muchas PQRS comparten día: se evita volver a parsear la fecha al reconstruir
+    try:
+        day = date.fromisoformat(day_text)
+    except ValueError:
+        return {}
+    # Las semanas empiezan el domingo, como `Date.getDay()` en el dashboard
+    week = day - timedelta(days=(day.weekday() + 1) % 7)
+    return {"day": day.isoformat(), "week": week.isoformat(), "month": day.isoformat()[:7]}
+
+
+class PQRSRollups:
+    """Totales, conteo por departamento y series por día/semana/mes, enviadas y pendientes"""
+
+    def __init__(self):
+        # Departamento (o ALL_DEPARTMENTS) -> [total, enviadas]
+        self._totals: Dict[str, List[int]] = {}
+        # Agrupación -> departamento -> bucket -> [total, enviadas]
+        self._buckets: Dict[str, Dict[str, Dict[str, List[int]]]] = {group: {} for group in GROUPS}
+        # Código de departamento -> nombre
+        self._names: Dict[str, str] = {}
+        # PQRS pendientes: un "update" solo mueve contadores si cambia el estado
+        self._pending: Set[PQRSKey] = set()
+        self._lock = threading.Lock()
+
+    def on_event(self, event: str, record: Dict[str, Any]) -> None:
+        """Listener del almacenamiento (`add_listener`)"""
+        key = (record.get("pqrs_id"), record.get("fecha_registro"))
+        sent = bool(record.get("enviado_telegram", False))
+        with self._lock:
+            if event == "add":
+                if not sent:
+                    self._pending.add(key)
+                self._apply(record, 1, 1 if sent else 0)
+            elif event == "update":
+                was_pending = key in self._pending
+                if sent and was_pending:
+                    self._pending.discard(key)
+                    self._apply(record, 0, 1)
+                elif not sent and not was_pending:
+                    self._pending.add(key)
+                    self._apply(record, 0, -1)
+
+    def _apply(self, record: Dict[str, Any], total: int, sent: int) -> None:
+        department = record.get("codigo_departamento") or ""
+        if record.get("departamento"):
+            self._names[department] = record["departamento"]
+        buckets = bucket_keys(record.get("fecha_registro"))
+        for scope in (ALL_DEPARTMENTS, department):
+            counts = self._totals.setdefault(scope, [0, 0])
+            counts[0] += total
+            counts[1] += sent
+            for group, bucket in buckets.items():
+                counts = self._buckets[group].setdefault(scope, {}).setdefault(bucket, [0, 0])
+                counts[0] += total
+                counts[1] += sent
+
+    def pending(self) -> int:
+        """PQRS pendientes de enviar a Telegram (sin recorrer las PQRS)"""
+        with self._lock:
+            total, sent = self._totals.get(ALL_DEPARTMENTS, [0, 0])
+        return total - sent
+
+    def snapshot(self, group_by: str = "day", codigo_departamento: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Estadísticas actuales
+
+        Args:
+            group_by: Agrupación de la serie: "day", "week" o "month"
+            codigo_departamento: Solo este departamento (None para todos)
+
+        Returns:
+            Totales, conteo por departamento (mayor primero) y serie temporal
+            ordenada con el acumulado
+        """
+        if group_by not in GROUPS:
+            raise ValueError(f"Agrupación desconocida: {group_by}")
+        scope = codigo_departamento or ALL_DEPARTMENTS
+        with self._lock:
+            total, sent = self._totals.get(scope, [0, 0])
+            departments = [
+                {
+                    "codigo_departamento": code,
+                    "departamento": self._names.get(code, code),
+                    "cantidad": counts[0],
+                    "enviadas": counts[1],
+                    "pendientes": counts[0] - counts[1]
+                }
+                for code, counts in self._totals.items()
+                if code != ALL_DEPARTMENTS and (codigo_departamento is None or code == codigo_departamento)
+            ]
+            buckets = sorted(
+                (bucket, counts[0], counts[1])
+                for bucket, counts in self._buckets[group_by].get(scope, {}).items()
+            )
+
+        serie = []
+        acumulado = 0
+        for bucket, cantidad, enviadas in buckets:
+            acumulado += cantidad
+            serie.append({
+                "fecha": bucket,
+                "cantidad": cantidad,
+                "enviadas": enviadas,
+                "pendientes": cantidad - enviadas,
+                "acumulado": acumulado
+            })
+        departments.sort(key=lambda item: (-item["cantidad"], item["codigo_departamento"]))
+        return {
+            "total": total,
+            "enviadas_telegram": sent,
+            "pendientes_telegram": total - sent,
+            "por_departamento": departments,
+            "group_by": group_by,
+            "serie": serie
+        }
+
+    def check_consistency(self, records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Compara los contadores con un recálculo completo
+
+        Args:
+            records: Todas las PQRS del almacenamiento
+
+        Returns:
+            `consistent` y, si hay diferencias, las primeras encontradas
+            (`[scope, actual, esperado]`)
+        """
+        expected = PQRSRollups()
+        for record in records:
+            expected.on_event("add", record)
+        differences = []
+        with self._lock:
+            counters = [("totals", self._totals, expected._totals)]
+            counters += [(group, self._buckets[group], expected._buckets[group]) for group in GROUPS]
+            for name, actual, wanted in counters:
+                for scope in sorted(set(actual) | set(wanted)):
+                    if actual.get(scope) != wanted.get(scope):
+                        differences.append([f"{name}:{scope}", actual.get(scope), wanted.get(scope)])
+        if differences:
+            logger.warning(f"Estadísticas de PQRS inconsistentes en {len(differences)} contadores")
+        return {
+            "consistent": not differences,
+            "records": len(records),
+            "differences": differences[:20]
+        }
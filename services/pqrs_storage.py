@@ -1,31 +1,546 @@
 """
 Servicio de almacenamiento de PQRS
+
+`PQRSStorage` define la interfaz común de almacenamiento. Hay dos backends:
+
+- `JSONPQRSStorage`: snapshot (`pqrs_data.json`) más un journal append-only
+  (`pqrs_data.json.journal`) en formato NDJSON. Cada operación agrega una sola
+  línea al journal (O(1)) y actualiza una vista materializada en memoria. Al
+  iniciar se carga el snapshot y se reproduce el journal; cuando el journal
+  crece, se compacta en segundo plano escribiendo un snapshot nuevo con rename atómico.
+  Varios procesos pueden compartir los archivos (locks de archivo + lectura de
+  la cola del journal).
+- `SQLitePQRSStorage` (`services/pqrs_sqlite_storage.py`): base de datos SQLite
+  en modo WAL con índices para las consultas frecuentes.
+
+El backend se elige con `settings.storage_backend` a través de `create_pqrs_storage()`.
 """
+import bisect
 import json
 import os
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import List, Dict, Any, Optional, Callable, Sequence, Tuple
+from datetime import datetime, timedelta
 import logging
 
+from config import settings
+from services.similarity_index import PQRSKey
+from services.similarity_engine import create_similarity_index
+from services.pqrs_stats import PQRSRollups
+from services.dashboard_snapshot import DashboardSnapshot, SnapshotVersion
+from services.metrics import STORAGE_LATENCY
+from services.tracing import span
+from services.storage_writer import CoalescingWriter
+from utils.file_lock import FileLock
+
 logger = logging.getLogger(__name__)
 
 PQRS_FILE = "pqrs_data.json"
+JOURNAL_SUFFIX = ".journal"
+COMPACTING_SUFFIX = ".compacting"
+LOCK_SUFFIX = ".lock"
+COMPACT_LOCK_SUFFIX = ".compact.lock"
+# Primera línea de cada journal: `{"op": "journal", "id": ..., "prev": <journal anterior>}`
+JOURNAL_HEADER_OP = "journal"
+
+
+def _write_json_tmp(path: str, data: Any) -> str:
+    """Escribe JSON en un archivo temporal junto a `path` (con fsync) y retorna su ruta"""
+    # Un temporal por proceso: varios workers pueden escribir el mismo archivo
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    return tmp_path
+
+
+# Orden estable de las consultas paginadas: `(fecha_registro, pqrs_id)`
+RegistroKey = Tuple[str, str]
+
+
+def registro_key(record: Dict[str, Any]) -> RegistroKey:
+    """Clave de orden de una PQRS en las consultas paginadas"""
+    return record.get("fecha_registro") or "", record.get("pqrs_id") or ""
 
 
-class PQRSStorage:
-    """Maneja el almacenamiento persistente de PQRS"""
-    
+class RegistroTimeline:
+    """
+    PQRS ordenadas por `(fecha_registro, pqrs_id)` para consultas por rango y keyset
+
+    Las claves y las PQRS se guardan en listas paralelas para poder usar `bisect`
+    (sin `key=`, que requiere Python 3.10). Las PQRS nuevas casi siempre son las
+    más recientes, así que agregar suele ser un `append`.
+    """
+
     def __init__(self):
-        self.file_path = PQRS_FILE
-        self._ensure_file_exists()
-    
-    def _ensure_file_exists(self) -> None:
-        """Asegura que el archivo existe"""
-        if not os.path.exists(self.file_path):
-            self._save_pqrs([])
-    
-    def _load_pqrs(self) -> List[Dict[str, Any]]:
-        """Carga las PQRS desde el archivo"""
+        self._keys: List[RegistroKey] = []
+        self._records: List[Dict[str, Any]] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        key = registro_key(record)
+        if not self._keys or key >= self._keys[-1]:
+            self._keys.append(key)
+            self._records.append(record)
+            return
+        position = bisect.bisect_right(self._keys, key)
+        self._keys.insert(position, key)
+        self._records.insert(position, record)
+
+    def page(self, desde: Optional[str], hasta: Optional[str], before: Optional[RegistroKey],
+             predicate: Optional[Callable[[Dict[str, Any]], bool]], limit: int) -> List[Dict[str, Any]]:
+        """
+        PQRS del rango, más recientes primero
+
+        Args:
+            desde: `fecha_registro` mínima (incluida)
+            hasta: `fecha_registro` máxima (excluida)
+            before: Solo las PQRS anteriores a esta clave (cursor de la página anterior)
+            predicate: Filtro adicional sobre cada PQRS
+            limit: Cantidad máxima de PQRS
+
+        Returns:
+            PQRS en orden descendente de `(fecha_registro, pqrs_id)`
+        """
+        # Una tupla de un solo elemento queda antes de todas las claves con esa fecha
+        lower = bisect.bisect_left(self._keys, (desde,)) if desde else 0
+        upper = len(self._keys)
+        if hasta:
+            upper = bisect.bisect_left(self._keys, (hasta,))
+        if before is not None:
+            upper = min(upper, bisect.bisect_left(self._keys, before))
+
+        page: List[Dict[str, Any]] = []
+        for position in range(upper - 1, lower - 1, -1):
+            record = self._records[position]
+            if predicate is None or predicate(record):
+                page.append(record)
+                if len(page) >= limit:
+                    break
+        return page
+
+
+class PQRSStorage(ABC):
+    """Interfaz común para el almacenamiento persistente de PQRS"""
+
+    def __init__(self):
+        # Callbacks `(evento, pqrs)` que se ejecutan al agregar ("add") o actualizar ("update") una PQRS
+        self._listeners: List[Callable[[str, Dict[str, Any]], None]] = []
+        self.similarity_index = create_similarity_index()
+        self.stats = PQRSRollups()
+        self.dashboard_snapshot = DashboardSnapshot()
+
+    # ------------------------------------------------------------------
+    # Operaciones que implementa cada backend
+    # ------------------------------------------------------------------
+
+    @abstractmethod
+    def _insert_pqrs(self, pqrs_data: Dict[str, Any]) -> bool:
+        """
+        Persiste una PQRS nueva (ya con `fecha_registro` y `enviado_telegram`)
+
+        Returns:
+            False si ya había una PQRS con la misma `(pqrs_id, fecha_registro)` (no se guarda)
+        """
+
+    @abstractmethod
+    def _update_pqrs(self, pqrs_id: str, fecha_registro: Optional[str],
+                     fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Actualiza campos de una PQRS. Retorna la PQRS actualizada o None si no existe.
+
+        Con `fecha_registro` se actualiza exactamente esa PQRS; sin ella, la primera
+        registrada con ese ID.
+        """
+
+    @abstractmethod
+    def _get_by_keys(self, keys: List[PQRSKey]) -> List[Dict[str, Any]]:
+        """Obtiene PQRS por su clave `(pqrs_id, fecha_registro)`, en el mismo orden"""
+
+    @abstractmethod
+    def get_pending_pqrs(self) -> List[Dict[str, Any]]:
+        """Obtiene las PQRS pendientes de enviar a Telegram"""
+
+    @abstractmethod
+    def _query_pqrs(self, desde: Optional[str], hasta: Optional[str], codigo_departamento: Optional[str],
+                    enviado_telegram: Optional[bool], before: Optional[RegistroKey],
+                    limit: int) -> List[Dict[str, Any]]:
+        """Página de PQRS filtradas, en orden descendente de `(fecha_registro, pqrs_id)` (ver `query_pqrs`)"""
+
+    @abstractmethod
+    def get_all_pqrs(self) -> List[Dict[str, Any]]:
+        """Obtiene todas las PQRS"""
+
+    def count_pending(self) -> int:
+        """
+        Cantidad de PQRS pendientes de enviar a Telegram
+
+        Sale de los contadores incrementales (`stats`), sin recorrer las PQRS ni
+        leer los cambios de otros procesos: sirve para el gauge de `/metrics`.
+        """
+        return self.stats.pending()
+
+    def close(self) -> None:
+        """Libera los recursos del backend"""
+
+    def persisted(self) -> Future:
+        """Future que se completa cuando todas las escrituras hechas hasta ahora son durables"""
+        future: Future = Future()
+        future.set_result(None)
+        return future
+
+    def _data_files(self) -> List[str]:
+        """Archivos donde el backend guarda los datos"""
+        return []
+
+    def size_bytes(self) -> int:
+        """Tamaño en disco de los archivos del backend"""
+        return sum(os.path.getsize(path) for path in self._data_files() if os.path.exists(path))
+
+    def _refresh(self) -> None:
+        """Aplica a la vista en memoria los cambios que hicieron otros procesos"""
+
+    def refresh(self) -> None:
+        """
+        Aplica y notifica a los listeners los cambios de otros procesos sin hacer otra operación
+
+        Los listeners (índice de similitud, estadísticas, snapshot, feed de cambios)
+        no admiten llamadas concurrentes: `refresh` y las operaciones que leen los
+        cambios ajenos se llaman desde el event loop, nunca desde el executor.
+        """
+        self._refresh()
+
+    def _on_loaded(self) -> None:
+        """Lo llama cada backend al terminar de cargar sus datos"""
+        self.add_listener(self._update_indexes)
+
+    # ------------------------------------------------------------------
+    # Eventos de cambio
+    # ------------------------------------------------------------------
+
+    def add_listener(self, callback: Callable[[str, Dict[str, Any]], None], replay: bool = True) -> None:
+        """
+        Registra un callback que se ejecuta en cada cambio de una PQRS
+
+        Args:
+            callback: Función `(evento, pqrs)`; evento es "add" o "update"
+            replay: Si es True, se llama primero con "add" para cada PQRS existente
+        """
+        if replay:
+            for record in self.get_all_pqrs():
+                callback("add", record)
+        self._listeners.append(callback)
+
+    def _notify(self, event: str, record: Dict[str, Any]) -> None:
+        for callback in self._listeners:
+            try:
+                callback(event, record)
+            except Exception as e:
+                logger.error(f"Error en listener de PQRS ({event}): {e}")
+
+    def _update_indexes(self, event: str, record: Dict[str, Any]) -> None:
+        # Un solo listener: al iniciar, las PQRS se recorren una vez para ambos
+        if event == "add":
+            self.similarity_index.add(record)
+        self.stats.on_event(event, record)
+        self.dashboard_snapshot.invalidate()
+
+    # ------------------------------------------------------------------
+    # API pública
+    # ------------------------------------------------------------------
+
+    def add_pqrs(self, pqrs_data: Dict[str, Any]) -> Future:
+        """
+        Agrega una nueva PQRS
+
+        La PQRS queda visible de inmediato en las lecturas; la escritura a disco
+        puede completarse después. Si ya hay una PQRS con la misma
+        `(pqrs_id, fecha_registro)`, no se guarda ni se notifica otra vez.
+
+        Returns:
+            Future que se completa cuando la PQRS es durable
+            (`await asyncio.wrap_future(...)` desde código async); falla si
+            la escritura a disco falla
+
+        Raises:
+            Exception: Si el backend no pudo guardar la PQRS (no se notifica a los listeners)
+        """
+        self._refresh()
+        pqrs_data["enviado_telegram"] = False
+        pqrs_data["fecha_registro"] = datetime.now().isoformat()
+        with STORAGE_LATENCY.labels("add").time(), span("storage.add"):
+            inserted = self._insert_pqrs(pqrs_data)
+        if not inserted:
+            logger.warning(
+                f"PQRS {pqrs_data.get('pqrs_id')} del {pqrs_data['fecha_registro']} ya estaba registrada. Se omite."
+            )
+            return self.persisted()
+        self._notify("add", pqrs_data)
+        logger.info(f"PQRS guardada: {pqrs_data.get('pqrs_id')}")
+        return self.persisted()
+
+    def update_pqrs(self, pqrs_id: str, fields: Dict[str, Any],
+                    fecha_registro: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Actualiza campos de una PQRS
+
+        El ID tiene resolución de un segundo y dos PQRS pueden compartirlo: la
+        PQRS se identifica por `(pqrs_id, fecha_registro)`.
+
+        Args:
+            pqrs_id: ID de la PQRS
+            fields: Campos a actualizar
+            fecha_registro: Fecha de registro de la PQRS; si es None (trabajos
+                encolados por versiones anteriores) se actualiza la primera con ese ID
+
+        Returns:
+            PQRS actualizada, o None si no existe
+        """
+        self._refresh()
+        with STORAGE_LATENCY.labels("update").time(), span("storage.update"):
+            record = self._update_pqrs(pqrs_id, fecha_registro, fields)
+        if record is None:
+            logger.warning(f"PQRS {pqrs_id} no encontrada")
+            return None
+        self._notify("update", record)
+        return record
+
+    def mark_as_sent(self, pqrs_id: str, fecha_registro: Optional[str] = None) -> None:
+        """Marca una PQRS como enviada a Telegram (ver `update_pqrs`)"""
+        fields = {
+            "enviado_telegram": True,
+            "fecha_envio_telegram": datetime.now().isoformat()
+        }
+        if self.update_pqrs(pqrs_id, fields, fecha_registro) is not None:
+            logger.info(f"PQRS {pqrs_id} marcada como enviada")
+
+    def get_similar_pqrs(self, codigo_departamento: str, descripcion: str,
+                        similarity_threshold: Optional[float] = None, limit: Optional[int] = None,
+                        window_hours: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Obtiene PQRS similares para detectar quejas repetidas
+
+        Args:
+            codigo_departamento: Código del departamento
+            descripcion: Descripción a comparar
+            similarity_threshold: Umbral del motor de similitud (palabras en común para
+                "tokens", Jaccard para "minhash"); por defecto el configurado
+            limit: Últimas PQRS del departamento a considerar (por defecto `settings.similarity_limit`)
+            window_hours: Ventana de tiempo en horas; si es mayor que 0 reemplaza a `limit`
+                (por defecto `settings.similarity_window_hours`)
+
+        Returns:
+            PQRS similares, más recientes primero
+        """
+        if limit is None:
+            limit = settings.similarity_limit
+        if window_hours is None:
+            window_hours = settings.similarity_window_hours
+        since = None
+        if window_hours and window_hours > 0:
+            since = (datetime.now() - timedelta(hours=window_hours)).isoformat()
+
+        self._refresh()
+        with STORAGE_LATENCY.labels("similar").time(), span("storage.similar"):
+            keys = self.similarity_index.find_similar(
+                codigo_departamento,
+                descripcion,
+                similarity_threshold=similarity_threshold,
+                limit=limit,
+                since=since
+            )
+            return self._get_by_keys(keys)
+
+    def count_similar_pqrs(self, pqrs_list: List[Dict[str, Any]],
+                           similarity_threshold: Optional[float] = None) -> Dict[PQRSKey, int]:
+        """
+        Cuenta las PQRS similares de varias PQRS en una sola pasada
+
+        Pensado para el reenvío de pendientes al iniciar: consulta solo el índice
+        de similitud (sin leer las PQRS similares del almacenamiento) y calcula la
+        ventana de búsqueda una sola vez.
+
+        Args:
+            pqrs_list: PQRS a evaluar
+            similarity_threshold: Umbral del motor de similitud (por defecto el configurado)
+
+        Returns:
+            Diccionario `(pqrs_id, fecha_registro)` -> cantidad de PQRS similares,
+            sin contar la propia
+        """
+        self._refresh()
+        since = None
+        if settings.similarity_window_hours > 0:
+            since = (datetime.now() - timedelta(hours=settings.similarity_window_hours)).isoformat()
+
+        counts: Dict[PQRSKey, int] = {}
+        for pqrs in sorted(pqrs_list, key=lambda x: x.get("codigo_departamento") or ""):
+            keys = self.similarity_index.find_similar(
+                pqrs.get("codigo_departamento"),
+                pqrs.get("descripcion", ""),
+                similarity_threshold=similarity_threshold,
+                limit=settings.similarity_limit,
+                since=since
+            )
+            own_key = (pqrs.get("pqrs_id"), pqrs.get("fecha_registro"))
+            counts[own_key] = sum(1 for key in keys if key != own_key)
+        return counts
+
+    def query_pqrs(self, desde: Optional[str] = None, hasta: Optional[str] = None,
+                   codigo_departamento: Optional[str] = None, enviado_telegram: Optional[bool] = None,
+                   before: Optional[RegistroKey] = None, limit: int = 100,
+                   refresh: bool = True) -> List[Dict[str, Any]]:
+        """
+        Consulta paginada de PQRS con los filtros del dashboard
+
+        El orden es estable (`fecha_registro` y `pqrs_id` descendentes), así que la
+        página siguiente se pide con la clave de la última PQRS (`before`) y las
+        PQRS nuevas no desplazan las páginas ya leídas.
+
+        Args:
+            desde: `fecha_registro` mínima, ISO (incluida)
+            hasta: `fecha_registro` máxima, ISO (excluida)
+            codigo_departamento: Solo las PQRS de este departamento
+            enviado_telegram: True/False para solo enviadas/pendientes; None para todas
+            before: Clave `(fecha_registro, pqrs_id)` de la última PQRS de la página anterior
+            limit: Cantidad máxima de PQRS
+            refresh: Leer antes los cambios de otros procesos. Solo desde el event loop:
+                fuera de él (p. ej. en el executor) pasar False y llamar `refresh()`
+                en el event loop antes
+
+        Returns:
+            PQRS más recientes primero (copias: se pueden usar fuera del lock)
+        """
+        if refresh:
+            self._refresh()
+        with STORAGE_LATENCY.labels("query").time(), span("storage.query"):
+            return self._query_pqrs(desde, hasta, codigo_departamento, enviado_telegram, before, limit)
+
+    def check_stats(self) -> Dict[str, Any]:
+        """
+        Compara las estadísticas incrementales (`stats`) con un recálculo desde todas las PQRS
+
+        Se puede llamar fuera del event loop: recorre una copia de las PQRS y no lee
+        los cambios de otros procesos (para incluirlos, antes `refresh()` en el event loop).
+        """
+        return self.stats.check_consistency(self._snapshot_records())
+
+    # ------------------------------------------------------------------
+    # Snapshot para el dashboard
+    # ------------------------------------------------------------------
+
+    def get_dashboard_snapshot(self) -> SnapshotVersion:
+        """
+        Todas las PQRS serializadas para el dashboard, con ETag
+
+        Solo se vuelve a serializar si hubo cambios desde la última petición.
+        Se puede llamar fuera del event loop: no lee los cambios de otros
+        procesos, para incluirlos se llama antes a `refresh()` en el event loop.
+        """
+        return self.dashboard_snapshot.get(self._snapshot_records)
+
+    def _snapshot_records(self) -> List[Dict[str, Any]]:
+        """Copia de todas las PQRS para el snapshot o el recálculo de estadísticas (fuera del event loop)"""
+        return self.get_all_pqrs()
+
+
+class JSONPQRSStorage(PQRSStorage):
+    """
+    Backend de PQRS basado en snapshot JSON + journal append-only
+
+    Varios procesos (por ejemplo `uvicorn --workers N`) pueden compartir los archivos:
+
+    - Escribir en el journal y rotarlo requiere el lock de archivo `.lock`, así
+      nadie escribe en un journal que otro proceso está rotando.
+    - Cada evento lleva el ID del proceso que lo escribió (`src`). Antes de cada
+      operación se lee la cola del journal y se aplican solo los eventos ajenos.
+    - Cada journal empieza con una cabecera con su ID y el del journal anterior;
+      si un proceso se perdió una rotación completa, se resincroniza desde disco.
+    - La compactación la hace un solo proceso a la vez (`.compact.lock`) y arma el
+      snapshot desde los archivos, no desde la vista de un proceso.
+    """
+
+    def __init__(
+        self,
+        file_path: str = PQRS_FILE,
+        read_only: bool = False,
+        journals: Optional[Sequence[str]] = None
+    ):
+        """
+        Args:
+            file_path: Ruta del snapshot
+            read_only: Solo lectura (no abre el journal ni toma locks)
+            journals: Journals a reproducir sobre el snapshot (por defecto `.compacting` y el journal)
+        """
+        super().__init__()
+        self.file_path = file_path
+        self.read_only = read_only
+        self.journal_path = f"{file_path}{JOURNAL_SUFFIX}"
+        self.compacting_path = f"{file_path}{COMPACTING_SUFFIX}"
+        self.compact_threshold = settings.storage_compact_threshold
+        self.fsync_enabled = settings.storage_fsync
+
+        # Vista materializada en memoria
+        self._records: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_key: Dict[PQRSKey, Dict[str, Any]] = {}
+        # Índices de las consultas paginadas: todas las PQRS y por departamento
+        self._timeline = RegistroTimeline()
+        self._timeline_by_department: Dict[str, RegistroTimeline] = {}
+        # Protege la vista frente a los hilos de compactación/snapshot del dashboard
+        self._lock = threading.Lock()
+        self._compaction_thread: Optional[threading.Thread] = None
+        self._journal_entries = 0
+
+        if read_only:
+            self._replay(journals)
+            return
+
+        # Identifica los eventos de este proceso en el journal compartido
+        self._source = uuid.uuid4().hex[:12]
+        self._own_prefix = f'{{"src": "{self._source}"'.encode()
+        self._journal_lock = FileLock(f"{file_path}{LOCK_SUFFIX}")
+        self._compact_lock = FileLock(f"{file_path}{COMPACT_LOCK_SUFFIX}")
+        self._refresh_lock = threading.Lock()
+
+        with self._journal_lock:
+            self._replay()
+            self._open_journal()
+        if os.path.exists(self.compacting_path):
+            # Terminar una compactación interrumpida (si ningún otro proceso la está haciendo)
+            self.compact(wait=True)
+        # Las escrituras al journal las hace un solo hilo, fuera del event loop
+        self._writer = CoalescingWriter(
+            self._write_events,
+            window=settings.storage_write_window_ms / 1000,
+            name="pqrs-writer"
+        )
+        self._on_loaded()
+
+    # ------------------------------------------------------------------
+    # Carga y reproducción
+    # ------------------------------------------------------------------
+
+    def _replay(self, journals: Optional[Sequence[str]] = None) -> None:
+        """Carga el snapshot y reproduce los journals pendientes"""
+        for record in self._read_snapshot():
+            self._apply_add(record)
+
+        # Un `.compacting` indica que una compactación se interrumpió (o está en curso)
+        for path in journals if journals is not None else (self.compacting_path, self.journal_path):
+            if os.path.exists(path):
+                self._journal_entries += self._replay_journal(path)
+
+        logger.info(f"PQRS cargadas: {len(self._records)} ({self._journal_entries} eventos en journal)")
+
+    def _read_snapshot(self) -> List[Dict[str, Any]]:
+        """Lee el snapshot completo desde el archivo"""
         try:
             if os.path.exists(self.file_path):
                 with open(self.file_path, 'r', encoding='utf-8') as f:
@@ -35,78 +550,409 @@ class PQRSStorage:
         except Exception as e:
             logger.error(f"Error al cargar PQRS: {e}")
             return []
-    
-    def _save_pqrs(self, pqrs_list: List[Dict[str, Any]]) -> None:
-        """Guarda las PQRS en el archivo"""
+
+    def _replay_journal(self, path: str) -> int:
+        """Aplica los eventos de un journal. Ignora una última línea truncada."""
+        applied = 0
+        valid_offset = 0
+        with open(path, 'rb') as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.endswith(b"\n"):
+                    logger.warning(f"Línea {line_number} de {path} truncada (escritura interrumpida). Se descarta.")
+                    break
+                valid_offset += len(line)
+                try:
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(f"Línea {line_number} de {path} inválida. Se ignora.")
+                    continue
+                if event.get("op") != JOURNAL_HEADER_OP:
+                    self._apply_event(event)
+                    applied += 1
+
+        # Descartar la línea truncada para que las escrituras siguientes no queden pegadas a ella
+        if not self.read_only and valid_offset < os.path.getsize(path):
+            with open(path, 'r+b') as f:
+                f.truncate(valid_offset)
+        return applied
+
+    @staticmethod
+    def exists(file_path: str = PQRS_FILE) -> bool:
+        """Indica si hay datos guardados (snapshot o journal) en la ruta dada"""
+        return any(
+            os.path.exists(path)
+            for path in (file_path, f"{file_path}{JOURNAL_SUFFIX}", f"{file_path}{COMPACTING_SUFFIX}")
+        )
+
+    @classmethod
+    def read_records(cls, file_path: str = PQRS_FILE) -> List[Dict[str, Any]]:
+        """Lee todas las PQRS (snapshot + journal) sin modificar los archivos"""
+        return cls(file_path, read_only=True).get_all_pqrs()
+
+    @staticmethod
+    def _record_key(record: Dict[str, Any]) -> PQRSKey:
+        return record.get("pqrs_id"), record.get("fecha_registro")
+
+    def _apply_event(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Aplica un evento del journal a la vista en memoria
+
+        Returns:
+            PQRS agregada o actualizada (None si el evento no cambió la vista)
+        """
+        op = event.get("op")
+        if op == "add":
+            return self._apply_add(event["data"])
+        if op == "update":
+            return self._apply_update(event["pqrs_id"], event.get("fecha_registro"), event["fields"])
+        logger.warning(f"Evento de journal desconocido: {op}")
+        return None
+
+    def _apply_add(self, record: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # La reproducción es idempotente: un snapshot nuevo puede contener
+        # registros que también siguen en un journal `.compacting`
+        key = self._record_key(record)
+        if key in self._by_key:
+            return None
+        self._by_key[key] = record
+        self._records.append(record)
+        self._by_id.setdefault(record.get("pqrs_id"), record)
+        self._timeline.add(record)
+        department = record.get("codigo_departamento")
+        if department:
+            self._timeline_by_department.setdefault(department, RegistroTimeline()).add(record)
+        return record
+
+    def _apply_update(self, pqrs_id: str, fecha_registro: Optional[str],
+                      fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # Los eventos de versiones anteriores no traen `fecha_registro`
+        if fecha_registro is None:
+            record = self._by_id.get(pqrs_id)
+        else:
+            record = self._by_key.get((pqrs_id, fecha_registro))
+        if record is not None:
+            record.update(fields)
+        return record
+
+    # ------------------------------------------------------------------
+    # Journal compartido entre procesos
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _read_journal_id(path: str) -> Optional[str]:
+        """ID de la cabecera de un journal (None si no tiene)"""
         try:
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                json.dump(pqrs_list, f, indent=2, ensure_ascii=False)
-            
-            # Copiar también a dashboard/public para que el dashboard lo lea
-            dashboard_public_path = os.path.join("dashboard", "public", "pqrs_data.json")
-            if os.path.exists("dashboard"):
+            with open(path, 'rb') as f:
+                header = json.loads(f.readline() or b"{}")
+        except (OSError, json.JSONDecodeError):
+            return None
+        return header.get("id") if header.get("op") == JOURNAL_HEADER_OP else None
+
+    def _create_journal(self, prev_id: Optional[str]) -> None:
+        """Crea un journal vacío con su cabecera (con el lock del journal tomado)"""
+        header = {"op": JOURNAL_HEADER_OP, "id": uuid.uuid4().hex, "prev": prev_id}
+        with open(self.journal_path, 'x', encoding='utf-8') as f:
+            f.write(json.dumps(header) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _open_journal(self) -> None:
+        """Abre el journal para escribir y para seguir su cola (con el lock del journal tomado)"""
+        if not os.path.exists(self.journal_path) or os.path.getsize(self.journal_path) == 0:
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+            self._create_journal(prev_id=None)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+        self._follow_journal(at_end=True)
+
+    def _follow_journal(self, at_end: bool) -> None:
+        """
+        Empieza a seguir la cola del journal actual
+
+        Args:
+            at_end: Si es True, desde el final (con el lock del journal tomado); si
+                no, desde el inicio, y `_read_tail` valida que la cabecera apunte
+                al journal que se venía siguiendo
+        """
+        tail = open(self.journal_path, 'rb')
+        if getattr(self, "_tail", None) is not None:
+            self._tail.close()
+        self._tail = tail
+        self._tail_inode = os.fstat(tail.fileno()).st_ino
+        self._tail_offset = 0
+        if at_end:
+            self._journal_id = self._read_journal_id(self.journal_path)
+            self._tail_offset = os.fstat(tail.fileno()).st_size
+        else:
+            self._expected_prev = self._journal_id
+            self._journal_entries = 0
+
+    def _refresh(self) -> None:
+        if self.read_only:
+            return
+        with self._refresh_lock:
+            try:
+                rotated = os.stat(self.journal_path).st_ino != self._tail_inode
+                if not rotated and os.fstat(self._tail.fileno()).st_size == self._tail_offset:
+                    return
+
+                # Si el journal seguido ya se rotó, no recibe más escrituras: se lee
+                # hasta el final y se pasa al nuevo. La rotación se mira antes de leer
+                # para no dejar eventos sin leer en un journal que se abandona.
+                resync = self._read_tail()
+                while not resync and rotated:
+                    self._follow_journal(at_end=False)
+                    rotated = os.stat(self.journal_path).st_ino != self._tail_inode
+                    resync = self._read_tail()
+            except FileNotFoundError:
+                # Otro proceso está rotando el journal: se retoma en la próxima operación
+                return
+            if resync:
+                self._resync()
+
+    def _read_tail(self) -> bool:
+        """
+        Aplica los eventos nuevos de la cola del journal escritos por otros procesos
+
+        Returns:
+            True si se perdió al menos un journal intermedio (hay que resincronizar)
+        """
+        self._tail.seek(self._tail_offset)
+        data = self._tail.read()
+        end = data.rfind(b"\n") + 1
+        if not end:
+            return False
+        self._tail_offset += end
+        changes = []
+        missed_journal = False
+        with self._lock:
+            for line in data[:end].splitlines():
+                if line.startswith(self._own_prefix):
+                    continue
                 try:
-                    # Asegurar que el directorio existe
-                    os.makedirs(os.path.dirname(dashboard_public_path), exist_ok=True)
-                    with open(dashboard_public_path, 'w', encoding='utf-8') as f:
-                        json.dump(pqrs_list, f, indent=2, ensure_ascii=False)
-                    logger.debug(f"PQRS copiadas a {dashboard_public_path}")
-                except Exception as e:
-                    logger.warning(f"No se pudo copiar a dashboard/public: {e}")
+                    event = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                op = event.get("op")
+                if op == JOURNAL_HEADER_OP:
+                    self._journal_id = event.get("id")
+                    if event.get("prev") != self._expected_prev:
+                        missed_journal = True
+                        break
+                    continue
+                self._journal_entries += 1
+                record = self._apply_event(event)
+                if record is not None:
+                    changes.append((op, record))
+        for op, record in changes:
+            self._notify(op, record)
+        return missed_journal
+
+    def _resync(self) -> None:
+        """Recarga desde disco y aplica a la vista las diferencias"""
+        # Lo propio todavía encolado no está en disco y se perdería al comparar
+        self._writer.barrier().result()
+        with self._journal_lock:
+            disk = JSONPQRSStorage(self.file_path, read_only=True)
+            self._follow_journal(at_end=True)
+        changes = []
+        with self._lock:
+            for record in disk.get_all_pqrs():
+                current = self._by_key.get(self._record_key(record))
+                if current is None:
+                    changes.append(("add", self._apply_add(record)))
+                elif current != record:
+                    current.update(record)
+                    changes.append(("update", current))
+        logger.info(f"Vista de PQRS resincronizada desde disco ({len(changes)} cambios)")
+        for op, record in changes:
+            self._notify(op, record)
+
+    # ------------------------------------------------------------------
+    # Escritura
+    # ------------------------------------------------------------------
+
+    def _append_event(self, event: Dict[str, Any]) -> None:
+        """Encola un evento para el journal (una sola línea)"""
+        # Se serializa ahora: el registro en memoria puede cambiar antes de escribirse
+        self._writer.submit(json.dumps({"src": self._source, **event}, ensure_ascii=False) + "\n")
+
+    def _write_events(self, lines: List[str]) -> None:
+        """Escribe un lote de eventos con un solo flush + fsync (hilo escritor)"""
+        with self._journal_lock:
+            if os.fstat(self._journal.fileno()).st_ino != os.stat(self.journal_path).st_ino:
+                # Otro proceso rotó el journal: escribir en el nuevo
+                self._journal.close()
+                self._journal = open(self.journal_path, 'a', encoding='utf-8')
+                self._journal_entries = 0
+            self._journal.write("".join(lines))
+            self._journal.flush()
+            if self.fsync_enabled:
+                os.fsync(self._journal.fileno())
+            self._journal_entries += len(lines)
+
+            if self._journal_entries >= self.compact_threshold:
+                self._start_compaction()
+
+    def persisted(self) -> Future:
+        if self.read_only:
+            return super().persisted()
+        return self._writer.barrier()
+
+    def compact(self, wait: bool = False) -> None:
+        """
+        Compacta el journal en un snapshot nuevo en segundo plano
+
+        El journal actual se rota a `.compacting` y se abre uno vacío, de modo que
+        las escrituras siguientes no esperan a la compactación. Si otro proceso ya
+        está compactando, no hace nada.
+
+        Args:
+            wait: Si es True, espera a que termine la compactación
+        """
+        with self._journal_lock:
+            self._start_compaction()
+        if wait and self._compaction_thread is not None:
+            self._compaction_thread.join()
+
+    def _start_compaction(self) -> None:
+        # Con el lock del journal tomado
+        if not self._compact_lock.acquire(blocking=False):
+            return
+        try:
+            self._rotate_journal()
+        except Exception:
+            self._compact_lock.release()
+            raise
+        self._journal_entries = 0
+        self._compaction_thread = threading.Thread(
+            target=self._compact_worker,
+            name="pqrs-compaction",
+            daemon=True
+        )
+        self._compaction_thread.start()
+
+    def _rotate_journal(self) -> None:
+        """Mueve el journal actual a `.compacting` y abre uno vacío"""
+        previous_id = self._read_journal_id(self.journal_path)
+        self._journal.close()
+        if os.path.exists(self.compacting_path):
+            # Una compactación anterior falló: conservar sus eventos
+            with open(self.journal_path, 'r', encoding='utf-8') as src, \
+                    open(self.compacting_path, 'a', encoding='utf-8') as dst:
+                dst.write(src.read())
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self.journal_path)
+        else:
+            os.replace(self.journal_path, self.compacting_path)
+        self._create_journal(prev_id=previous_id)
+        self._journal = open(self.journal_path, 'a', encoding='utf-8')
+
+    def _compact_worker(self) -> None:
+        # El snapshot se arma desde disco: la vista de este proceso puede no tener
+        # todavía los eventos de otros procesos
+        try:
+            records = JSONPQRSStorage(
+                self.file_path, read_only=True, journals=(self.compacting_path,)
+            ).get_all_pqrs()
+            tmp_path = _write_json_tmp(self.file_path, records)
+            with self._journal_lock:
+                os.replace(tmp_path, self.file_path)
+                os.remove(self.compacting_path)
+            logger.info(f"Journal de PQRS compactado ({len(records)} registros)")
         except Exception as e:
-            logger.error(f"Error al guardar PQRS: {e}")
-    
-    def add_pqrs(self, pqrs_data: Dict[str, Any]) -> None:
-        """Agrega una nueva PQRS"""
-        pqrs_list = self._load_pqrs()
-        pqrs_data["enviado_telegram"] = False
-        pqrs_data["fecha_registro"] = datetime.now().isoformat()
-        pqrs_list.append(pqrs_data)
-        self._save_pqrs(pqrs_list)
-        logger.info(f"PQRS guardada: {pqrs_data.get('pqrs_id')}")
-    
-    def mark_as_sent(self, pqrs_id: str) -> None:
-        """Marca una PQRS como enviada a Telegram"""
-        pqrs_list = self._load_pqrs()
-        for pqrs in pqrs_list:
-            if pqrs.get("pqrs_id") == pqrs_id:
-                pqrs["enviado_telegram"] = True
-                pqrs["fecha_envio_telegram"] = datetime.now().isoformat()
-                break
-        self._save_pqrs(pqrs_list)
-        logger.info(f"PQRS {pqrs_id} marcada como enviada")
-    
+            logger.error(f"Error al compactar PQRS: {e}")
+            return
+        finally:
+            self._compact_lock.release()
+
+    def _snapshot_records(self) -> List[Dict[str, Any]]:
+        # Copias: el event loop puede modificar una PQRS mientras se serializa
+        with self._lock:
+            return [dict(record) for record in self._records]
+
+    def close(self) -> None:
+        """Cierra el journal y espera las tareas en segundo plano"""
+        if self.read_only:
+            return
+        self._writer.close()
+        if self._compaction_thread and self._compaction_thread.is_alive():
+            self._compaction_thread.join()
+        super().close()
+        self._journal.close()
+        self._tail.close()
+        self._journal_lock.close()
+        self._compact_lock.close()
+
+    # ------------------------------------------------------------------
+    # Operaciones del backend
+    # ------------------------------------------------------------------
+
+    def _load_pqrs(self) -> List[Dict[str, Any]]:
+        """Devuelve las PQRS de la vista en memoria"""
+        return list(self._records)
+
+    def _insert_pqrs(self, pqrs_data: Dict[str, Any]) -> bool:
+        with self._lock:
+            if self._apply_add(pqrs_data) is None:
+                return False
+        self._append_event({"op": "add", "data": pqrs_data})
+        return True
+
+    def _update_pqrs(self, pqrs_id: str, fecha_registro: Optional[str],
+                     fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            record = self._apply_update(pqrs_id, fecha_registro, fields)
+        if record is not None:
+            self._append_event({
+                "op": "update",
+                "pqrs_id": pqrs_id,
+                "fecha_registro": record.get("fecha_registro"),
+                "fields": fields
+            })
+        return record
+
+    def _get_by_keys(self, keys: List[PQRSKey]) -> List[Dict[str, Any]]:
+        return [self._by_key[key] for key in keys if key in self._by_key]
+
     def get_pending_pqrs(self) -> List[Dict[str, Any]]:
         """Obtiene las PQRS pendientes de enviar a Telegram"""
-        pqrs_list = self._load_pqrs()
-        return [pqrs for pqrs in pqrs_list if not pqrs.get("enviado_telegram", False)]
-    
+        self._refresh()
+        return [pqrs for pqrs in self._records if not pqrs.get("enviado_telegram", False)]
+
+    def _query_pqrs(self, desde: Optional[str], hasta: Optional[str], codigo_departamento: Optional[str],
+                    enviado_telegram: Optional[bool], before: Optional[RegistroKey],
+                    limit: int) -> List[Dict[str, Any]]:
+        predicate = None
+        if enviado_telegram is not None:
+            def predicate(record: Dict[str, Any]) -> bool:
+                return bool(record.get("enviado_telegram", False)) == enviado_telegram
+        with self._lock:
+            if codigo_departamento:
+                timeline = self._timeline_by_department.get(codigo_departamento)
+                if timeline is None:
+                    return []
+            else:
+                timeline = self._timeline
+            return [dict(record) for record in timeline.page(desde, hasta, before, predicate, limit)]
+
     def get_all_pqrs(self) -> List[Dict[str, Any]]:
         """Obtiene todas las PQRS"""
+        self._refresh()
         return self._load_pqrs()
-    
-    def get_similar_pqrs(self, codigo_departamento: str, descripcion: str, 
-                        similarity_threshold: int = 2, limit: int = 50) -> List[Dict[str, Any]]:
-        """Obtiene PQRS similares para detectar quejas repetidas"""
-        pqrs_list = self._load_pqrs()
-        
-        # Filtrar por departamento y ordenar por fecha (más recientes primero)
-        dept_pqrs = [
-            pqrs for pqrs in pqrs_list 
-            if pqrs.get("codigo_departamento") == codigo_departamento
-        ]
-        dept_pqrs = sorted(dept_pqrs, key=lambda x: x.get("fecha_registro", ""), reverse=True)[:limit]
-        
-        # Filtrar por similitud
-        descripcion_words = set(descripcion.lower().split())
-        similar_pqrs = []
-        
-        for pqrs in dept_pqrs:
-            pqrs_desc = pqrs.get("descripcion", "").lower().split()
-            pqrs_words = set(pqrs_desc)
-            common_words = descripcion_words.intersection(pqrs_words)
-            if len(common_words) >= similarity_threshold:
-                similar_pqrs.append(pqrs)
-        
-        return similar_pqrs
 
+    def _data_files(self) -> List[str]:
+        return [self.file_path, self.journal_path, self.compacting_path]
+
+
+def create_pqrs_storage() -> PQRSStorage:
+    """Crea el backend de almacenamiento configurado en `settings.storage_backend`"""
+    backend = settings.storage_backend.lower()
+    with STORAGE_LATENCY.labels("load").time(), span("storage.load"):
+        if backend == "sqlite":
+            from services.pqrs_sqlite_storage import SQLitePQRSStorage
+            return SQLitePQRSStorage(settings.sqlite_db_path)
+        if backend != "json":
+            logger.warning(f"Backend de almacenamiento desconocido '{backend}'. Usando JSON.")
+        return JSONPQRSStorage()
@@ -0,0 +1,89 @@
+"""
+Profiling por muestreo de pilas para diagnosticar lentitud en producción
+
+Un hilo aparte toma cada `interval` segundos la pila de todos los hilos
+(`sys._current_frames()`) durante una ventana acotada y la acumula en formato
+"collapsed stacks" (`hilo;archivo:función;... cantidad`), el que usan
+`flamegraph.pl` y speedscope. No hay costo fuera de esa ventana y solo puede
+correr una sesión a la vez.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ProfilerBusyError(Exception):
+    """Ya hay una sesión de profiling en curso"""
+
+
+class StackSampler:
+    """Muestreo periódico de las pilas de todos los hilos"""
+
+    _session_lock = threading.Lock()
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 128):
+        """
+        Args:
+            interval: Segundos entre muestras
+            max_depth: Máximo de frames por pila (se conservan los más cercanos a la raíz)
+        """
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples = 0
+        self._stacks: Counter = Counter()
+
+    @staticmethod
+    def _frame_label(frame) -> str:
+        code = frame.f_code
+        return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+    def _sample(self, own_ident: int, names: Dict[int, str]) -> None:
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(self._frame_label(frame))
+                frame = frame.f_back
+            labels.reverse()
+            thread = names.get(ident, str(ident)).replace(";", "_")
+            self._stacks[";".join([thread] + labels[:self.max_depth])] += 1
+        self.samples += 1
+
+    def run(self, seconds: float) -> str:
+        """
+        Muestrea durante `seconds` segundos (bloquea el hilo que lo llama)
+
+        Args:
+            seconds: Duración de la ventana de muestreo
+
+        Returns:
+            Pilas en formato collapsed, una por línea con su cantidad de muestras
+
+        Raises:
+            ProfilerBusyError: Si ya hay otra sesión en curso
+        """
+        if not self._session_lock.acquire(blocking=False):
+            raise ProfilerBusyError("Ya hay una sesión de profiling en curso")
+        try:
+            own_ident = threading.get_ident()
+            deadline = time.monotonic() + seconds
+            logger.info(f"Profiling por muestreo iniciado ({seconds}s, cada {self.interval * 1000:.1f} ms)")
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                self._sample(own_ident, names)
+                time.sleep(self.interval)
+            logger.info(f"Profiling terminado: {self.samples} muestras, {len(self._stacks)} pilas distintas")
+            return self.collapsed()
+        finally:
+            self._session_lock.release()
+
+    def collapsed(self) -> str:
+        """Pilas acumuladas en formato collapsed (las más frecuentes primero)"""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
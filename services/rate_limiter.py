@@ -0,0 +1,375 @@
+"""
+Limitador de tráfico saliente por proveedor (WhatsApp, Telegram, SendGrid)
+
+Cada proveedor tiene un token bucket (tasa sostenida + ráfaga) y, opcionalmente,
+una cuota diaria que se guarda en SQLite: no se pierde la cuenta al reiniciar y
+todos los workers descuentan de la misma cuota.
+Cuando hay varios envíos esperando un token, se atiende primero el de mayor
+prioridad: respuestas al usuario, luego alertas y por último la reposición de
+PQRS pendientes al iniciar. Si un proveedor responde 429, el bucket se bloquea
+durante el `Retry-After` indicado.
+"""
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+import logging
+
+import httpx
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Clases de prioridad (menor = primero)
+PRIORITY_USER = 0      # Respuestas y confirmaciones de lectura al usuario
+PRIORITY_ALERT = 1     # Alertas de Telegram y correos de PQRS nuevas
+PRIORITY_BACKLOG = 2   # PQRS pendientes reenviadas al iniciar
+
+# Segundos que una escritura de la cuota espera a que otro proceso libere la base
+BUSY_TIMEOUT = 30
+
+QUOTA_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_quota (
+    day TEXT NOT NULL,
+    provider TEXT NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, provider)
+);
+"""
+
+
+class RateLimitedError(Exception):
+    """El proveedor no acepta más envíos por ahora; reintentar en `retry_after` segundos"""
+
+    def __init__(self, provider: str, retry_after: float, message: Optional[str] = None):
+        self.provider = provider
+        self.retry_after = retry_after
+        super().__init__(message or f"{provider} limitado. Reintentar en {retry_after:.0f}s")
+
+
+class QuotaExceededError(RateLimitedError):
+    """Se agotó la cuota diaria del proveedor"""
+
+
+def parse_retry_after(response: httpx.Response, default: float = 1.0) -> float:
+    """
+    Obtiene los segundos de espera de una respuesta 429
+
+    Usa el header `Retry-After` o, en Telegram, `parameters.retry_after` del cuerpo.
+
+    Args:
+        response: Respuesta HTTP del proveedor
+        default: Espera si la respuesta no la indica
+
+    Returns:
+        Segundos a esperar
+    """
+    header = response.headers.get("Retry-After")
+    if header:
+        try:
+            return max(float(header), 0.0)
+        except ValueError:
+            pass
+    try:
+        return float(response.json()["parameters"]["retry_after"])
+    except Exception:
+        return default
+
+
+class TokenBucket:
+    """Token bucket con cola de espera por prioridad"""
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: Tokens por segundo
+            capacity: Máximo de tokens acumulados (ráfaga)
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._counter = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def level(self) -> float:
+        """Tokens disponibles en este momento"""
+        self._refill(time.monotonic())
+        return self.tokens
+
+    async def acquire(self, priority: int = PRIORITY_USER) -> None:
+        """Espera un token; con varios esperando, gana la menor `priority`"""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._counter), future))
+        self._drain()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # El token ya se había asignado: devolverlo
+                self.tokens += 1
+            self._drain()
+            raise
+
+    def block(self, seconds: float) -> None:
+        """Bloquea el bucket `seconds` segundos (por ejemplo tras un 429)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+
+    def _drain(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = time.monotonic()
+        self._refill(now)
+        while self._waiters and self._waiters[0][2].done():
+            heapq.heappop(self._waiters)
+        while self._waiters and now >= self.blocked_until and self.tokens >= 1:
+            _, _, future = heapq.heappop(self._waiters)
+            if future.done():
+                continue
+            self.tokens -= 1
+            future.set_result(None)
+        if self._waiters:
+            wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate if self.rate > 0 else 1.0, 0.001)
+            self._timer = asyncio.get_running_loop().call_later(wait, self._drain)
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+
+class DailyQuota:
+    """Cuenta los envíos del día (UTC) por proveedor en una base SQLite compartida entre procesos"""
+
+    def __init__(self, db_path: str, limits: Dict[str, int], migrate_from: Optional[str] = None):
+        """
+        Args:
+            db_path: Base SQLite donde se guarda la cuenta
+            limits: Proveedor -> envíos por día (0 = sin límite)
+            migrate_from: Archivo JSON de versiones anteriores; su cuenta del día se importa
+        """
+        self.db_path = db_path
+        self.limits = limits
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=BUSY_TIMEOUT)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(QUOTA_SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM daily_quota WHERE day < ?", (self._today(),))
+        if migrate_from:
+            self._import_json(migrate_from)
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime("%Y-%m-%d")
+
+    @staticmethod
+    def seconds_until_reset() -> float:
+        """Segundos hasta la medianoche UTC"""
+        now = datetime.now(timezone.utc)
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        return (tomorrow - now).total_seconds()
+
+    def _import_json(self, file_path: str) -> None:
+        """Importa la cuenta del día del archivo JSON que usaban las versiones anteriores"""
+        if not os.path.exists(file_path):
+            return
+        try:
+            with open(file_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("day") != self._today():
+                return
+            with self._lock, self._conn:
+                self._conn.executemany(
+                    "INSERT INTO daily_quota (day, provider, used) VALUES (?, ?, ?) "
+                    "ON CONFLICT (day, provider) DO UPDATE SET used = MAX(used, excluded.used)",
+                    [(data["day"], provider, int(count)) for provider, count in data.get("counts", {}).items()]
+                )
+        except Exception as e:
+            logger.error(f"Error al importar cuotas diarias de {file_path}: {e}")
+
+    def used(self, provider: str) -> int:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT used FROM daily_quota WHERE day = ? AND provider = ?", (self._today(), provider)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def consume(self, provider: str) -> None:
+        """
+        Descuenta un envío de la cuota del proveedor
+
+        El descuento es una sola transacción: con varios workers, nunca se pasan
+        de la cuota entre todos. Puede esperar el lock de SQLite, así que desde el
+        event loop se llama en el executor.
+
+        Raises:
+            QuotaExceededError: Si la cuota del día ya se agotó
+        """
+        limit = self.limits.get(provider, 0)
+        if limit <= 0:
+            return
+        day = self._today()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO daily_quota (day, provider, used) VALUES (?, ?, 0)", (day, provider)
+            )
+            cursor = self._conn.execute(
+                "UPDATE daily_quota SET used = used + 1 WHERE day = ? AND provider = ? AND used < ?",
+                (day, provider, limit)
+            )
+        if cursor.rowcount == 0:
+            raise QuotaExceededError(
+                provider,
+                self.seconds_until_reset(),
+                f"Cuota diaria de {provider} agotada ({limit}/{limit})"
+            )
+
+    def refund(self, provider: str) -> None:
+        """Devuelve un envío descontado con `consume` que finalmente no se hizo"""
+        if self.limits.get(provider, 0) <= 0:
+            return
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "UPDATE daily_quota SET used = used - 1 WHERE day = ? AND provider = ? AND used > 0",
+                    (self._today(), provider)
+                )
+        except Exception as e:
+            logger.error(f"Error al devolver un envío a la cuota de {provider}: {e}")
+
+
+class RateLimiter:
+    """Token buckets y cuotas diarias de todos los proveedores"""
+
+    def __init__(
+        self,
+        buckets: Dict[str, TokenBucket],
+        quota: Optional[DailyQuota] = None,
+        max_wait: float = 30.0
+    ):
+        """
+        Args:
+            buckets: Proveedor -> token bucket
+            quota: Cuotas diarias (opcional)
+            max_wait: Si el proveedor está bloqueado más de estos segundos, se lanza
+                `RateLimitedError` en lugar de esperar
+        """
+        self.buckets = buckets
+        self.quota = quota
+        self.max_wait = max_wait
+
+    async def acquire(self, provider: str, priority: int = PRIORITY_USER) -> None:
+        """
+        Espera turno para un envío al proveedor
+
+        Args:
+            provider: "whatsapp", "telegram" o "sendgrid"
+            priority: Clase de prioridad (`PRIORITY_USER`, `PRIORITY_ALERT`, `PRIORITY_BACKLOG`)
+
+        Raises:
+            RateLimitedError: Si el proveedor está bloqueado por más de `max_wait`
+            QuotaExceededError: Si se agotó la cuota diaria
+        """
+        bucket = self.buckets.get(provider)
+        if bucket is not None:
+            blocked_for = bucket.blocked_until - time.monotonic()
+            if blocked_for > self.max_wait:
+                raise RateLimitedError(provider, blocked_for)
+        # La cuota se descuenta antes de tomar el token: un envío rechazado por
+        # cuota no gasta un token de la ráfaga
+        quota = self.quota if self.quota is not None and self.quota.limits.get(provider, 0) > 0 else None
+        loop = asyncio.get_running_loop()
+        if quota is not None:
+            await loop.run_in_executor(None, quota.consume, provider)
+        if bucket is None:
+            return
+        try:
+            await bucket.acquire(priority)
+        except BaseException:
+            # Sin token no hay envío: se devuelve el descuento de la cuota
+            if quota is not None:
+                loop.run_in_executor(None, quota.refund, provider)
+            raise
+
+    def penalize(self, provider: str, retry_after: float) -> None:
+        """Bloquea al proveedor tras una respuesta 429"""
+        logger.warning(f"{provider} respondió 429. Pausando envíos {retry_after:.0f}s")
+        bucket = self.buckets.get(provider)
+        if bucket is not None:
+            bucket.block(retry_after)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Nivel de cada bucket, envíos en espera y uso de la cuota diaria"""
+        now = time.monotonic()
+        result = {}
+        for provider, bucket in self.buckets.items():
+            result[provider] = {
+                "tokens": round(bucket.level(), 2),
+                "capacity": bucket.capacity,
+                "rate_per_second": bucket.rate,
+                "waiting": bucket.waiting,
+                "blocked_for": round(max(bucket.blocked_until - now, 0.0), 1)
+            }
+            if self.quota is not None:
+                result[provider]["daily_used"] = self.quota.used(provider)
+                result[provider]["daily_limit"] = self.quota.limits.get(provider, 0)
+        return result
+
+
+async def acquire_slot(rate_limiter: Optional[RateLimiter], provider: str, priority: int) -> None:
+    """Espera turno si hay limitador (los servicios pueden usarse sin él)"""
+    if rate_limiter is not None:
+        await rate_limiter.acquire(provider, priority)
+
+
+def raise_if_rate_limited(rate_limiter: Optional[RateLimiter], provider: str, response: httpx.Response) -> None:
+    """
+    Si la respuesta es 429, bloquea al proveedor y lanza `RateLimitedError`
+
+    Args:
+        rate_limiter: Limitador compartido (o None)
+        provider: Proveedor que respondió
+        response: Respuesta HTTP
+    """
+    if response.status_code != 429:
+        return
+    retry_after = parse_retry_after(response)
+    if rate_limiter is not None:
+        rate_limiter.penalize(provider, retry_after)
+    raise RateLimitedError(provider, retry_after)
+
+
+def create_rate_limiter() -> RateLimiter:
+    """Crea el limitador con las tasas y cuotas configuradas"""
+    buckets = {
+        "whatsapp": TokenBucket(settings.rate_whatsapp_per_second, settings.rate_whatsapp_burst),
+        "telegram": TokenBucket(settings.rate_telegram_per_minute / 60, settings.rate_telegram_burst),
+        "sendgrid": TokenBucket(settings.rate_sendgrid_per_second, settings.rate_sendgrid_burst)
+    }
+    quota = DailyQuota(
+        settings.rate_quota_db_path,
+        {
+            "whatsapp": settings.whatsapp_daily_quota,
+            "telegram": settings.telegram_daily_quota,
+            "sendgrid": settings.sendgrid_daily_quota
+        },
+        migrate_from=settings.rate_quota_file
+    )
+    return RateLimiter(buckets, quota, max_wait=settings.rate_limit_max_wait)
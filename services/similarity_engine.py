@@ -0,0 +1,201 @@
+"""
+Motor de similitud MinHash/LSH para detectar quejas casi duplicadas
+
+Cada descripción se normaliza (minúsculas, sin tildes, sin stopwords, stemming
+liviano), se divide en shingles de palabras y se resume en una firma MinHash.
+Las firmas se agrupan en buckets LSH por bandas: dos PQRS son candidatas si
+coinciden en al menos una banda, y se confirman si la similitud de Jaccard
+estimada con la firma supera el umbral. Buscar candidatos solo revisa los buckets
+de la firma nueva, no todas las PQRS del departamento.
+"""
+import hashlib
+import logging
+import random
+from bisect import bisect_left
+from collections import defaultdict
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+from config import settings
+from services.similarity_index import SimilarityIndex, PQRSKey, DepartmentWindow
+from utils.text_utils import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Primo de Mersenne 2^61 - 1 para el hashing universal
+_MERSENNE_PRIME = (1 << 61) - 1
+# Semilla fija: las firmas deben ser las mismas entre reinicios
+_SEED = 20251117
+
+
+def word_shingles(text: str, size: int = 1) -> Set[str]:
+    """
+    Obtiene los shingles de palabras de un texto ya normalizado
+
+    Args:
+        text: Texto original
+        size: Cantidad de palabras por shingle
+
+    Returns:
+        Conjunto de shingles (vacío si el texto solo tiene stopwords)
+    """
+    terms = normalize_text(text)
+    if len(terms) <= size:
+        return {" ".join(terms)} if terms else set()
+    return {" ".join(terms[i:i + size]) for i in range(len(terms) - size + 1)}
+
+
+def _hash_shingle(shingle: str) -> int:
+    # hash() de Python cambia entre procesos; blake2b es estable
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class MinHasher:
+    """Genera firmas MinHash con `num_perm` funciones de hash universales"""
+
+    def __init__(self, num_perm: int = 64):
+        rng = random.Random(_SEED)
+        self.num_perm = num_perm
+        self._params = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+        # El vocabulario de las quejas es limitado: cachear los valores por shingle
+        # reduce la firma a un mínimo elemento a elemento
+        self._shingle_values = lru_cache(maxsize=100_000)(self._compute_shingle_values)
+
+    def _compute_shingle_values(self, shingle: str) -> Tuple[int, ...]:
+        h = _hash_shingle(shingle)
+        return tuple((a * h + b) % _MERSENNE_PRIME for a, b in self._params)
+
+    def signature(self, shingles: Set[str]) -> Optional[Tuple[int, ...]]:
+        """Calcula la firma de un conjunto de shingles (None si está vacío)"""
+        if not shingles:
+            return None
+        values = [self._shingle_values(shingle) for shingle in shingles]
+        if len(values) == 1:
+            return values[0]
+        return tuple(map(min, *values))
+
+    @staticmethod
+    def jaccard(sig_a: Tuple[int, ...], sig_b: Tuple[int, ...]) -> float:
+        """Estima la similitud de Jaccard a partir de dos firmas"""
+        return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+class _DepartmentLSH(DepartmentWindow):
+    """Firmas y buckets LSH de un solo departamento"""
+
+    __slots__ = ("signatures", "buckets")
+
+    def __init__(self):
+        super().__init__()
+        self.signatures: List[Optional[Tuple[int, ...]]] = []
+        # (banda, valores de la banda) -> posiciones ascendentes
+        self.buckets: Dict[Tuple[int, Tuple[int, ...]], List[int]] = defaultdict(list)
+
+
+class MinHashSimilarityIndex:
+    """Índice MinHash/LSH por departamento con la misma interfaz que `SimilarityIndex`"""
+
+    def __init__(
+        self,
+        num_perm: int = 64,
+        bands: int = 32,
+        jaccard_threshold: float = 0.4,
+        shingle_size: int = 1
+    ):
+        if num_perm % bands != 0:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+        self.hasher = MinHasher(num_perm)
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.jaccard_threshold = jaccard_threshold
+        self.shingle_size = shingle_size
+        self._departments: Dict[str, _DepartmentLSH] = defaultdict(_DepartmentLSH)
+
+    def __len__(self) -> int:
+        return sum(len(dept.keys) for dept in self._departments.values())
+
+    def signature(self, text: str) -> Optional[Tuple[int, ...]]:
+        """Firma MinHash de una descripción"""
+        return self.hasher.signature(word_shingles(text, self.shingle_size))
+
+    def _band_keys(self, signature: Tuple[int, ...]):
+        rows = self.rows
+        for band in range(self.bands):
+            yield band, signature[band * rows:(band + 1) * rows]
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Indexa una PQRS nueva"""
+        dept = self._departments[record.get("codigo_departamento")]
+        signature = self.signature(record.get("descripcion", ""))
+        position = dept.append(record)
+        dept.signatures.append(signature)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            dept.buckets[band_key].append(position)
+
+    def find_similar(
+        self,
+        codigo_departamento: str,
+        descripcion: str,
+        similarity_threshold: Optional[float] = None,
+        limit: Optional[int] = 50,
+        since: Optional[str] = None
+    ) -> List[PQRSKey]:
+        """
+        Busca PQRS del departamento casi duplicadas de la descripción
+
+        Args:
+            codigo_departamento: Código del departamento
+            descripcion: Descripción a comparar
+            similarity_threshold: Jaccard mínimo (por defecto el del índice)
+            limit: Considerar solo las últimas `limit` PQRS del departamento
+            since: Considerar solo PQRS con `fecha_registro` >= `since` (ISO 8601).
+                Si se indica, reemplaza a `limit`.
+
+        Returns:
+            Claves de las PQRS similares, más recientes primero
+        """
+        dept = self._departments.get(codigo_departamento)
+        signature = self.signature(descripcion)
+        if dept is None or not dept.keys or signature is None:
+            return []
+        threshold = self.jaccard_threshold if similarity_threshold is None else similarity_threshold
+
+        start = dept.window_start(limit, since)
+
+        # Candidatos: PQRS que comparten al menos una banda dentro de la ventana
+        candidates: Set[int] = set()
+        for band_key in self._band_keys(signature):
+            bucket = dept.buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket[bisect_left(bucket, start):])
+
+        similar = sorted(
+            (
+                position for position in candidates
+                if dept.in_window(position, since)
+                and self.hasher.jaccard(signature, dept.signatures[position]) >= threshold
+            ),
+            reverse=True
+        )
+        return [dept.keys[position] for position in similar]
+
+
+def create_similarity_index():
+    """Crea el índice de similitud configurado en `settings.similarity_engine`"""
+    engine = settings.similarity_engine.lower()
+    if engine == "tokens":
+        return SimilarityIndex()
+    if engine != "minhash":
+        logger.warning(f"Motor de similitud desconocido '{engine}'. Usando MinHash.")
+    return MinHashSimilarityIndex(
+        num_perm=settings.similarity_minhash_permutations,
+        bands=settings.similarity_lsh_bands,
+        jaccard_threshold=settings.similarity_jaccard_threshold,
+        shingle_size=settings.similarity_shingle_size
+    )
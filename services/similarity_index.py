@@ -0,0 +1,139 @@
+"""
+Índice invertido incremental para detectar PQRS similares
+
+Por cada departamento mantiene, para cada palabra, la lista de PQRS (posting
+list) que la contienen en orden de llegada. Buscar quejas similares consiste en
+recorrer solo las posting lists de las palabras de la descripción nueva, acotadas
+a la ventana de búsqueda (últimas N PQRS o últimas X horas), en lugar de volver a
+leer y tokenizar todas las PQRS del departamento.
+"""
+from bisect import bisect_left
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple, Set
+
+
+# Clave de una PQRS dentro del almacenamiento: (pqrs_id, fecha_registro)
+PQRSKey = Tuple[Optional[str], Optional[str]]
+
+
+def tokenize(text: str) -> Set[str]:
+    """Separa una descripción en palabras en minúscula"""
+    return set(text.lower().split())
+
+
+class DepartmentWindow:
+    """PQRS de un departamento en orden de llegada, con la ventana de búsqueda"""
+
+    __slots__ = ("keys", "fechas", "max_fechas")
+
+    def __init__(self):
+        # Posición de cada PQRS en el departamento -> clave y fecha de registro
+        self.keys: List[PQRSKey] = []
+        self.fechas: List[str] = []
+        # Mayor fecha de registro hasta cada posición (no decreciente, admite `bisect`)
+        self.max_fechas: List[str] = []
+
+    def append(self, record: Dict[str, Any]) -> int:
+        """Agrega una PQRS y devuelve su posición"""
+        fecha = record.get("fecha_registro") or ""
+        self.keys.append((record.get("pqrs_id"), record.get("fecha_registro")))
+        self.fechas.append(fecha)
+        self.max_fechas.append(max(self.max_fechas[-1], fecha) if self.max_fechas else fecha)
+        return len(self.keys) - 1
+
+    def window_start(self, limit: Optional[int], since: Optional[str]) -> int:
+        """
+        Primera posición de la ventana de búsqueda
+
+        Las posiciones siguen el orden de llegada, no el de `fecha_registro`: una
+        PQRS de otro worker puede llegar después de otras más nuevas. Con `since`,
+        las posiciones anteriores a la devuelta tienen todas una fecha menor, pero
+        dentro de la ventana hay que descartar las que llegaron tarde (`in_window`).
+        """
+        if since is not None:
+            return bisect_left(self.max_fechas, since)
+        if limit is not None:
+            return max(len(self.keys) - limit, 0)
+        return 0
+
+    def in_window(self, position: int, since: Optional[str]) -> bool:
+        return since is None or self.fechas[position] >= since
+
+
+class _DepartmentIndex(DepartmentWindow):
+    """Índice de un solo departamento"""
+
+    __slots__ = ("postings",)
+
+    def __init__(self):
+        super().__init__()
+        # Palabra -> posiciones (ascendentes) de las PQRS que la contienen
+        self.postings: Dict[str, List[int]] = defaultdict(list)
+
+
+class SimilarityIndex:
+    """Índice invertido por departamento, actualizado en cada `add_pqrs`"""
+
+    # Mínimo de palabras en común por defecto
+    DEFAULT_THRESHOLD = 2
+
+    def __init__(self):
+        self._departments: Dict[str, _DepartmentIndex] = defaultdict(_DepartmentIndex)
+
+    def __len__(self) -> int:
+        return sum(len(dept.keys) for dept in self._departments.values())
+
+    def add(self, record: Dict[str, Any]) -> None:
+        """Indexa una PQRS nueva"""
+        dept = self._departments[record.get("codigo_departamento")]
+        position = dept.append(record)
+        for token in tokenize(record.get("descripcion", "")):
+            dept.postings[token].append(position)
+
+    def find_similar(
+        self,
+        codigo_departamento: str,
+        descripcion: str,
+        similarity_threshold: Optional[int] = None,
+        limit: Optional[int] = 50,
+        since: Optional[str] = None
+    ) -> List[PQRSKey]:
+        """
+        Busca PQRS del departamento que comparten palabras con la descripción
+
+        Args:
+            codigo_departamento: Código del departamento
+            descripcion: Descripción a comparar
+            similarity_threshold: Mínimo de palabras en común (por defecto `DEFAULT_THRESHOLD`)
+            limit: Considerar solo las últimas `limit` PQRS del departamento
+            since: Considerar solo PQRS con `fecha_registro` >= `since` (ISO 8601).
+                Si se indica, reemplaza a `limit`.
+
+        Returns:
+            Claves de las PQRS similares, más recientes primero
+        """
+        dept = self._departments.get(codigo_departamento)
+        if dept is None or not dept.keys:
+            return []
+        if similarity_threshold is None:
+            similarity_threshold = self.DEFAULT_THRESHOLD
+
+        start = dept.window_start(limit, since)
+
+        # Contar palabras en común recorriendo solo la parte de cada posting list dentro de la ventana
+        matches: Dict[int, int] = defaultdict(int)
+        for token in tokenize(descripcion):
+            postings = dept.postings.get(token)
+            if not postings:
+                continue
+            for position in postings[bisect_left(postings, start):]:
+                matches[position] += 1
+
+        similar = sorted(
+            (
+                position for position, count in matches.items()
+                if count >= similarity_threshold and dept.in_window(position, since)
+            ),
+            reverse=True
+        )
+        return [dept.keys[position] for position in similar]
@@ -0,0 +1,116 @@
+"""
+Hilo escritor que agrupa las escrituras del almacenamiento (group commit)
+
+Las operaciones se encolan desde el event loop y un único hilo las escribe. Las
+que llegan dentro de una ventana corta (o mientras se hace el fsync anterior) se
+escriben juntas con un solo flush + fsync. Cada operación recibe un
+`concurrent.futures.Future` que se completa cuando ya es durable; desde código
+async se espera con `asyncio.wrap_future`.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Marca sin datos para esperar a que todo lo encolado antes sea durable
+_BARRIER = object()
+_STOP = object()
+
+
+class CoalescingWriter:
+    """Un hilo que escribe por lotes lo que se le encola"""
+
+    def __init__(
+        self,
+        write_batch: Callable[[List[Any]], None],
+        window: float = 0.005,
+        name: str = "storage-writer"
+    ):
+        """
+        Args:
+            write_batch: Función que escribe un lote de forma durable (corre en el hilo escritor)
+            window: Segundos que se espera a más operaciones después de la primera del lote
+            name: Nombre del hilo
+        """
+        self.write_batch = write_batch
+        self.window = window
+        self.batches = 0
+        self.items = 0
+        self.max_batch = 0
+        self._queue: "queue.Queue[Tuple[Any, Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """
+        Encola una operación
+
+        Args:
+            item: Operación que recibirá `write_batch`
+
+        Returns:
+            Future que se completa cuando la operación es durable
+        """
+        future: Future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def barrier(self) -> Future:
+        """Future que se completa cuando todo lo encolado hasta ahora es durable"""
+        return self.submit(_BARRIER)
+
+    def close(self) -> None:
+        """Escribe lo pendiente y detiene el hilo"""
+        if self._thread.is_alive():
+            self._queue.put((_STOP, Future()))
+            self._thread.join()
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item[0] is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.window
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item[0] is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._flush(batch)
+
+    def _flush(self, batch: List[Tuple[Any, Future]]) -> None:
+        items = [item for item, _ in batch if item is not _BARRIER]
+        if items:
+            try:
+                self.write_batch(items)
+            except Exception as e:
+                logger.error(f"Error al escribir {len(items)} operaciones del almacenamiento: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                return
+            self.batches += 1
+            self.items += len(items)
+            self.max_batch = max(self.max_batch, len(items))
+        for _, future in batch:
+            future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Lotes escritos, operaciones y tamaño promedio/máximo de lote"""
+        return {
+            "pending": self._queue.qsize(),
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "max_batch": self.max_batch
+        }
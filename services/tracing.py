@@ -0,0 +1,184 @@
+"""
+Trazas por petición: spans con su duración guardados en un buffer circular
+
+Cada webhook abre un span raíz y las operaciones que se ejecutan dentro
+(`process_message`, `_handle_text_message`, almacenamiento, llamadas a
+WhatsApp/Telegram/SendGrid) abren spans hijos. El span actual se propaga con un
+`ContextVar`, así que también sigue a las tareas creadas con `asyncio.gather`.
+
+Con las trazas deshabilitadas (valor por defecto) `span()` devuelve un context
+manager vacío compartido y `traced()` llama a la función original sin envolverla.
+"""
+import contextlib
+import functools
+import itertools
+import time
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+import logging
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+_NOOP = contextlib.nullcontext()
+_ids = itertools.count(1)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """Operación medida dentro de una traza"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration_ms", "error", "_started", "_token")
+
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        self.span_id = next(_ids)
+        self.trace_id = parent.trace_id if parent is not None else self.span_id
+        self.parent_id = parent.span_id if parent is not None else None
+        self.start = time.time()
+        self.duration_ms: Optional[float] = None
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        _current_span.reset(self._token)
+        tracer.spans.append(self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": datetime.fromtimestamp(self.start).isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration_ms, 3),
+            "error": self.error
+        }
+
+
+class Tracer:
+    """Interruptor de las trazas y buffer circular de spans terminados"""
+
+    def __init__(self, enabled: bool = False, buffer_size: int = 10000):
+        """
+        Args:
+            enabled: Si se registran spans
+            buffer_size: Máximo de spans guardados (se descartan los más antiguos)
+        """
+        self.enabled = enabled
+        self.spans: Deque[Span] = deque(maxlen=buffer_size)
+
+    def configure(self, enabled: bool, buffer_size: Optional[int] = None) -> None:
+        """Habilita o deshabilita las trazas y, opcionalmente, cambia el tamaño del buffer"""
+        if buffer_size is not None and buffer_size != self.spans.maxlen:
+            self.spans = deque(self.spans, maxlen=buffer_size)
+        self.enabled = enabled
+        logger.info(f"Trazas {'habilitadas' if enabled else 'deshabilitadas'} (buffer de {self.spans.maxlen} spans)")
+
+    def clear(self) -> None:
+        self.spans.clear()
+
+    def traces(self, limit: int = 20, name: Optional[str] = None, min_ms: float = 0) -> List[Dict[str, Any]]:
+        """
+        Trazas más recientes con sus spans
+
+        Args:
+            limit: Máximo de trazas a devolver
+            name: Solo trazas que contengan un span con ese nombre
+            min_ms: Solo trazas cuyo span raíz duró al menos esos milisegundos
+
+        Returns:
+            Lista de trazas (más recientes primero), cada una con sus spans en orden de inicio
+        """
+        by_trace: Dict[int, List[Span]] = {}
+        for span in list(self.spans):
+            by_trace.setdefault(span.trace_id, []).append(span)
+
+        result = []
+        for trace_id in sorted(by_trace, reverse=True):
+            spans = sorted(by_trace[trace_id], key=lambda s: s.start)
+            root = next((s for s in spans if s.span_id == trace_id), None)
+            if root is None:
+                # La raíz sigue abierta o ya salió del buffer
+                continue
+            if root.duration_ms < min_ms:
+                continue
+            if name and not any(s.name == name for s in spans):
+                continue
+            result.append({
+                "trace_id": trace_id,
+                "name": root.name,
+                "duration_ms": round(root.duration_ms, 3),
+                "spans": [s.to_dict() for s in spans]
+            })
+            if len(result) >= limit:
+                break
+        return result
+
+
+tracer = Tracer(enabled=settings.tracing_enabled, buffer_size=settings.tracing_buffer_size)
+
+
+def span(name: str):
+    """
+    Context manager que mide un bloque como span de la traza actual
+
+    Args:
+        name: Nombre del span (por ejemplo "storage.add")
+    """
+    if not tracer.enabled:
+        return _NOOP
+    return Span(name, _current_span.get())
+
+
+def current_span() -> Optional[Span]:
+    """Span abierto en el contexto actual (None si las trazas están deshabilitadas)"""
+    return _current_span.get() if tracer.enabled else None
+
+
+@contextlib.contextmanager
+def _activated(parent: Span):
+    token = _current_span.set(parent)
+    try:
+        yield parent
+    finally:
+        _current_span.reset(token)
+
+
+def activate(parent: Optional[Span]):
+    """
+    Continúa en otra tarea la traza de `parent` (por ejemplo, la del webhook en un worker)
+
+    Args:
+        parent: Span obtenido con `current_span()`; con None no hace nada
+    """
+    if parent is None:
+        return _NOOP
+    return _activated(parent)
+
+
+def traced(name: str) -> Callable[[Callable[..., Awaitable[Any]]], Callable[..., Awaitable[Any]]]:
+    """Decorador de corrutinas que las mide como span `name`"""
+    def decorator(func: Callable[..., Awaitable[Any]]) -> Callable[..., Awaitable[Any]]:
+        async def run(coro: Awaitable[Any]) -> Any:
+            with Span(name, _current_span.get()):
+                return await coro
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            return run(func(*args, **kwargs))
+
+        return wrapper
+    return decorator
@@ -5,13 +5,25 @@ import httpx
 from typing import Optional, Dict, Any
 from config import settings
 from models.whatsapp import SendMessageRequest, SendMessageResponse
+from services.http_client import use_client
+from services.metrics import track_outbound
+from services.rate_limiter import RateLimiter, PRIORITY_USER, acquire_slot, raise_if_rate_limited
 from utils.phone_utils import normalize_phone_number
 
 
 class WhatsAppService:
     """Servicio para manejar operaciones con WhatsApp"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        client: Optional[httpx.AsyncClient] = None,
+        rate_limiter: Optional[RateLimiter] = None
+    ):
+        # Cliente HTTP compartido (si es None se abre uno por llamada)
+        self.client = client
+        # Limitador de envíos compartido (si es None no se limita)
+        self.rate_limiter = rate_limiter
+        self.timeout = settings.whatsapp_timeout
         self.base_url = settings.whatsapp_api_base_url
         self.phone_number_id = settings.whatsapp_phone_number_id
         self.access_token = settings.whatsapp_access_token
@@ -24,7 +36,8 @@ class WhatsAppService:
         self, 
         to: str, 
         message: str, 
-        preview_url: bool = False
+        preview_url: bool = False,
+        priority: int = PRIORITY_USER
     ) -> Dict[str, Any]:
         """
         Envía un mensaje de texto a través de WhatsApp
@@ -33,6 +46,7 @@ class WhatsAppService:
             to: Número de teléfono del destinatario (puede incluir +, espacios, etc.)
             message: Texto del mensaje
             preview_url: Si se deben previsualizar URLs en el mensaje
+            priority: Clase de prioridad para el limitador de envíos
             
         Returns:
             Respuesta de la API de WhatsApp
@@ -53,15 +67,18 @@ class WhatsAppService:
             }
         }
         
-        async with httpx.AsyncClient() as client:
+        await acquire_slot(self.rate_limiter, "whatsapp", priority)
+        async with use_client(self.client) as client:
             try:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
+                with track_outbound("whatsapp"):
+                    response = await client.post(
+                        url,
+                        json=payload,
+                        headers=self.headers,
+                        timeout=self.timeout
+                    )
+                    raise_if_rate_limited(self.rate_limiter, "whatsapp", response)
+                    response.raise_for_status()
                 return response.json()
             except httpx.HTTPStatusError as e:
                 error_detail = f"Error al enviar mensaje: {e.response.status_code}"
@@ -76,7 +93,8 @@ class WhatsAppService:
         to: str,
         template_name: str,
         language_code: str = "en_US",
-        components: Optional[list] = None
+        components: Optional[list] = None,
+        priority: int = PRIORITY_USER
     ) -> Dict[str, Any]:
         """
         Envía un mensaje de plantilla (template) a través de WhatsApp
@@ -86,6 +104,7 @@ class WhatsAppService:
             template_name: Nombre de la plantilla aprobada
             language_code: Código de idioma (ej: "en_US", "es_ES")
             components: Componentes opcionales de la plantilla
+            priority: Clase de prioridad para el limitador de envíos
             
         Returns:
             Respuesta de la API de WhatsApp
@@ -110,15 +129,18 @@ class WhatsAppService:
         if components:
             payload["template"]["components"] = components
         
-        async with httpx.AsyncClient() as client:
+        await acquire_slot(self.rate_limiter, "whatsapp", priority)
+        async with use_client(self.client) as client:
             try:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
+                with track_outbound("whatsapp"):
+                    response = await client.post(
+                        url,
+                        json=payload,
+                        headers=self.headers,
+                        timeout=self.timeout
+                    )
+                    raise_if_rate_limited(self.rate_limiter, "whatsapp", response)
+                    response.raise_for_status()
                 return response.json()
             except httpx.HTTPStatusError as e:
                 error_detail = f"Error al enviar template: {e.response.status_code}"
@@ -128,12 +150,13 @@ class WhatsAppService:
             except httpx.RequestError as e:
                 raise Exception(f"Error de conexión: {str(e)}")
     
-    async def mark_message_as_read(self, message_id: str) -> Dict[str, Any]:
+    async def mark_message_as_read(self, message_id: str, priority: int = PRIORITY_USER) -> Dict[str, Any]:
         """
         Marca un mensaje como leído
         
         Args:
             message_id: ID del mensaje a marcar como leído
+            priority: Clase de prioridad para el limitador de envíos
             
         Returns:
             Respuesta de la API
@@ -146,15 +169,18 @@ class WhatsAppService:
             "message_id": message_id
         }
         
-        async with httpx.AsyncClient() as client:
+        await acquire_slot(self.rate_limiter, "whatsapp", priority)
+        async with use_client(self.client) as client:
             try:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers=self.headers,
-                    timeout=30.0
-                )
-                response.raise_for_status()
+                with track_outbound("whatsapp"):
+                    response = await client.post(
+                        url,
+                        json=payload,
+                        headers=self.headers,
+                        timeout=self.timeout
+                    )
+                    raise_if_rate_limited(self.rate_limiter, "whatsapp", response)
+                    response.raise_for_status()
                 return response.json()
             except httpx.HTTPStatusError as e:
                 error_detail = f"Error al marcar mensaje como leído: {e.response.status_code}"
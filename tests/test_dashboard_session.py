@@ -0,0 +1,50 @@
+"""
+Sesión del dashboard compilado: la cookie firmada con el ADMIN_TOKEN reemplaza
+al header X-Admin-Token en /api/pqrs/snapshot y /api/pqrs/stream
+"""
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from config import settings
+from utils.security import create_dashboard_session, verify_dashboard_access, verify_dashboard_session
+
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setattr(settings, "admin_token", "secreto")
+
+
+def test_sesion_valida():
+    session = create_dashboard_session(int(time.time()) + 60)
+    assert verify_dashboard_session(session)
+    verify_dashboard_access(None, session)
+
+
+def test_sesion_vencida_o_alterada():
+    expires_at = int(time.time()) + 60
+    session = create_dashboard_session(expires_at)
+    signature = session.split(".", 1)[1]
+    assert not verify_dashboard_session(create_dashboard_session(int(time.time()) - 1))
+    # Extender el vencimiento invalida la firma
+    assert not verify_dashboard_session(f"{expires_at + 3600}.{signature}")
+    assert not verify_dashboard_session("no-es-una-sesion")
+    assert not verify_dashboard_session(None)
+
+
+def test_cambiar_el_token_invalida_las_sesiones(monkeypatch):
+    session = create_dashboard_session(int(time.time()) + 60)
+    monkeypatch.setattr(settings, "admin_token", "otro")
+    assert not verify_dashboard_session(session)
+    monkeypatch.setattr(settings, "admin_token", "")
+    assert not verify_dashboard_session(session)
+    with pytest.raises(HTTPException) as error:
+        verify_dashboard_access(None, session)
+    assert error.value.status_code == 403
+
+
+def test_header_sin_sesion():
+    verify_dashboard_access("secreto", None)
+    with pytest.raises(HTTPException):
+        verify_dashboard_access("incorrecto", None)
@@ -0,0 +1,48 @@
+"""
+Caché de mensajes procesados: con `DEDUP_STORE=auto` se comparte entre workers
+siempre que las PQRS se compartan, sin depender de `WEB_CONCURRENCY`
+"""
+import pytest
+
+import services.dedup_cache as dedup_cache
+from config import settings
+from services.dedup_cache import MessageDedupCache, SQLiteMessageDedupCache, create_dedup_cache
+
+
+@pytest.fixture
+def auto(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "dedup_store", "auto")
+    monkeypatch.setattr(settings, "dedup_db_path", str(tmp_path / "processed_messages.db"))
+    monkeypatch.setattr(settings, "dedup_persist_path", "")
+
+
+def test_auto_usa_sqlite_con_json_y_locks_de_archivo(auto, monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "storage_backend", "json")
+    monkeypatch.setattr(dedup_cache, "FILE_LOCKS_SUPPORTED", True)
+    first = create_dedup_cache()
+    second = create_dedup_cache()
+    try:
+        assert isinstance(first, SQLiteMessageDedupCache)
+        # Dos workers (`uvicorn --workers 2`) ven el mismo reenvío de Meta
+        assert not first.check_and_add("wamid.1")
+        assert second.check_and_add("wamid.1")
+    finally:
+        first.close()
+        second.close()
+
+
+def test_auto_usa_sqlite_con_storage_sqlite(auto, monkeypatch):
+    monkeypatch.setattr(settings, "storage_backend", "sqlite")
+    monkeypatch.setattr(dedup_cache, "FILE_LOCKS_SUPPORTED", False)
+    cache = create_dedup_cache()
+    try:
+        assert isinstance(cache, SQLiteMessageDedupCache)
+    finally:
+        cache.close()
+
+
+def test_auto_usa_memoria_sin_almacenamiento_compartido(auto, monkeypatch):
+    # JSON sin locks de archivo (Windows): solo puede correr un worker
+    monkeypatch.setattr(settings, "storage_backend", "json")
+    monkeypatch.setattr(dedup_cache, "FILE_LOCKS_SUPPORTED", False)
+    assert isinstance(create_dedup_cache(), MessageDedupCache)
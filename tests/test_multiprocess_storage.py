@@ -0,0 +1,109 @@
+"""
+Prueba de estrés del almacenamiento de PQRS compartido entre procesos
+
+Varios procesos registran y marcan PQRS a la vez sobre los mismos archivos,
+como `uvicorn --workers N`. Al final no debe faltar ni repetirse ninguna PQRS,
+cada actualización debe estar aplicada y la vista de cada proceso (incluidos
+los listeners, como las estadísticas) debe incluir las PQRS de los demás.
+"""
+import multiprocessing
+
+import pytest
+
+from config import settings
+from services.pqrs_storage import JSONPQRSStorage
+from services.pqrs_sqlite_storage import SQLitePQRSStorage
+from utils.file_lock import FILE_LOCKS_SUPPORTED
+
+PROCESSES = 4
+PQRS_PER_PROCESS = 300
+# Cada cuántas PQRS se marca una como enviada
+MARK_EVERY = 7
+
+pytestmark = [
+    pytest.mark.slow,
+    pytest.mark.skipif(not FILE_LOCKS_SUPPORTED, reason="Varios procesos requieren locks de archivo (fcntl)"),
+]
+
+
+def _open_storage(backend, path):
+    if backend == "sqlite":
+        return SQLitePQRSStorage(path, migrate_from=None)
+    return JSONPQRSStorage(path)
+
+
+def _pqrs_id(worker, n):
+    return f"PQRS-W{worker}-{n:05d}"
+
+
+def _worker(backend, path, worker, barrier, results):
+    storage = _open_storage(backend, path)
+    try:
+        barrier.wait()
+        for n in range(PQRS_PER_PROCESS):
+            storage.add_pqrs({
+                "pqrs_id": _pqrs_id(worker, n),
+                "departamento": "Académico",
+                "codigo_departamento": f"D{n % 3}",
+                "descripcion": f"Queja {n} del proceso {worker}",
+                "telefono": f"57300{worker}{n:05d}"
+            })
+            if n % MARK_EVERY == 0:
+                storage.mark_as_sent(_pqrs_id(worker, n))
+        storage.persisted().result(timeout=60)
+        # Todos terminaron de escribir: al aplicar los cambios ajenos, la vista
+        # de cada proceso debe quedar completa
+        barrier.wait()
+        storage.refresh()
+        records = storage.get_all_pqrs()
+        results.put((
+            worker,
+            sorted(record["pqrs_id"] for record in records),
+            storage.stats.snapshot()["total"],
+            storage.stats.snapshot()["enviadas_telegram"]
+        ))
+    finally:
+        storage.close()
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_concurrent_workers_lose_and_duplicate_nothing(tmp_path, monkeypatch, backend):
+    # Compactar seguido para que las rotaciones del journal ocurran durante las escrituras
+    monkeypatch.setattr(settings, "storage_compact_threshold", 50)
+    monkeypatch.setattr(settings, "storage_fsync", False)
+    path = str(tmp_path / ("pqrs_data.db" if backend == "sqlite" else "pqrs_data.json"))
+
+    context = multiprocessing.get_context("fork")
+    barrier = context.Barrier(PROCESSES)
+    results = context.Queue()
+    processes = [
+        context.Process(target=_worker, args=(backend, path, worker, barrier, results))
+        for worker in range(PROCESSES)
+    ]
+    for process in processes:
+        process.start()
+    views = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(timeout=60)
+        assert process.exitcode == 0
+
+    expected_ids = sorted(_pqrs_id(worker, n) for worker in range(PROCESSES) for n in range(PQRS_PER_PROCESS))
+    expected_sent = PROCESSES * len(range(0, PQRS_PER_PROCESS, MARK_EVERY))
+
+    # Lo que quedó en disco, leído por un proceso nuevo
+    storage = _open_storage(backend, path)
+    try:
+        records = storage.get_all_pqrs()
+        assert sorted(record["pqrs_id"] for record in records) == expected_ids
+        sent = {record["pqrs_id"] for record in records if record.get("enviado_telegram")}
+        assert sent == {
+            _pqrs_id(worker, n) for worker in range(PROCESSES) for n in range(0, PQRS_PER_PROCESS, MARK_EVERY)
+        }
+    finally:
+        storage.close()
+
+    # La vista (y los listeners) de cada proceso incluye las PQRS de los demás
+    for worker, ids, total, total_sent in views:
+        assert ids == expected_ids, f"vista del proceso {worker} incompleta"
+        assert total == len(expected_ids)
+        assert total_sent == expected_sent
@@ -0,0 +1,210 @@
+"""
+Outbox de envíos: reintentos con backoff, dead letters, reencolado y
+recuperación de trabajos abandonados, sobre una base SQLite temporal
+"""
+import asyncio
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+import main
+from config import settings
+from services.outbox import Outbox, OutboxWorkerPool
+from services.rate_limiter import RateLimitedError
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.db"))
+    yield outbox
+    outbox.close()
+
+
+@pytest.fixture
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "outbox_max_attempts", 3)
+    monkeypatch.setattr(settings, "outbox_backoff_base", 0.01)
+    monkeypatch.setattr(settings, "outbox_backoff_max", 0.05)
+    monkeypatch.setattr(settings, "outbox_poll_interval", 0.01)
+    monkeypatch.setattr(settings, "outbox_job_timeout", 5)
+
+
+def _pool(outbox, handler):
+    return OutboxWorkerPool(
+        outbox,
+        handlers={"whatsapp_text": handler},
+        providers={"whatsapp_text": "whatsapp"},
+        concurrency={"whatsapp": 2}
+    )
+
+
+async def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "la condición no se cumplió a tiempo"
+        await asyncio.sleep(0.01)
+
+
+def test_retry_reprograma_y_cuenta_intentos(outbox):
+    outbox.enqueue("whatsapp_text", {"to": "1"})
+    job, = outbox.claim(["whatsapp_text"], 10)
+    outbox.retry(job, "HTTP 500", delay=60)
+    # No está listo hasta que pase el backoff
+    assert outbox.claim(["whatsapp_text"], 10) == []
+    assert outbox.stats()["queued"] == {"whatsapp_text": {"pending": 1}}
+
+    outbox.retry(dict(job, attempts=1), "429", delay=0, count_attempt=False)
+    job, = outbox.claim(["whatsapp_text"], 10)
+    assert job["attempts"] == 1
+    assert job["last_error"] == "429"
+
+
+def test_dead_letter_al_agotar_intentos(outbox, fast_retries):
+    calls = []
+
+    async def failing(payload):
+        calls.append(time.monotonic())
+        raise RuntimeError("Graph API caído")
+
+    async def scenario():
+        pool = _pool(outbox, failing)
+        await pool.start()
+        try:
+            outbox.enqueue("whatsapp_text", {"to": "1"})
+            await _wait_for(lambda: outbox.stats()["dead_letters"] == 1)
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+    assert len(calls) == settings.outbox_max_attempts
+    assert outbox.stats()["queued"] == {}
+    dead, = outbox.list_dead_letters()
+    assert dead["attempts"] == settings.outbox_max_attempts
+    assert dead["last_error"] == "Graph API caído"
+    assert dead["payload"] == {"to": "1"}
+
+
+def test_rate_limited_no_gasta_intentos(outbox, fast_retries):
+    calls = []
+
+    async def throttled(payload):
+        calls.append(payload)
+        if len(calls) <= settings.outbox_max_attempts:
+            raise RateLimitedError("whatsapp", 0)
+
+    async def scenario():
+        pool = _pool(outbox, throttled)
+        await pool.start()
+        try:
+            outbox.enqueue("whatsapp_text", {"to": "1"})
+            await _wait_for(lambda: outbox.stats()["queued"] == {})
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+    # Más 429 que intentos permitidos y aun así se entregó, sin dead letter
+    assert len(calls) == settings.outbox_max_attempts + 1
+    assert outbox.stats()["dead_letters"] == 0
+
+
+def test_despachador_sobrevive_a_la_base_bloqueada(outbox, fast_retries, monkeypatch):
+    delivered = []
+    failures = []
+    claim = outbox.claim
+
+    def flaky_claim(kinds, limit):
+        if len(failures) < 3:
+            failures.append(limit)
+            raise sqlite3.OperationalError("database is locked")
+        return claim(kinds, limit)
+
+    monkeypatch.setattr(outbox, "claim", flaky_claim)
+
+    async def deliver(payload):
+        delivered.append(payload)
+
+    async def scenario():
+        pool = _pool(outbox, deliver)
+        await pool.start()
+        try:
+            outbox.enqueue("whatsapp_text", {"to": "1"})
+            await _wait_for(lambda: delivered)
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+    assert len(failures) == 3
+    assert delivered == [{"to": "1"}]
+
+
+def test_enqueue_desde_el_executor_despierta_al_despachador(outbox, fast_retries, monkeypatch):
+    # Sin el aviso, el despachador solo revisaría la cola cada 30 s
+    monkeypatch.setattr(settings, "outbox_poll_interval", 30)
+    delivered = []
+
+    async def deliver(payload):
+        delivered.append(payload)
+
+    async def scenario():
+        pool = _pool(outbox, deliver)
+        await pool.start()
+        try:
+            await asyncio.sleep(0.05)
+            await asyncio.get_running_loop().run_in_executor(None, outbox.enqueue, "whatsapp_text", {"to": "1"})
+            await _wait_for(lambda: delivered, timeout=2)
+        finally:
+            await pool.stop()
+
+    asyncio.run(scenario())
+    assert delivered == [{"to": "1"}]
+
+
+def test_requeue_dead_letter(outbox):
+    outbox.enqueue("whatsapp_text", {"to": "1"}, dedup_key="confirmacion-1")
+    job, = outbox.claim(["whatsapp_text"], 10)
+    outbox.dead_letter(job, "HTTP 500")
+    dead, = outbox.list_dead_letters()
+
+    assert outbox.requeue_dead_letter(dead["id"]) is True
+    assert outbox.list_dead_letters() == []
+    job, = outbox.claim(["whatsapp_text"], 10)
+    assert job["attempts"] == 0
+    assert job["dedup_key"] == "confirmacion-1"
+    assert outbox.requeue_dead_letter(dead["id"]) is False
+
+
+def test_requeue_dead_letter_con_trabajo_vivo_responde_409(outbox, monkeypatch):
+    outbox.enqueue("whatsapp_text", {"to": "1"}, dedup_key="confirmacion-1")
+    job, = outbox.claim(["whatsapp_text"], 10)
+    outbox.dead_letter(job, "HTTP 500")
+    dead, = outbox.list_dead_letters()
+    # Se volvió a encolar el mismo envío mientras tanto
+    outbox.enqueue("whatsapp_text", {"to": "1"}, dedup_key="confirmacion-1")
+
+    with pytest.raises(ValueError):
+        outbox.requeue_dead_letter(dead["id"])
+    # El dead letter se conserva
+    assert [d["id"] for d in outbox.list_dead_letters()] == [dead["id"]]
+
+    monkeypatch.setattr(main, "message_handler", SimpleNamespace(outbox=outbox))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.requeue_dead_letter(dead["id"]))
+    assert error.value.status_code == 409
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(main.requeue_dead_letter(dead["id"] + 1))
+    assert error.value.status_code == 404
+
+
+def test_recover_stale(outbox):
+    outbox.enqueue("whatsapp_text", {"to": "1"})
+    outbox.enqueue("whatsapp_text", {"to": "2"})
+    assert len(outbox.claim(["whatsapp_text"], 10)) == 2
+    assert outbox.claim(["whatsapp_text"], 10) == []
+
+    # Tomados hace menos de una hora: siguen en proceso
+    assert outbox.recover_stale(older_than=3600) == 0
+    assert outbox.recover_stale(older_than=0) == 2
+    assert len(outbox.claim(["whatsapp_text"], 10)) == 2
@@ -0,0 +1,62 @@
+"""
+Exportación de PQRS: las celdas del CSV que Excel interpretaría como fórmulas
+se neutralizan (inyección CSV) y el NDJSON conserva los textos sin cambios
+"""
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+
+from services.pqrs_export import iter_export
+from services.pqrs_sqlite_storage import SQLitePQRSStorage
+
+DESCRIPCIONES = {
+    "PQRS-1": "=HYPERLINK(\"http://example.com\",\"ver\")",
+    "PQRS-2": "+1",
+    "PQRS-3": "-2",
+    "PQRS-4": "@SUM(A1:A2)",
+    "PQRS-5": "\tcon tabulación",
+    "PQRS-6": "\rcon retorno",
+    "PQRS-7": "Queja normal - sin fórmula",
+}
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = SQLitePQRSStorage(str(tmp_path / "pqrs.db"), migrate_from=None)
+    for pqrs_id, descripcion in DESCRIPCIONES.items():
+        storage.add_pqrs({
+            "pqrs_id": pqrs_id,
+            "departamento": "=Académico",
+            "codigo_departamento": "ACA",
+            "descripcion": descripcion,
+            "telefono": "573001234567"
+        })
+    yield storage
+    storage.close()
+
+
+def _export(storage, export_format):
+    async def collect():
+        return b"".join([chunk async for chunk in iter_export(storage, {}, export_format)])
+    return asyncio.run(collect()).decode("utf-8")
+
+
+def test_csv_neutraliza_formulas(storage):
+    rows = list(csv.DictReader(io.StringIO(_export(storage, "csv").lstrip("\ufeff"), newline="")))
+    assert len(rows) == len(DESCRIPCIONES)
+    for row in rows:
+        descripcion = DESCRIPCIONES[row["pqrs_id"]]
+        if row["pqrs_id"] == "PQRS-7":
+            assert row["descripcion"] == descripcion
+        else:
+            assert row["descripcion"] == "'" + descripcion
+        assert row["departamento"] == "'=Académico"
+
+
+def test_ndjson_sin_cambios(storage):
+    records = [json.loads(line) for line in _export(storage, "ndjson").splitlines()]
+    assert {record["pqrs_id"]: record["descripcion"] for record in records} == DESCRIPCIONES
+    assert all(record["departamento"] == "=Académico" for record in records)
@@ -0,0 +1,107 @@
+"""
+Almacenamiento de PQRS: cada PQRS se identifica por `(pqrs_id, fecha_registro)`
+al actualizarla y al registrarla, y los cambios sobreviven a la recarga desde disco
+"""
+from datetime import datetime
+
+import pytest
+
+import services.pqrs_storage as pqrs_storage
+from config import settings
+from services.pqrs_storage import JSONPQRSStorage
+from services.pqrs_sqlite_storage import SQLitePQRSStorage
+
+
+def _open_storage(backend, path):
+    if backend == "sqlite":
+        return SQLitePQRSStorage(path, migrate_from=None)
+    return JSONPQRSStorage(path)
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def storage_path(request, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "storage_fsync", False)
+    name = "pqrs_data.db" if request.param == "sqlite" else "pqrs_data.json"
+    return request.param, str(tmp_path / name)
+
+
+def _add(storage, descripcion):
+    # El ID tiene resolución de un segundo: dos PQRS del mismo departamento en
+    # el mismo segundo lo comparten
+    record = {
+        "pqrs_id": "PQRS-TEC-20250101120000",
+        "departamento": "Tecnología",
+        "codigo_departamento": "TEC",
+        "descripcion": descripcion,
+        "telefono": "573001234567"
+    }
+    storage.add_pqrs(record).result(timeout=10)
+    return record
+
+
+def test_actualiza_la_pqrs_correcta_con_id_repetido(storage_path):
+    backend, path = storage_path
+    storage = _open_storage(backend, path)
+    try:
+        first = _add(storage, "Primera queja")
+        second = _add(storage, "Segunda queja")
+        assert first["fecha_registro"] != second["fecha_registro"]
+
+        storage.mark_as_sent(second["pqrs_id"], second["fecha_registro"])
+        storage.update_pqrs(first["pqrs_id"], {"entrega_email": "error"}, first["fecha_registro"])
+        storage.persisted().result(timeout=10)
+    finally:
+        storage.close()
+
+    reopened = _open_storage(backend, path)
+    try:
+        by_description = {record["descripcion"]: record for record in reopened.get_all_pqrs()}
+        assert not by_description["Primera queja"].get("enviado_telegram")
+        assert by_description["Primera queja"].get("entrega_email") == "error"
+        assert by_description["Segunda queja"]["enviado_telegram"]
+        assert "entrega_email" not in by_description["Segunda queja"]
+        assert [record["descripcion"] for record in reopened.get_pending_pqrs()] == ["Primera queja"]
+    finally:
+        reopened.close()
+
+
+def test_actualizacion_de_una_pqrs_inexistente(storage_path):
+    backend, path = storage_path
+    storage = _open_storage(backend, path)
+    try:
+        record = _add(storage, "Queja")
+        assert storage.update_pqrs(record["pqrs_id"], {"entrega_email": "error"}, "2000-01-01T00:00:00") is None
+        assert storage.get_all_pqrs()[0].get("entrega_email") is None
+    finally:
+        storage.close()
+
+
+class _FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return cls(2025, 1, 1, 12, 0, 0)
+
+
+def test_pqrs_repetida_no_se_guarda_ni_se_notifica(storage_path, monkeypatch):
+    backend, path = storage_path
+    monkeypatch.setattr(pqrs_storage, "datetime", _FrozenDatetime)
+    storage = _open_storage(backend, path)
+    events = []
+    storage.add_listener(lambda event, record: events.append((event, record["descripcion"])), replay=False)
+    try:
+        _add(storage, "Queja")
+        _add(storage, "Queja reenviada")
+        storage.persisted().result(timeout=10)
+        assert events == [("add", "Queja")]
+        assert storage.stats.snapshot()["total"] == 1
+    finally:
+        storage.close()
+
+    if backend == "json":
+        with open(f"{path}{pqrs_storage.JOURNAL_SUFFIX}", encoding="utf-8") as f:
+            assert sum('"op": "add"' in line for line in f) == 1
+    reopened = _open_storage(backend, path)
+    try:
+        assert [record["descripcion"] for record in reopened.get_all_pqrs()] == ["Queja"]
+    finally:
+        reopened.close()
@@ -0,0 +1,196 @@
+"""
+Limitador de envíos: token bucket con prioridad, cuota diaria compartida en
+SQLite y el reintento de Telegram con el ID alternativo del canal
+"""
+import asyncio
+import json
+import time
+from datetime import datetime, timezone
+
+import httpx
+import pytest
+
+from config import settings
+from services.announcement_service import TelegramAnnouncementService
+from services.rate_limiter import (
+    DailyQuota, QuotaExceededError, RateLimitedError, RateLimiter, TokenBucket,
+    PRIORITY_USER, PRIORITY_ALERT, PRIORITY_BACKLOG
+)
+
+
+@pytest.fixture
+def quota(tmp_path):
+    return DailyQuota(str(tmp_path / "rate_quota.db"), {"telegram": 3, "whatsapp": 0})
+
+
+def test_bucket_permite_la_rafaga_y_luego_la_tasa():
+    async def scenario():
+        bucket = TokenBucket(rate=50, capacity=5)
+        started = time.monotonic()
+        for _ in range(5):
+            await bucket.acquire()
+        burst = time.monotonic() - started
+        for _ in range(5):
+            await bucket.acquire()
+        return burst, time.monotonic() - started
+
+    burst, total = asyncio.run(scenario())
+    assert burst < 0.05
+    # Cinco tokens más a 50/s: al menos ~0.1 s
+    assert total >= 0.08
+
+
+def test_bucket_atiende_primero_la_menor_prioridad():
+    async def scenario():
+        bucket = TokenBucket(rate=100, capacity=1)
+        await bucket.acquire()
+        order = []
+
+        async def wait(priority):
+            await bucket.acquire(priority)
+            order.append(priority)
+
+        await asyncio.gather(wait(PRIORITY_BACKLOG), wait(PRIORITY_ALERT), wait(PRIORITY_USER))
+        return order
+
+    assert asyncio.run(scenario()) == [PRIORITY_USER, PRIORITY_ALERT, PRIORITY_BACKLOG]
+
+
+def test_bucket_bloqueado_tras_429():
+    async def scenario():
+        bucket = TokenBucket(rate=1000, capacity=10)
+        bucket.block(0.1)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.09
+
+
+def test_bucket_cancelado_no_pierde_el_token():
+    async def scenario():
+        bucket = TokenBucket(rate=10, capacity=1)
+        await bucket.acquire()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert bucket.waiting == 0
+        await asyncio.wait_for(bucket.acquire(), timeout=1)
+
+    asyncio.run(scenario())
+
+
+def test_cuota_se_agota_y_se_devuelve(quota):
+    for _ in range(3):
+        quota.consume("telegram")
+    with pytest.raises(QuotaExceededError) as excinfo:
+        quota.consume("telegram")
+    assert excinfo.value.provider == "telegram"
+    assert 0 < excinfo.value.retry_after <= 86400
+    assert quota.used("telegram") == 3
+
+    quota.refund("telegram")
+    assert quota.used("telegram") == 2
+    quota.consume("telegram")
+
+
+def test_cuota_sin_limite(quota):
+    for _ in range(10):
+        quota.consume("whatsapp")
+    assert quota.used("whatsapp") == 0
+
+
+def test_cuota_compartida_entre_procesos(tmp_path):
+    path = str(tmp_path / "rate_quota.db")
+    first = DailyQuota(path, {"telegram": 4})
+    second = DailyQuota(path, {"telegram": 4})
+    first.consume("telegram")
+    second.consume("telegram")
+    first.consume("telegram")
+    second.consume("telegram")
+    for quota in (first, second):
+        with pytest.raises(QuotaExceededError):
+            quota.consume("telegram")
+    assert first.used("telegram") == second.used("telegram") == 4
+
+
+def test_cuota_se_reinicia_al_cambiar_el_dia(quota, monkeypatch):
+    for _ in range(3):
+        quota.consume("telegram")
+    monkeypatch.setattr(DailyQuota, "_today", staticmethod(lambda: "2999-01-01"))
+    assert quota.used("telegram") == 0
+    quota.consume("telegram")
+    assert quota.used("telegram") == 1
+
+
+def test_cuota_importa_el_json_anterior(tmp_path):
+    legacy = tmp_path / "rate_quota.json"
+    today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+    legacy.write_text(f'{{"day": "{today}", "counts": {{"telegram": 2}}}}', encoding="utf-8")
+    quota = DailyQuota(str(tmp_path / "rate_quota.db"), {"telegram": 3}, migrate_from=str(legacy))
+    assert quota.used("telegram") == 2
+
+
+def test_limitador_rechaza_si_el_bloqueo_supera_max_wait(quota):
+    async def scenario():
+        limiter = RateLimiter({"telegram": TokenBucket(1, 1)}, quota, max_wait=5)
+        limiter.penalize("telegram", 60)
+        with pytest.raises(RateLimitedError):
+            await limiter.acquire("telegram")
+
+    asyncio.run(scenario())
+    # El rechazo por bloqueo no descuenta la cuota
+    assert quota.used("telegram") == 0
+
+
+def _telegram(monkeypatch, handler, quota):
+    monkeypatch.setattr(settings, "telegram_bot_token", "123:abc")
+    monkeypatch.setattr(settings, "telegram_channel_id", "@alertas")
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    limiter = RateLimiter({"telegram": TokenBucket(100, 10)}, quota)
+    return TelegramAnnouncementService(client, limiter), client
+
+
+def test_id_alternativo_usa_un_solo_envio_de_la_cuota(monkeypatch, quota):
+    chat_ids = []
+
+    def handler(request):
+        chat_id = json.loads(request.content)["chat_id"]
+        chat_ids.append(chat_id)
+        if chat_id == "@alertas":
+            return httpx.Response(200, json={"ok": False, "description": "Bad Request: chat not found"})
+        return httpx.Response(200, json={"ok": True, "result": {"message_id": 1}})
+
+    async def scenario():
+        service, client = _telegram(monkeypatch, handler, quota)
+        async with client:
+            result = await service.send_announcement("Anuncio")
+        return service, result
+
+    service, result = asyncio.run(scenario())
+    assert result["ok"]
+    assert chat_ids == ["@alertas", "alertas"]
+    assert service.channel_id == "alertas"
+    assert quota.used("telegram") == 1
+
+
+def test_id_alternativo_con_429_lanza_rate_limited(monkeypatch, quota):
+    def handler(request):
+        chat_id = json.loads(request.content)["chat_id"]
+        if chat_id == "@alertas":
+            return httpx.Response(200, json={"ok": False, "description": "Bad Request: chat not found"})
+        return httpx.Response(429, headers={"Retry-After": "7"}, json={"ok": False})
+
+    async def scenario():
+        service, client = _telegram(monkeypatch, handler, quota)
+        async with client:
+            with pytest.raises(RateLimitedError) as excinfo:
+                await service.send_announcement("Anuncio")
+        return service, excinfo.value
+
+    service, error = asyncio.run(scenario())
+    assert error.retry_after == 7
+    assert service.rate_limiter.buckets["telegram"].blocked_until > time.monotonic() + 5
+    assert service.channel_id == "@alertas"
@@ -0,0 +1,47 @@
+"""
+Ventana de tiempo de los índices de similitud: las PQRS de otros workers pueden
+llegar (con `refresh`) después de otras con una `fecha_registro` más nueva
+"""
+import pytest
+
+from services.similarity_engine import MinHashSimilarityIndex
+from services.similarity_index import SimilarityIndex
+
+DESCRIPCION = "el proyector del salón 204 no enciende desde ayer"
+
+
+@pytest.fixture(params=["tokens", "minhash"])
+def index(request):
+    return SimilarityIndex() if request.param == "tokens" else MinHashSimilarityIndex()
+
+
+def _add(index, pqrs_id, fecha):
+    index.add({
+        "pqrs_id": pqrs_id,
+        "fecha_registro": fecha,
+        "codigo_departamento": "TEC",
+        "descripcion": DESCRIPCION
+    })
+
+
+def test_ventana_incluye_pqrs_anteriores_a_una_que_llego_tarde(index):
+    _add(index, "PQRS-A", "2025-01-01T12:00:00")
+    _add(index, "PQRS-B", "2025-01-01T09:00:00")  # de otro worker, llega tarde
+    _add(index, "PQRS-C", "2025-01-01T12:30:00")
+    found = index.find_similar("TEC", DESCRIPCION, since="2025-01-01T11:00:00")
+    assert sorted(pqrs_id for pqrs_id, _ in found) == ["PQRS-A", "PQRS-C"]
+
+
+def test_ventana_excluye_pqrs_viejas_que_llegaron_tarde(index):
+    _add(index, "PQRS-A", "2025-01-01T09:00:00")
+    _add(index, "PQRS-B", "2025-01-01T12:00:00")
+    _add(index, "PQRS-C", "2025-01-01T08:00:00")  # de otro worker, llega tarde
+    found = index.find_similar("TEC", DESCRIPCION, since="2025-01-01T11:00:00")
+    assert [pqrs_id for pqrs_id, _ in found] == ["PQRS-B"]
+
+
+def test_sin_ventana_de_tiempo_usa_las_ultimas_llegadas(index):
+    for n in range(5):
+        _add(index, f"PQRS-{n}", f"2025-01-01T1{n}:00:00")
+    found = index.find_similar("TEC", DESCRIPCION, limit=2)
+    assert [pqrs_id for pqrs_id, _ in found] == ["PQRS-4", "PQRS-3"]
@@ -0,0 +1,84 @@
+"""
+Decodificación de webhooks: los que solo traen estados no construyen los modelos
+de `WebhookPayload`, y ambos caminos dan el mismo resultado que el modelo completo
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+import models.whatsapp as whatsapp
+from models.whatsapp import WebhookPayload, parse_webhook
+
+FIXTURES = Path(__file__).parent / "fixtures" / "webhooks"
+
+
+def _load(name: str) -> bytes:
+    return (FIXTURES / name).read_bytes()
+
+
+def _full_model(body: bytes):
+    """Camino anterior: json.loads + el modelo completo"""
+    payload = WebhookPayload(**json.loads(body.decode("utf-8")))
+    messages = [m for entry in payload.entry for change in entry.changes for m in change.value.messages or []]
+    statuses = [s for entry in payload.entry for change in entry.changes for s in change.value.statuses or []]
+    return payload.object, messages, statuses
+
+
+class _NoModels:
+    """Reemplaza al validador: falla si se construyen los modelos"""
+
+    def validate_json(self, body):
+        raise AssertionError("se construyeron los modelos para un webhook sin mensajes")
+
+
+@pytest.mark.parametrize("name", ["status_delivered.json", "statuses_batch.json"])
+def test_solo_estados_no_construye_modelos(monkeypatch, name):
+    body = _load(name)
+    monkeypatch.setattr(whatsapp, "_WEBHOOK_ADAPTER", _NoModels())
+    events = parse_webhook(body)
+    object_, messages, statuses = _full_model(body)
+    assert events.object == object_
+    assert events.messages == []
+    assert events.statuses == statuses
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_solo_estados_sin_orjson(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(whatsapp, "orjson", None)
+    elif whatsapp.orjson is None:
+        pytest.skip("orjson no está instalado")
+    events = parse_webhook(_load("statuses_batch.json"))
+    assert [status["status"] for status in events.statuses] == ["read", "sent", "failed"]
+
+
+def test_mensaje_usa_el_modelo_completo():
+    body = _load("text_message.json")
+    events = parse_webhook(body)
+    object_, messages, statuses = _full_model(body)
+    assert events.object == object_
+    assert events.messages == messages
+    assert events.statuses == statuses == []
+    message, = events.messages
+    assert message.from_ == "573001234567"
+    assert message.text.body.startswith("El proyector")
+
+
+def test_mensaje_con_espacios_antes_de_los_dos_puntos():
+    # El pre-chequeo no depende del formato del JSON
+    body = json.dumps(json.loads(_load("text_message.json")), separators=(" , ", " : ")).encode()
+    assert len(parse_webhook(body).messages) == 1
+
+
+@pytest.mark.parametrize("body", [b"", b"{", b"[]", b'"texto"'])
+def test_cuerpo_invalido(body):
+    with pytest.raises(ValueError):
+        parse_webhook(body)
+
+
+def test_mensaje_invalido():
+    payload = json.loads(_load("text_message.json"))
+    del payload["entry"][0]["changes"][0]["value"]["messages"][0]["id"]
+    with pytest.raises(ValueError):
+        parse_webhook(json.dumps(payload).encode())
@@ -2,6 +2,7 @@
 from .security import (
     verify_webhook_signature,
     verify_webhook_token,
+    verify_admin_token,
     get_request_body
 )
 from .phone_utils import (
@@ -9,13 +10,28 @@ from .phone_utils import (
     format_phone_number,
     TEST_PHONE_NUMBERS
 )
+from .text_utils import (
+    fold_accents,
+    light_stem,
+    normalize_text
+)
+from .file_lock import FileLock, FILE_LOCKS_SUPPORTED
+from .pagination import encode_cursor, decode_cursor
 
 __all__ = [
     "verify_webhook_signature",
     "verify_webhook_token",
+    "verify_admin_token",
     "get_request_body",
     "normalize_phone_number",
     "format_phone_number",
-    "TEST_PHONE_NUMBERS"
+    "TEST_PHONE_NUMBERS",
+    "fold_accents",
+    "light_stem",
+    "normalize_text",
+    "FileLock",
+    "FILE_LOCKS_SUPPORTED",
+    "encode_cursor",
+    "decode_cursor"
 ]
 
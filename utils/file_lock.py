@@ -0,0 +1,88 @@
+"""
+Locks de archivo entre procesos (`fcntl.flock`)
+
+El sistema operativo libera el lock cuando el proceso termina, aunque sea por
+una caída, así que nunca queda un lock huérfano. En plataformas sin `fcntl`
+(Windows) los locks no hacen nada: ahí solo se soporta un proceso.
+"""
+import os
+import threading
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+FILE_LOCKS_SUPPORTED = fcntl is not None
+
+
+class FileLock:
+    """
+    Lock exclusivo sobre un archivo
+
+    No es reentrante y lo puede liberar un hilo distinto del que lo tomó (por
+    ejemplo, un hilo en segundo plano que termina el trabajo).
+
+    Uso:
+        lock = FileLock("pqrs_data.json.lock")
+        with lock:
+            ...
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Archivo de lock (se crea si no existe)
+        """
+        self.path = path
+        self._fd: Optional[int] = None
+        # flock es por descriptor: entre hilos del mismo proceso se serializa con este lock
+        self._thread_lock = threading.Lock()
+
+    def _open(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """
+        Toma el lock
+
+        Args:
+            blocking: Si es False, no espera y retorna False si otro lo tiene
+
+        Returns:
+            True si se tomó el lock
+        """
+        if not self._thread_lock.acquire(blocking):
+            return False
+        if fcntl is not None:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(self._open(), flags)
+            except BlockingIOError:
+                self._thread_lock.release()
+                return False
+            except BaseException:
+                self._thread_lock.release()
+                raise
+        return True
+
+    def release(self) -> None:
+        if fcntl is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self._thread_lock.release()
+
+    def __enter__(self) -> "FileLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.release()
+
+    def close(self) -> None:
+        """Cierra el descriptor (libera el lock si estaba tomado)"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -0,0 +1,44 @@
+"""
+Cursores opacos para la paginación por keyset
+"""
+import base64
+import json
+from typing import Tuple
+
+
+def encode_cursor(key: Tuple[str, ...]) -> str:
+    """
+    Codifica la clave de la última fila de una página como cursor
+
+    Args:
+        key: Clave de orden de la fila (por ejemplo `(fecha_registro, pqrs_id)`)
+
+    Returns:
+        Cursor en base64 apto para URLs
+    """
+    raw = json.dumps(list(key), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int = 2) -> Tuple[str, ...]:
+    """
+    Decodifica un cursor generado por `encode_cursor`
+
+    Args:
+        cursor: Cursor recibido del cliente
+        size: Cantidad de elementos que debe tener la clave
+
+    Returns:
+        Clave de la última fila de la página anterior
+
+    Raises:
+        ValueError: Si el cursor no es válido
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Cursor inválido: {e}")
+    if not isinstance(key, list) or len(key) != size or not all(isinstance(part, str) for part in key):
+        raise ValueError("Cursor inválido")
+    return tuple(key)
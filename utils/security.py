@@ -3,10 +3,14 @@ Utilidades de seguridad para validar webhooks de WhatsApp
 """
 import hmac
 import hashlib
+import time
 from typing import Optional
-from fastapi import Request, HTTPException, status
+from fastapi import Request, HTTPException, status, Header, Cookie
 from config import settings
 
+# Cookie de sesión del dashboard compilado (el EventSource no puede enviar headers)
+DASHBOARD_SESSION_COOKIE = "pqrs_dashboard_session"
+
 
 def verify_webhook_signature(payload: bytes, signature: Optional[str]) -> bool:
     """
@@ -52,6 +56,85 @@ def verify_webhook_token(token: str) -> bool:
     return token == settings.whatsapp_verify_token
 
 
+def verify_admin_token(x_admin_token: Optional[str] = Header(None)) -> None:
+    """
+    Dependencia de FastAPI que protege los endpoints de administración
+    
+    Args:
+        x_admin_token: Token recibido en el header X-Admin-Token
+        
+    Raises:
+        HTTPException: 403 si no hay ADMIN_TOKEN configurado o el token no coincide
+    """
+    if not settings.admin_token or not x_admin_token or not hmac.compare_digest(x_admin_token, settings.admin_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Token de administración inválido"
+        )
+
+
+def _dashboard_session_signature(expires_at: int) -> str:
+    # Firmada con ADMIN_TOKEN: cambiar el token invalida las sesiones abiertas
+    return hmac.new(
+        settings.admin_token.encode('utf-8'),
+        f"dashboard:{expires_at}".encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+
+def create_dashboard_session(expires_at: int) -> str:
+    """
+    Crea el valor de la cookie de sesión del dashboard
+    
+    Args:
+        expires_at: Vencimiento (timestamp Unix)
+        
+    Returns:
+        `<vencimiento>.<firma>`
+    """
+    return f"{expires_at}.{_dashboard_session_signature(expires_at)}"
+
+
+def verify_dashboard_session(value: Optional[str]) -> bool:
+    """
+    Verifica una cookie de sesión del dashboard
+    
+    Args:
+        value: Valor de la cookie
+        
+    Returns:
+        True si la firma es válida y no venció
+    """
+    if not settings.admin_token or not value:
+        return False
+    expires, _, signature = value.partition(".")
+    try:
+        expires_at = int(expires)
+    except ValueError:
+        return False
+    if expires_at < time.time():
+        return False
+    return hmac.compare_digest(signature, _dashboard_session_signature(expires_at))
+
+
+def verify_dashboard_access(
+    x_admin_token: Optional[str] = Header(None),
+    session: Optional[str] = Cookie(None, alias=DASHBOARD_SESSION_COOKIE)
+) -> None:
+    """
+    Dependencia de FastAPI que protege los endpoints que lee el dashboard
+    
+    Acepta el header X-Admin-Token (servidor de desarrollo, scripts) o la cookie
+    de sesión que entrega `POST /api/dashboard/session` (dashboard compilado).
+    
+    Raises:
+        HTTPException: 403 si no hay ADMIN_TOKEN configurado o no hay token ni sesión válidos
+    """
+    if verify_dashboard_session(session):
+        return
+    verify_admin_token(x_admin_token)
+
+
 async def get_request_body(request: Request) -> bytes:
     """
     Obtiene el cuerpo de la petición como bytes
@@ -0,0 +1,75 @@
+"""
+Utilidades para normalizar textos en español
+"""
+import re
+import unicodedata
+from typing import List
+
+
+# Palabras muy frecuentes que no aportan al comparar quejas (sin tildes, ya normalizadas)
+SPANISH_STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun cada casi como con contra cual cuales
+cuando de del desde donde dos e el ella ellas ello ellos en entre era eran es esa esas ese eso esos esta estaba
+estaban estan estar este esto estos fue fueron ha habia han hace hacen hasta hay la las le les lo los mas me mi
+mis mucho muy nada ni no nos nuestra nuestro o otra otras otro otros para pero poco por porque que quien se
+sea ser si sido sin sobre solo son su sus tambien tan te tiene tienen todo todos tu tus un una unas uno unos
+usted ustedes y ya yo
+favor hola buenas buenos dias tardes noches gracias
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold_accents(text: str) -> str:
+    """
+    Elimina tildes y diéresis (la ñ se convierte en n)
+
+    Examples:
+        >>> fold_accents("Baño dañado en la ingeniería")
+        "Bano danado en la ingenieria"
+    """
+    decomposed = unicodedata.normalize("NFD", text)
+    return "".join(char for char in decomposed if unicodedata.category(char) != "Mn")
+
+
+def light_stem(word: str) -> str:
+    """
+    Stemming liviano para español: quita plurales y la vocal final
+
+    Examples:
+        >>> light_stem("luces")
+        "luz"
+        >>> light_stem("tapadas")
+        "tapad"
+    """
+    if len(word) > 4 and word.endswith("ces"):
+        word = word[:-3] + "z"
+    elif len(word) > 4 and word.endswith("es"):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s"):
+        word = word[:-1]
+
+    if len(word) > 4 and word[-1] in "aeo":
+        word = word[:-1]
+    return word
+
+
+def normalize_text(text: str) -> List[str]:
+    """
+    Normaliza un texto en español para compararlo con otros
+
+    Pasa a minúsculas, elimina tildes y puntuación, quita stopwords y aplica
+    stemming liviano.
+
+    Args:
+        text: Texto original
+
+    Returns:
+        Lista de términos normalizados, en el orden en que aparecen
+
+    Examples:
+        >>> normalize_text("El baño del segundo piso está tapado")
+        ["bano", "segund", "piso", "tapad"]
+    """
+    words = _WORD_RE.findall(fold_accents(text.lower()))
+    return [light_stem(word) for word in words if word not in SPANISH_STOPWORDS]